@@ -0,0 +1,72 @@
+"""
+预签名性能对比：boto3 逐个签名 vs sign_many 批量签名
+
+用法 (在 backend 目录下):
+    python -m benchmarks.bench_presign --rows 1000
+"""
+import argparse
+import os
+import time
+
+# 基准测试不连真实 R2，给出占位配置即可
+os.environ.setdefault("DATABASE_URL", "sqlite:///./bench.db")
+os.environ.setdefault("R2_ACCESS_KEY_ID", "bench-access-key")
+os.environ.setdefault("R2_SECRET_ACCESS_KEY", "bench-secret-key")
+os.environ.setdefault("R2_ENDPOINT_URL", "https://bench.r2.cloudflarestorage.com")
+os.environ.setdefault("SUPABASE_URL", "http://localhost")
+os.environ.setdefault("SUPABASE_KEY", "bench")
+
+from services import storage
+
+
+def _make_keys(rows: int):
+    # 模拟音乐列表：每行主文件 + 封面 + 歌词
+    keys = []
+    for i in range(rows):
+        keys.append((f"uploads/{i:06d}-track.flac", f"track {i}.flac"))
+        keys.append(f"uploads/{i:06d}-cover.jpg")
+        keys.append(f"uploads/{i:06d}-lyrics.lrc")
+    return keys
+
+
+def bench_boto3(keys, rounds: int) -> float:
+    best = float("inf")
+    for _ in range(rounds):
+        start = time.perf_counter()
+        for item in keys:
+            object_name, filename = item if isinstance(item, tuple) else (item, None)
+            params = storage._build_get_params(object_name, filename)
+            storage.get_s3_client().generate_presigned_url('get_object', Params=params, ExpiresIn=3600)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def bench_sign_many(keys, rounds: int) -> float:
+    best = float("inf")
+    for _ in range(rounds):
+        # 清空缓存，只测冷启动签名路径
+        storage.presign_cache.clear()
+        start = time.perf_counter()
+        storage.sign_many(keys)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Presign micro-benchmark")
+    parser.add_argument("--rows", type=int, default=1000)
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+
+    keys = _make_keys(args.rows)
+    boto_time = bench_boto3(keys, args.rounds)
+    fast_time = bench_sign_many(keys, args.rounds)
+
+    print(f"keys:        {len(keys)}")
+    print(f"boto3:       {boto_time * 1000:.1f} ms ({len(keys) / boto_time:,.0f} urls/s)")
+    print(f"sign_many:   {fast_time * 1000:.1f} ms ({len(keys) / fast_time:,.0f} urls/s)")
+    print(f"speedup:     {boto_time / fast_time:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""
+列表接口序列化性能对比：response_model=List[File] vs ORJSONResponse + 预构造字典
+
+用法 (在 backend 目录下):
+    python -m benchmarks.bench_serialization --rows 1000 10000
+"""
+import argparse
+import os
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import List
+
+os.environ.setdefault("DATABASE_URL", "sqlite:///./bench.db")
+os.environ.setdefault("R2_ACCESS_KEY_ID", "bench-access-key")
+os.environ.setdefault("R2_SECRET_ACCESS_KEY", "bench-secret-key")
+os.environ.setdefault("R2_ENDPOINT_URL", "https://bench.r2.cloudflarestorage.com")
+os.environ.setdefault("SUPABASE_URL", "http://localhost")
+os.environ.setdefault("SUPABASE_KEY", "bench")
+
+from fastapi import FastAPI
+from fastapi.responses import ORJSONResponse
+from fastapi.testclient import TestClient
+
+from models import File
+
+
+def _make_rows(count: int) -> List[dict]:
+    # 模拟 read_files 签名后的一页数据
+    uploader = uuid.uuid4()
+    base = datetime(2025, 1, 1)
+    return [
+        {
+            "id": i,
+            "asset_id": None,
+            "uploader_id": uploader,
+            "filename": f"track-{i}.flac",
+            "r2_key": f"https://bench.r2.cloudflarestorage.com/endfield-assets/uploads/{i}.flac?X-Amz-Signature={'0' * 64}",
+            "url": f"https://bench.r2.cloudflarestorage.com/endfield-assets/uploads/{i}.flac?X-Amz-Signature={'0' * 64}",
+            "size": 30_000_000 + i,
+            "mime_type": "audio/flac",
+            "media_category": "audio",
+            "created_at": base + timedelta(seconds=i),
+            "artist": "Endfield Industries",
+            "cover_r2_key": f"https://bench.r2.cloudflarestorage.com/endfield-assets/uploads/{i}.jpg?X-Amz-Signature={'0' * 64}",
+            "lyrics_r2_key": None,
+            "cover_variants": {"256": f"derived/covers/256/uploads/{i}.jpg.webp"},
+            "duration": 240.0 + i % 60,
+            "waveform_r2_key": f"https://bench.r2.cloudflarestorage.com/endfield-assets/derived/waveforms/uploads/{i}.flac.json?X-Amz-Signature={'0' * 64}",
+            "content_sha256": f"{i:064x}",
+        }
+        for i in range(count)
+    ]
+
+
+def _build_app(rows: List[dict]) -> FastAPI:
+    app = FastAPI()
+    models = [File(**row) for row in rows]
+
+    # 旧路径：返回 ORM 实例，由 FastAPI 按 response_model 校验并序列化
+    @app.get("/standard", response_model=List[File])
+    def standard():
+        return models
+
+    # 快速路径：行已是字典，orjson 直接输出
+    @app.get("/fast")
+    def fast():
+        return ORJSONResponse(content=rows)
+
+    return app
+
+
+def _bench(client: TestClient, path: str, rounds: int) -> float:
+    best = float("inf")
+    for _ in range(rounds):
+        start = time.perf_counter()
+        response = client.get(path)
+        best = min(best, time.perf_counter() - start)
+        assert response.status_code == 200
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="List serialization benchmark")
+    parser.add_argument("--rows", type=int, nargs="+", default=[1000, 10000])
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'rows':>8} {'standard':>12} {'fast':>12} {'speedup':>8}")
+    for count in args.rows:
+        client = TestClient(_build_app(_make_rows(count)))
+        # 两条路径输出必须一致
+        assert client.get("/standard").json() == client.get("/fast").json()
+        standard = _bench(client, "/standard", args.rounds)
+        fast = _bench(client, "/fast", args.rounds)
+        print(f"{count:>8} {standard * 1000:>10.1f}ms {fast * 1000:>10.1f}ms {standard / fast:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
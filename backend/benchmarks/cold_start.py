@@ -0,0 +1,164 @@
+"""
+冷启动预算检查：在全新进程里导入 main 并跑完 lifespan 启动阶段，超出预算时以非零状态退出
+(墙钟预算只在这里检查；tests/test_storage_client.py 确定性地检查 boto3 懒加载)
+
+用法 (在 backend 目录下):
+    python -m benchmarks.cold_start
+    python -m benchmarks.cold_start --runs 5 --import-budget-ms 1200 --startup-budget-ms 1500
+    python -m benchmarks.cold_start --importtime 15   # 额外列出最慢的 15 个模块导入
+
+检查项:
+- import main 耗时 (各次运行取中位数) 不超过 --import-budget-ms
+- import main + lifespan 启动 不超过 --startup-budget-ms
+- 导入 main 之后 boto3 仍未被导入 (S3 客户端必须懒加载)
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+from typing import List
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+IMPORT_BUDGET_MS = 1500
+STARTUP_BUDGET_MS = 2500
+
+
+def _child(database_url: str):
+    """
+    子进程：测量一次冷启动，结果以 JSON 写到 stdout 最后一行
+    """
+    import time
+    started = time.perf_counter()
+
+    os.environ["DATABASE_URL"] = database_url
+    os.environ.setdefault("R2_ACCESS_KEY_ID", "bench-access-key")
+    os.environ.setdefault("R2_SECRET_ACCESS_KEY", "bench-secret-key")
+    os.environ.setdefault("R2_ENDPOINT_URL", "https://bench.r2.cloudflarestorage.com")
+    os.environ.setdefault("SUPABASE_URL", "http://localhost")
+    os.environ.setdefault("SUPABASE_KEY", "bench")
+    # 预热在后台线程进行，这里单独测量，避免与启动阶段重叠
+    os.environ["STORAGE_WARMUP_ON_STARTUP"] = "false"
+
+    import asyncio
+    import main
+    import_ms = (time.perf_counter() - started) * 1000
+    boto3_loaded = "boto3" in sys.modules
+
+    from database import async_engine
+    from services.startup import startup_report
+    from services.storage import warm_storage_client
+
+    async def boot():
+        try:
+            async with main.app.router.lifespan_context(main.app):
+                pass
+        finally:
+            await async_engine.dispose()
+
+    asyncio.run(boot())
+    startup_ms = (time.perf_counter() - started) * 1000
+    storage_ms = warm_storage_client() * 1000
+
+    print(json.dumps({
+        "import_ms": round(import_ms, 1),
+        "startup_ms": round(startup_ms, 1),
+        "storage_client_ms": round(storage_ms, 1),
+        "boto3_imported_by_main": boto3_loaded,
+        "phases": startup_report.as_dict(),
+    }))
+
+
+def _run_child(python_flags: tuple = ()) -> subprocess.CompletedProcess:
+    # 每次使用全新的临时数据库，覆盖建表 + 迁移的完整路径
+    with tempfile.TemporaryDirectory() as tmp:
+        database_url = f"sqlite:///{os.path.join(tmp, 'cold_start.db')}"
+        return subprocess.run(
+            [sys.executable, *python_flags, "-m", "benchmarks.cold_start", "--child", database_url],
+            cwd=BACKEND_DIR, capture_output=True, text=True, check=True
+        )
+
+
+def _slowest_imports(limit: int):
+    # -X importtime 输出到 stderr: "import time: self | cumulative | module"
+    completed = _run_child(("-X", "importtime"))
+    rows = []
+    for line in completed.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, self_us, cumulative_us, module = (part.strip() for part in line.replace("import time:", "|").split("|"))
+        rows.append((int(cumulative_us), int(self_us), module))
+    rows.sort(reverse=True)
+    print("\nSlowest imports (cumulative):")
+    for cumulative_us, self_us, module in rows[:limit]:
+        print(f"  {cumulative_us / 1000:>8.1f} ms  (self {self_us / 1000:>6.1f} ms)  {module}")
+
+
+def measure(runs: int) -> dict:
+    """
+    运行 runs 次冷启动，返回各项耗时的中位数
+    """
+    results = [json.loads(_run_child().stdout.strip().splitlines()[-1]) for _ in range(runs)]
+    return {
+        "import_ms": statistics.median(r["import_ms"] for r in results),
+        "startup_ms": statistics.median(r["startup_ms"] for r in results),
+        "storage_client_ms": statistics.median(r["storage_client_ms"] for r in results),
+        "boto3_imported_by_main": any(r["boto3_imported_by_main"] for r in results),
+        "phases": results[-1]["phases"],
+    }
+
+
+def budget_failures(
+    result: dict, import_budget_ms: float = IMPORT_BUDGET_MS, startup_budget_ms: float = STARTUP_BUDGET_MS
+) -> List[str]:
+    failures = []
+    if result["import_ms"] > import_budget_ms:
+        failures.append(f"import main took {result['import_ms']:.0f} ms > {import_budget_ms:.0f} ms")
+    if result["startup_ms"] > startup_budget_ms:
+        failures.append(f"startup took {result['startup_ms']:.0f} ms > {startup_budget_ms:.0f} ms")
+    if result["boto3_imported_by_main"]:
+        failures.append("boto3 is imported eagerly by main (the S3 client must stay lazy)")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cold-start budget check")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--import-budget-ms", type=float, default=IMPORT_BUDGET_MS)
+    parser.add_argument("--startup-budget-ms", type=float, default=STARTUP_BUDGET_MS)
+    parser.add_argument("--importtime", type=int, default=0, help="Also list the N slowest imports")
+    parser.add_argument("--child", metavar="DATABASE_URL", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        _child(args.child)
+        return
+
+    result = measure(args.runs)
+
+    print(f"runs:             {args.runs}")
+    print(f"import main:      {result['import_ms']:.0f} ms (budget {args.import_budget_ms:.0f} ms)")
+    print(f"import + startup: {result['startup_ms']:.0f} ms (budget {args.startup_budget_ms:.0f} ms)")
+    print(f"lazy S3 client:   {result['storage_client_ms']:.0f} ms (paid on first R2 access)")
+    print("phases (last run):")
+    for name, ms in result["phases"].items():
+        print(f"  {name:<16}{ms:>8.1f} ms")
+
+    if args.importtime:
+        _slowest_imports(args.importtime)
+
+    failures = budget_failures(result, args.import_budget_ms, args.startup_budget_ms)
+
+    if failures:
+        print("\n❌ Cold-start budget exceeded:")
+        for failure in failures:
+            print(f"  - {failure}")
+        sys.exit(1)
+    print("\n✅ Cold-start within budget")
+
+
+if __name__ == "__main__":
+    main()
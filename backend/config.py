@@ -1,3 +1,5 @@
+from typing import Optional
+
 from pydantic_settings import BaseSettings
 
 class Settings(BaseSettings):
@@ -7,6 +9,13 @@ class Settings(BaseSettings):
     
     # 数据库
     DATABASE_URL: str
+
+    # 连接池 (同步与异步引擎共用)
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: int = 30
+    # 启动时自动执行数据库迁移 (多实例部署可关闭，改为手动执行 python migrations.py)
+    RUN_MIGRATIONS_ON_STARTUP: bool = True
     
     # R2 对象存储
     R2_ACCESS_KEY_ID: str
@@ -14,6 +23,71 @@ class Settings(BaseSettings):
     R2_BUCKET_NAME: str = "endfield-assets"
     R2_ENDPOINT_URL: str
 
+    # 预签名链接缓存 (同一时间窗口内复用同一个 URL，便于浏览器/CDN 命中缓存)
+    PRESIGN_CACHE_SIZE: int = 4096
+    PRESIGN_BUCKET_SECONDS: int = 900
+
+    # 批量删除对象时并发执行的 DeleteObjects 请求数
+    R2_DELETE_CONCURRENCY: int = 4
+
+    # 存储删除队列 (outbox) 后台清理
+    PURGE_INTERVAL_SECONDS: int = 30
+    PURGE_BATCH_SIZE: int = 1000
+    PURGE_LEASE_SECONDS: int = 300
+    PURGE_MAX_BACKOFF_SECONDS: int = 3600
+
+    # 当前用户缓存 (按 JWT sub 缓存 Profile / Tempop 查询结果)
+    PRINCIPAL_CACHE_SIZE: int = 1024
+    PRINCIPAL_CACHE_TTL: int = 60
+
+    # 系统计数器对账周期 (秒)
+    COUNTER_RECONCILE_SECONDS: int = 600
+
+    # 活动流内存缓冲区大小 (条)
+    ACTIVITY_BUFFER_SIZE: int = 200
+
+    # SQL 日志 (逐条打印语句，仅调试时开启)
+    DB_ECHO: bool = False
+    # 慢请求日志阈值 (毫秒)，0 表示关闭
+    SLOW_REQUEST_MS: int = 1000
+    # 应用日志级别 (启动报告 / 迁移 / 后台任务 / 慢请求等统一经 logging 输出)
+    LOG_LEVEL: str = "INFO"
+
+    # /metrics 抓取凭证：Prometheus 以 Authorization: Bearer <token> 访问；未配置时该端点关闭 (404)
+    METRICS_TOKEN: Optional[str] = None
+
+    # 启动时在后台预先创建 S3 客户端 (关闭则在第一次访问 R2 时创建)
+    STORAGE_WARMUP_ON_STARTUP: bool = True
+
+    # 派生文件管线 (封面缩略图 / 音频波形)：进程池大小，0 表示关闭
+    DERIVATIVE_WORKERS: int = 2
+    DERIVATIVE_INTERVAL_SECONDS: int = 60
+    DERIVATIVE_BATCH_SIZE: int = 20
+    # 封面缩略图尺寸 (最长边, px) / WebP 质量 / 原图大小上限
+    COVER_VARIANT_SIZES: list[int] = [96, 256, 512]
+    COVER_WEBP_QUALITY: int = 80
+    COVER_MAX_BYTES: int = 20 * 1024 * 1024
+    # 音频波形峰值点数 (每点 1 字节，JSON 约 4 KB)
+    WAVEFORM_PEAKS: int = 1000
+
+    # 小对象内联存储：不超过该大小且类型匹配的上传直接存库 (0 表示关闭)
+    INLINE_MAX_BYTES: int = 64 * 1024
+    # 精确匹配的白名单 (不含参数)：内联对象由 API 同源返回，不能放行 text/html 等可执行类型
+    INLINE_CONTENT_TYPES: list[str] = ["text/plain", "application/json"]
+    # 内联上传凭证有效期 (秒)，与 R2 预签名上传链接一致
+    INLINE_UPLOAD_TTL: int = 3600
+    # 分片上传凭证有效期 (秒)，与 R2 清理未完成分片上传的默认期限一致
+    MULTIPART_UPLOAD_TTL: int = 7 * 24 * 3600
+    # 上传凭证签名密钥 (未配置时由 R2_SECRET_ACCESS_KEY 派生)
+    UPLOAD_SIGNING_SECRET: Optional[str] = None
+    # 对外访问的 API 根地址 (以 / 结尾)；反向代理后 request.base_url 不可靠时设置
+    PUBLIC_BASE_URL: Optional[str] = None
+
+    # 蓝图版本：每隔多少个增量改写一次完整快照 (读取时最多回放这么多个补丁)
+    BLUEPRINT_SNAPSHOT_INTERVAL: int = 50
+    # 进程内缓存的已还原蓝图文档数
+    BLUEPRINT_CACHE_SIZE: int = 32
+
     SUPABASE_URL: str
     SUPABASE_KEY: str
 
@@ -1,28 +1,72 @@
 from sqlmodel import SQLModel, create_engine, Session
+from sqlmodel.ext.asyncio.session import AsyncSession
+from sqlalchemy.ext.asyncio import create_async_engine
 from config import settings
+from services.metrics import instrument_engine
 
 # --- 优化连接池配置 ---
 # pool_pre_ping=True: 每次从池中拿连接前，先发送一个 "SELECT 1" 探测包。
 #   如果连接断了 (SSL error)，它会抛弃这个坏连接，自动重连一个新的。这是解决 SSL 错误的特效药。
 # pool_recycle=1800: 每 30 分钟强制回收连接，防止连接在云端因为存活太久被防火墙强行切断。
+# pool_size / max_overflow / pool_timeout: 由 config.Settings 统一配置
 engine = create_engine(
     settings.DATABASE_URL,
-    echo=True, # 生产环境建议改为 False
+    echo=settings.DB_ECHO, # 🟢 默认关闭，排查慢请求请看 SLOW_REQUEST_MS 慢请求日志
     pool_pre_ping=True, 
     pool_recycle=1800,
-    # 传递给底层 psycopg2 的参数，开启 TCP Keepalive 防止连接假死
+    pool_size=settings.DB_POOL_SIZE,
+    max_overflow=settings.DB_MAX_OVERFLOW,
+    pool_timeout=settings.DB_POOL_TIMEOUT,
+    # 传递给底层 psycopg2 的参数，开启 TCP Keepalive 防止连接假死 (本地 SQLite 不支持这些参数)
     connect_args={
         "keepalives": 1,
         "keepalives_idle": 30,
         "keepalives_interval": 10,
         "keepalives_count": 5
-    }
+    } if settings.DATABASE_URL.startswith("postgres") else {}
 )
 
+
+def _to_async_url(url: str) -> str:
+    """
+    将同步驱动的连接串转换为异步驱动 (asyncpg / aiosqlite)
+    """
+    if url.startswith("postgres://"):
+        url = "postgresql://" + url[len("postgres://"):]
+    for prefix in ("postgresql+psycopg2://", "postgresql://"):
+        if url.startswith(prefix):
+            return "postgresql+asyncpg://" + url[len(prefix):]
+    if url.startswith("sqlite://"):
+        return "sqlite+aiosqlite://" + url[len("sqlite://"):]
+    return url
+
+
+# --- 异步引擎 ---
+# 路由中的查询走这里，慢查询只会挂起当前请求，不会阻塞事件循环
+# asyncpg 不支持 psycopg2 的 keepalive 参数，依靠 pool_pre_ping + pool_recycle 处理断连
+async_engine = create_async_engine(
+    _to_async_url(settings.DATABASE_URL),
+    echo=settings.DB_ECHO,
+    pool_pre_ping=True,
+    pool_recycle=1800,
+    pool_size=settings.DB_POOL_SIZE,
+    max_overflow=settings.DB_MAX_OVERFLOW,
+    pool_timeout=settings.DB_POOL_TIMEOUT
+)
+
+# 🟢 查询耗时 / 连接池等待统计 (见 /metrics)
+instrument_engine(engine, "sync")
+instrument_engine(async_engine.sync_engine, "async")
+
 def create_db_and_tables():
     # 自动在数据库建表
     SQLModel.metadata.create_all(engine)
 
 def get_session():
     with Session(engine) as session:
-        yield session
\ No newline at end of file
+        yield session
+
+async def get_async_session():
+    # expire_on_commit=False: 提交后仍可直接读取对象属性，避免在异步上下文中触发隐式 IO
+    async with AsyncSession(async_engine, expire_on_commit=False) as session:
+        yield session
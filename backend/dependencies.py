@@ -2,9 +2,11 @@ from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from jose import jwt, JWTError
 from config import settings
-from sqlmodel import Session
-from database import get_session
+from sqlmodel.ext.asyncio.session import AsyncSession
+from database import get_async_session
 from models import Profile, Tempop
+from services.principal_cache import principal_cache
+from uuid import UUID
 
 # 定义认证模式 (Bearer Token)
 security = HTTPBearer()
@@ -15,7 +17,7 @@ security = HTTPBearer()
 
 async def get_current_user(
     token: HTTPAuthorizationCredentials = Depends(security),
-    session: Session = Depends(get_session)
+    session: AsyncSession = Depends(get_async_session)
 ):
     """
     验证 Token 并返回当前用户 (可能是 Profile 或 Tempop)
@@ -26,22 +28,42 @@ async def get_current_user(
         
         if not user_id:
             raise HTTPException(status_code=401, detail="Invalid authentication credentials")
+
+        # 主键为 UUID，统一转换后再查询 (asyncpg / sqlite 不接受字符串主键)
+        try:
+            user_id = UUID(user_id)
+        except ValueError:
+            raise HTTPException(status_code=401, detail="Invalid authentication credentials")
+
+        # 🟢 命中缓存直接返回，跳过数据库
+        cached = principal_cache.get(user_id)
+        if cached:
+            return cached
             
         # 🟢 逻辑升级：先查正式干员表
-        user = session.get(Profile, user_id)
+        user = await session.get(Profile, user_id)
         
         # 🟢 如果不是正式干员，再查普通干员表 (Tempop)
         if not user:
-            user = session.get(Tempop, user_id)
+            user = await session.get(Tempop, user_id)
 
         # 🟢 如果两边都没有，才报错
         if not user:
             raise HTTPException(status_code=403, detail="User not found in database")
-            
+
+        principal_cache.put(user)
         return user
 
     except JWTError:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Could not validate credentials",
-        )
\ No newline at end of file
+        )
+
+async def get_current_admin(current_user=Depends(get_current_user)) -> Profile:
+    """
+    要求当前用户为管理员 (role = admin 的正式干员)
+    """
+    if not isinstance(current_user, Profile) or current_user.role != "admin":
+        raise HTTPException(status_code=403, detail="Admin privileges required")
+    return current_user
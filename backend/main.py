@@ -1,16 +1,71 @@
+import time
+_import_started = time.perf_counter()
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
+import asyncio
+import logging
 
 from config import settings
-from database import create_db_and_tables
-from routers import assets, upload, files, admin, users, stats, activities
+from sqlmodel.ext.asyncio.session import AsyncSession
+from database import create_db_and_tables, engine, async_engine
+from migrations import run_migrations
+from services.counters import run_counter_reconciler
+from services.purge import run_purge_worker
+from services.derivatives import run_derivative_worker
+from services.activity_feed import warm_activity_feed
+from services.metrics import MetricsMiddleware
+from services.storage import warm_storage_client
+from services.startup import startup_report
+from routers import assets, upload, files, admin, users, stats, activities, metrics, blueprints
+
+# 🟢 冷启动报告：应用模块导入耗时
+startup_report.record("import", time.perf_counter() - _import_started)
+
+# 应用日志统一走 logging (宿主已配置根日志时 basicConfig 不会覆盖)
+logging.basicConfig(level=settings.LOG_LEVEL, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+logger = logging.getLogger(__name__)
+
+
+async def _warm_storage():
+    # 在线程里创建 S3 客户端，不阻塞启动；失败时首个请求会再次尝试
+    try:
+        startup_report.record("storage_client", await asyncio.to_thread(warm_storage_client))
+    except Exception as e:
+        logger.error("❌ Storage warm-up failed: %s", e)
 
 # --- 生命周期管理 ---
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    create_db_and_tables()
+    with startup_report.phase("create_tables"):
+        create_db_and_tables()
+    if settings.RUN_MIGRATIONS_ON_STARTUP:
+        with startup_report.phase("migrations"):
+            run_migrations(engine)
+    # 🟢 用最近的上传记录预热活动流
+    with startup_report.phase("activity_feed"):
+        async with AsyncSession(async_engine) as session:
+            await warm_activity_feed(session)
+    # 🟢 后台定期对账系统计数器
+    tasks = [asyncio.create_task(run_counter_reconciler(settings.COUNTER_RECONCILE_SECONDS))]
+    # 🟢 后台清理已删除文件在 R2 上的对象
+    tasks.append(asyncio.create_task(run_purge_worker()))
+    # 🟢 后台生成封面缩略图 (进程池)
+    if settings.DERIVATIVE_WORKERS > 0:
+        tasks.append(asyncio.create_task(run_derivative_worker()))
+    # 🟢 可选：后台预热 S3 客户端 (关闭时在第一次访问 R2 时才创建)
+    if settings.STORAGE_WARMUP_ON_STARTUP:
+        tasks.append(asyncio.create_task(_warm_storage()))
+    logger.info("🚀 Startup: %s", startup_report.summary())
     yield
+    # 停机时取消后台任务并等待其退出
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    # 🟢 后台任务退出后再关闭连接池，主动断开数据库连接 (不等进程退出时被动断开)
+    await async_engine.dispose()
+    engine.dispose()
 
 # --- 🔴 核心修复：移除 "*"，严格指定域名 ---
 origins = [
@@ -34,8 +89,12 @@ app.add_middleware(
     allow_credentials=True, # 允许携带 Token/Cookie
     allow_methods=["*"],    # 允许所有方法 (GET, POST...)
     allow_headers=["*"],    # 允许所有 Header
+    expose_headers=["X-Next-Cursor", "ETag"], # 🟢 分页游标 / 条件请求版本号需要暴露给前端读取
 )
 
+# --- 🟢 请求级性能统计 (最外层，包含 CORS 预检在内的全部耗时) ---
+app.add_middleware(MetricsMiddleware)
+
 # --- 注册路由 ---
 app.include_router(assets.router)
 app.include_router(upload.router)
@@ -44,6 +103,8 @@ app.include_router(admin.router)
 app.include_router(users.router)
 app.include_router(stats.router)
 app.include_router(activities.router)
+app.include_router(metrics.router)
+app.include_router(blueprints.router)
 
 @app.get("/")
 def read_root():
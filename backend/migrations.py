@@ -0,0 +1,186 @@
+"""
+数据库版本化迁移
+
+SQLModel.metadata.create_all 只会创建缺失的表，已有表的结构变更 (加列 / 加索引)
+需要在这里登记为一个迁移。迁移按版本号顺序执行，已执行的版本记录在 schema_migrations 表中。
+
+启动时由 main.lifespan 自动执行 (RUN_MIGRATIONS_ON_STARTUP)，也可以手动执行：
+    python migrations.py            # 执行所有未执行的迁移
+    python migrations.py --status   # 查看迁移状态
+"""
+import argparse
+import logging
+from datetime import datetime
+from typing import Callable, List, NamedTuple
+
+from sqlalchemy import Column, DateTime, Integer, MetaData, String, Table, inspect, select, text
+from sqlalchemy.engine import Connection
+
+from models import Blueprint, BlueprintRevision, File, Tempop
+from services.blueprints import SNAPSHOT, encode as encode_revision
+from services.search import create_search_index
+
+logger = logging.getLogger(__name__)
+
+# 迁移记录表使用独立的 MetaData，不参与 create_all
+_meta = MetaData()
+schema_migrations = Table(
+    "schema_migrations", _meta,
+    Column("version", Integer, primary_key=True),
+    Column("description", String, nullable=False),
+    Column("applied_at", DateTime, nullable=False),
+)
+
+# Postgres 多实例同时启动时用 advisory lock 串行执行迁移
+_PG_LOCK_ID = 0x45_4E_44_46  # "ENDF"
+
+
+class Migration(NamedTuple):
+    version: int
+    description: str
+    upgrade: Callable[[Connection], None]
+
+
+def _has_column(conn: Connection, table: str, column: str) -> bool:
+    return any(c["name"] == column for c in inspect(conn).get_columns(table))
+
+
+# --- 迁移定义 ---
+
+def _add_media_category(conn: Connection):
+    # 全新数据库已由 create_all 建好该列，只需回填
+    if not _has_column(conn, "files", "media_category"):
+        conn.execute(text("ALTER TABLE files ADD COLUMN media_category VARCHAR(32)"))
+
+    if conn.dialect.name == "postgresql":
+        category = "lower(split_part(mime_type, '/', 1))"
+    else:
+        category = "lower(substr(mime_type, 1, instr(mime_type, '/') - 1))"
+    conn.execute(text(
+        f"UPDATE files SET media_category = {category} "
+        "WHERE media_category IS NULL AND mime_type LIKE '%/%'"
+    ))
+
+
+def _create_indexes(model, names: List[str] = None):
+    # names 为空时创建模型上的全部索引；后续迁移新增的索引需显式列出，避免早期迁移引用尚不存在的列
+    def upgrade(conn: Connection):
+        for index in model.__table__.indexes:
+            if names is None or index.name in names:
+                index.create(conn, checkfirst=True)
+    return upgrade
+
+
+def _add_cover_variants(conn: Connection):
+    if not _has_column(conn, "files", "cover_variants"):
+        conn.execute(text("ALTER TABLE files ADD COLUMN cover_variants JSON"))
+    _create_indexes(File, ["ix_files_cover_pending"])(conn)
+
+
+def _add_audio_analysis(conn: Connection):
+    if not _has_column(conn, "files", "duration"):
+        conn.execute(text("ALTER TABLE files ADD COLUMN duration FLOAT"))
+    if not _has_column(conn, "files", "waveform_r2_key"):
+        conn.execute(text("ALTER TABLE files ADD COLUMN waveform_r2_key VARCHAR"))
+    _create_indexes(File, ["ix_files_audio_pending"])(conn)
+
+
+def _add_content_sha256(conn: Connection):
+    if not _has_column(conn, "files", "content_sha256"):
+        conn.execute(text("ALTER TABLE files ADD COLUMN content_sha256 VARCHAR(64)"))
+
+
+def _add_blueprint_revisions(conn: Connection):
+    # blueprint_revisions 表由 create_all 创建；已有蓝图的 data 转为第 1 版快照后清空
+    if not _has_column(conn, "blueprints", "head_revision"):
+        conn.execute(text("ALTER TABLE blueprints ADD COLUMN head_revision INTEGER NOT NULL DEFAULT 0"))
+    blueprints = Blueprint.__table__
+    rows = conn.execute(
+        select(blueprints.c.id, blueprints.c.data, blueprints.c.created_by, blueprints.c.updated_at)
+        .where(blueprints.c.head_revision == 0)
+    ).all()
+    for row in rows:
+        payload = encode_revision(row.data or {})
+        conn.execute(BlueprintRevision.__table__.insert().values(
+            blueprint_id=row.id, revision=1, kind=SNAPSHOT, payload=payload, size=len(payload),
+            created_by=row.created_by, created_at=row.updated_at or datetime.now()
+        ))
+    if rows:
+        conn.execute(
+            blueprints.update().where(blueprints.c.head_revision == 0).values(head_revision=1, data={})
+        )
+
+
+MIGRATIONS: List[Migration] = [
+    Migration(1, "files.media_category column + backfill", _add_media_category),
+    Migration(2, "files composite indexes for list / activities / stats queries", _create_indexes(File, [
+        "ix_files_created_id", "ix_files_category_created_id",
+        "ix_files_uploader_created_id", "ix_files_uploader_category_created_id",
+    ])),
+    Migration(3, "tempop (status, applied_at, id) index for keyset application listing", _create_indexes(Tempop)),
+    Migration(4, "files full-text search index (Postgres tsvector + pg_trgm / SQLite FTS5)", create_search_index),
+    Migration(5, "files.cover_variants column + pending-derivative partial index", _add_cover_variants),
+    Migration(6, "files.duration / waveform_r2_key columns + pending-analysis partial index", _add_audio_analysis),
+    Migration(7, "files.content_sha256 column for content-addressed upload dedup", _add_content_sha256),
+    Migration(8, "blueprints.head_revision + existing data converted to revision snapshots", _add_blueprint_revisions),
+]
+
+
+# --- 执行器 ---
+
+def _applied_versions(conn: Connection) -> set:
+    return {row[0] for row in conn.execute(schema_migrations.select().with_only_columns(schema_migrations.c.version))}
+
+
+def run_migrations(engine) -> List[int]:
+    """
+    执行所有未执行的迁移，返回本次执行的版本号
+    """
+    applied_now = []
+    with engine.begin() as conn:
+        if conn.dialect.name == "postgresql":
+            conn.execute(text("SELECT pg_advisory_xact_lock(:id)"), {"id": _PG_LOCK_ID})
+        _meta.create_all(conn)
+        applied = _applied_versions(conn)
+
+        for migration in sorted(MIGRATIONS, key=lambda m: m.version):
+            if migration.version in applied:
+                continue
+            logger.info("⚙️ Applying migration %s: %s", migration.version, migration.description)
+            migration.upgrade(conn)
+            conn.execute(schema_migrations.insert().values(
+                version=migration.version,
+                description=migration.description,
+                applied_at=datetime.now()
+            ))
+            applied_now.append(migration.version)
+    return applied_now
+
+
+def migration_status(engine) -> List[dict]:
+    with engine.begin() as conn:
+        _meta.create_all(conn)
+        applied = _applied_versions(conn)
+    return [
+        {"version": m.version, "description": m.description, "applied": m.version in applied}
+        for m in sorted(MIGRATIONS, key=lambda m: m.version)
+    ]
+
+
+if __name__ == "__main__":
+    from database import engine, create_db_and_tables
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    parser = argparse.ArgumentParser(description="Endfield schema migrations")
+    parser.add_argument("--status", action="store_true", help="show migration status only")
+    args = parser.parse_args()
+
+    if args.status:
+        for item in migration_status(engine):
+            mark = "✅" if item["applied"] else "⬜"
+            print(f"{mark} {item['version']:04d} {item['description']}")
+    else:
+        create_db_and_tables()
+        versions = run_migrations(engine)
+        print(f"Applied: {versions}" if versions else "Database is up to date")
@@ -1,7 +1,7 @@
 from datetime import datetime
 from typing import Optional, List, Dict, Any
 from uuid import UUID
-from sqlmodel import Field, SQLModel, Relationship, Column, JSON
+from sqlmodel import Field, SQLModel, Relationship, Column, JSON, Index, LargeBinary, UniqueConstraint, text
 
 # --- 1. 干员档案 (Profile) ---
 class Profile(SQLModel, table=True):
@@ -43,8 +43,36 @@ class Asset(SQLModel, table=True):
 
 
 # --- 3. 协议文件 (File) ---
+def media_category_of(mime_type: Optional[str]) -> Optional[str]:
+    """
+    MIME 主类型 (audio/mpeg -> audio)，用于替代 LIKE 'audio/%' 前缀扫描
+    """
+    if not mime_type or "/" not in mime_type:
+        return None
+    return mime_type.split("/", 1)[0].lower()[:32] or None
+
+
 class File(SQLModel, table=True):
     __tablename__ = "files"
+    # 索引与 read_files / activities / stats 的查询形态一一对应 (见 migrations.py)
+    __table_args__ = (
+        Index("ix_files_created_id", "created_at", "id"),
+        Index("ix_files_category_created_id", "media_category", "created_at", "id"),
+        Index("ix_files_uploader_created_id", "uploader_id", "created_at", "id"),
+        Index("ix_files_uploader_category_created_id", "uploader_id", "media_category", "created_at", "id"),
+        # 封面缩略图待生成队列 (部分索引，只包含尚未派生的行)
+        Index(
+            "ix_files_cover_pending", "id",
+            postgresql_where=text("cover_r2_key IS NOT NULL AND cover_variants IS NULL"),
+            sqlite_where=text("cover_r2_key IS NOT NULL AND cover_variants IS NULL"),
+        ),
+        # 音频波形 / 时长待分析队列
+        Index(
+            "ix_files_audio_pending", "id",
+            postgresql_where=text("media_category = 'audio' AND waveform_r2_key IS NULL"),
+            sqlite_where=text("media_category = 'audio' AND waveform_r2_key IS NULL"),
+        ),
+    )
 
     id: Optional[int] = Field(default=None, primary_key=True)
     
@@ -57,12 +85,21 @@ class File(SQLModel, table=True):
     url: Optional[str] = None
     size: Optional[int] = None
     mime_type: Optional[str] = None
+    # 🟢 冗余字段：MIME 主类型，写入时由 media_category_of 计算
+    media_category: Optional[str] = Field(default=None, max_length=32)
     created_at: datetime = Field(default_factory=datetime.now)
 
     # 🟢 新增：音乐专属元数据 (默认均为 None，不影响其他文件)
     artist: Optional[str] = None
     cover_r2_key: Optional[str] = None
     lyrics_r2_key: Optional[str] = None
+    # 🟢 封面缩略图 (WebP)：{"256": "derived/covers/256/<cover_r2_key>.webp"}，由后台派生任务写入
+    cover_variants: Optional[Dict[str, str]] = Field(default=None, sa_column=Column(JSON(none_as_null=True)))
+    # 🟢 音频时长 (秒) 与波形峰值对象 (derived/waveforms/<r2_key>.json)，由后台派生任务写入
+    duration: Optional[float] = None
+    waveform_r2_key: Optional[str] = None
+    # 🟢 主文件内容的 SHA-256 (十六进制)，用于上传去重，见 ContentObject
+    content_sha256: Optional[str] = Field(default=None, max_length=64)
 
     # ... (Relationships 保持不变) ...
     asset: Optional[Asset] = Relationship(back_populates="files")
@@ -94,7 +131,10 @@ class Blueprint(SQLModel, table=True):
     version: str = Field(default="v1.0")
     is_public: bool = Field(default=False)
     
+    # 🟢 旧版整份存储的内容列：迁移 8 之后内容改存 blueprint_revisions，此列保持为空
     data: Dict[str, Any] = Field(default={}, sa_column=Column(JSON))
+    # 🟢 当前版本号 (blueprint_revisions.revision)，保存时以它做乐观并发控制
+    head_revision: int = Field(default=0)
     
     created_at: datetime = Field(default_factory=datetime.now)
     updated_at: datetime = Field(default_factory=datetime.now)
@@ -105,6 +145,10 @@ class Blueprint(SQLModel, table=True):
 # --- 6. 临时人员 (Tempop) ---
 class Tempop(SQLModel, table=True):
     __tablename__ = "tempop"
+    # 审核队列按 (applied_at, id) 游标分页
+    __table_args__ = (
+        Index("ix_tempop_status_applied_id", "status", "applied_at", "id"),
+    )
 
     id: UUID = Field(primary_key=True)
     email: Optional[str] = None
@@ -118,4 +162,80 @@ class Tempop(SQLModel, table=True):
     bio: Optional[str] = None
     
     status: str = Field(default="pending")
-    applied_at: datetime = Field(default_factory=datetime.now)
\ No newline at end of file
+    applied_at: datetime = Field(default_factory=datetime.now)
+
+# --- 7. 系统计数器 (SystemCounter) ---
+# 由写操作在同一事务内增量维护，/stats 直接读取，定期对账修正漂移
+class SystemCounter(SQLModel, table=True):
+    __tablename__ = "system_counters"
+
+    name: str = Field(primary_key=True)
+    value: int = Field(default=0)
+    updated_at: datetime = Field(default_factory=datetime.now)
+
+
+# --- 8. 存储删除队列 (StorageDeletion) ---
+# 事务性 outbox：删除记录时在同一事务内写入待删除的对象键，由后台任务异步清理 R2
+class StorageDeletion(SQLModel, table=True):
+    __tablename__ = "storage_deletions"
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    r2_key: str
+    attempts: int = Field(default=0)
+    next_attempt_at: datetime = Field(default_factory=datetime.now, index=True)
+    last_error: Optional[str] = None
+    created_at: datetime = Field(default_factory=datetime.now)
+
+
+# --- 9. 内联小对象 (InlineObject) ---
+# 歌词等小文件直接存库 (键以 inline/ 开头)，读取不经过 R2，见 services/inline_store.py
+class InlineObject(SQLModel, table=True):
+    __tablename__ = "inline_objects"
+
+    key: str = Field(primary_key=True)
+    content_type: str
+    size: int
+    data: bytes = Field(sa_column=Column(LargeBinary, nullable=False))
+    created_at: datetime = Field(default_factory=datetime.now)
+
+
+# --- 10. 内容寻址对象 (ContentObject) ---
+# 上传去重：同一内容 (SHA-256) 只在 R2 上存一份，ref_count 记录引用该对象键的文件字段数，
+# 最后一个引用删除时才进入清理队列。verified 为真 (后台重新计算过哈希) 的对象才会被复用
+class ContentObject(SQLModel, table=True):
+    __tablename__ = "content_objects"
+    __table_args__ = (
+        # 待校验队列 (部分索引)
+        Index(
+            "ix_content_objects_unverified", "sha256",
+            postgresql_where=text("NOT verified"),
+            sqlite_where=text("NOT verified"),
+        ),
+    )
+
+    sha256: str = Field(primary_key=True, max_length=64)
+    r2_key: str = Field(unique=True)
+    size: Optional[int] = None
+    ref_count: int = Field(default=0)
+    verified: bool = Field(default=False)
+    created_at: datetime = Field(default_factory=datetime.now)
+
+
+# --- 11. 蓝图版本 (BlueprintRevision) ---
+# 每次保存一行：kind=snapshot 为压缩后的完整文档，kind=delta 为相对上一版本的 JSON Patch (同样压缩)
+# 读取某一版本 = 最近的快照 + 之后的增量，见 services/blueprints.py
+class BlueprintRevision(SQLModel, table=True):
+    __tablename__ = "blueprint_revisions"
+    __table_args__ = (
+        UniqueConstraint("blueprint_id", "revision", name="uq_blueprint_revisions_revision"),
+    )
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    blueprint_id: int = Field(foreign_key="blueprints.id")
+    revision: int
+    kind: str = Field(max_length=16)
+    payload: bytes = Field(sa_column=Column(LargeBinary, nullable=False))
+    # 压缩后的字节数
+    size: int
+    created_by: Optional[UUID] = None
+    created_at: datetime = Field(default_factory=datetime.now)
@@ -1,40 +1,46 @@
-from fastapi import APIRouter, Depends
-from sqlmodel import Session, select
-from database import get_session
-from models import File
-from datetime import datetime
+from fastapi import APIRouter, Header, Request, Response
+from fastapi.responses import StreamingResponse
+from typing import Optional
+from services.activity_feed import activity_feed
+from services.etag import BOOT_ID, make_etag, etag_matches, not_modified, set_etag
 
 router = APIRouter(
     prefix="/activities",
     tags=["System Activities"]
 )
 
+# SSE 保活间隔 (秒)
+KEEPALIVE_SECONDS = 15
+
 @router.get("/")
-def get_recent_activities(session: Session = Depends(get_session)):
-    """获取最近5条活动记录"""
-    
-    # 查询最新5个文件记录
-    recent_files = session.exec(
-        select(File)
-        .order_by(File.created_at.desc())
-        .limit(5)
-    ).all()
-    
-    activities = []
-    for file in recent_files:
-        # 格式化时间为 HH:MM
-        created_time = file.created_at.strftime("%H:%M")
-        
-        # 判断文件类型
-        if file.mime_type and file.mime_type.startswith('audio/'):
-            msg = f'Audio track "{file.filename}" uploaded'
-        else:
-            msg = f'File "{file.filename}" uploaded'
-        
-        activities.append({
-            "time": created_time,
-            "type": "upload",
-            "message": msg
-        })
-    
-    return activities
\ No newline at end of file
+async def get_recent_activities(request: Request, response: Response):
+    """获取最近5条活动记录 (读取内存缓冲区，不查询数据库)"""
+    etag = make_etag("activities", BOOT_ID, activity_feed.last_id)
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    set_etag(response, etag)
+    return [
+        {"time": event["time"], "type": event["type"], "message": event["message"]}
+        for event in activity_feed.recent(5)
+    ]
+
+@router.get("/stream")
+async def stream_activities(last_event_id: Optional[str] = Header(None)):
+    """
+    活动推送 (Server-Sent Events)
+
+    断线重连时浏览器会自动带上 Last-Event-ID，从该事件之后继续推送
+    """
+    try:
+        last_id = int(last_event_id) if last_event_id else 0
+    except ValueError:
+        last_id = 0
+
+    return StreamingResponse(
+        activity_feed.stream(last_id, KEEPALIVE_SECONDS),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no" # 关闭 Nginx 缓冲，保证实时推送
+        }
+    )
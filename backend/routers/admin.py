@@ -1,46 +1,100 @@
+import time
+from datetime import datetime
 from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlmodel import Session, select, func
-from database import get_session
+from pydantic import BaseModel, Field
+from sqlalchemy import literal, update
+from sqlmodel import select, func, col, or_, and_, insert, delete
+from sqlmodel.ext.asyncio.session import AsyncSession
+from database import get_async_session
+from dependencies import get_current_admin
 from models import Tempop, Profile
+from services.principal_cache import principal_cache
+from services.counters import bump_counters, USER_COUNT
+from services.pagination import encode_cursor, decode_cursor
 from uuid import UUID
-from typing import List
+from typing import List, Literal, Optional
 
+# 🟢 整个管理接口 (申请列表 / 单个审批 / 批量审批) 仅限管理员调用
 router = APIRouter(
     prefix="/admin",
-    tags=["Admin Protocol (管理员协议)"]
+    tags=["Admin Protocol (管理员协议)"],
+    dependencies=[Depends(get_current_admin)]
 )
 
+# 待审核总数缓存时间 (秒)，审批操作会立即失效
+PENDING_TOTAL_TTL = 30
+_pending_total = {"value": None, "expires": 0.0}
+
+# 单次批量审批的最大人数
+MAX_BULK_REVIEW = 1000
+
+
+class BulkReviewRequest(BaseModel):
+    action: Literal["approve", "reject"]
+    user_ids: List[UUID] = Field(min_length=1, max_length=MAX_BULK_REVIEW)
+
+
+async def _get_pending_total(session: AsyncSession) -> int:
+    """
+    待审核总数 (带缓存，避免每次翻页都 COUNT(*))
+    """
+    now = time.monotonic()
+    if _pending_total["value"] is None or _pending_total["expires"] <= now:
+        total_statement = select(func.count()).where(Tempop.status == "pending").select_from(Tempop)
+        _pending_total["value"] = (await session.exec(total_statement)).one()
+        _pending_total["expires"] = now + PENDING_TOTAL_TTL
+    return _pending_total["value"]
+
+
+def _invalidate_pending_total():
+    _pending_total["value"] = None
+
+
 # 1. 获取申请列表 (支持分页)
 @router.get("/applications")
-def list_applications(
+async def list_applications(
     page: int = Query(1, ge=1), 
     size: int = Query(10, ge=1, le=50), # 默认 10 条一页
-    session: Session = Depends(get_session)
+    # 🟢 游标分页：传入上一页返回的 next_cursor 时忽略 page，按 (applied_at, id) 续读
+    cursor: Optional[str] = Query(None, description="Opaque cursor from next_cursor"),
+    session: AsyncSession = Depends(get_async_session)
 ):
-    # 计算偏移量
-    offset = (page - 1) * size
+    # 查询总数 (缓存)
+    total = await _get_pending_total(session)
     
-    # 查询总数
-    total_statement = select(func.count()).where(Tempop.status == "pending").select_from(Tempop)
-    total = session.exec(total_statement).one()
-    
-    # 查询当前页数据
-    statement = select(Tempop).where(Tempop.status == "pending").offset(offset).limit(size)
-    results = session.exec(statement).all()
+    # 查询当前页数据 (多取一条判断是否还有下一页)
+    statement = select(Tempop).where(Tempop.status == "pending")
+    if cursor:
+        cursor_applied_at, cursor_id = decode_cursor(cursor, UUID)
+        statement = statement.where(or_(
+            Tempop.applied_at > cursor_applied_at,
+            and_(Tempop.applied_at == cursor_applied_at, Tempop.id > cursor_id)
+        ))
+    else:
+        # 兼容旧的页码翻页
+        statement = statement.offset((page - 1) * size)
+    statement = statement.order_by(Tempop.applied_at, Tempop.id).limit(size + 1)
+    results = (await session.exec(statement)).all()
+
+    next_cursor = None
+    if len(results) > size:
+        results = results[:size]
+        next_cursor = encode_cursor(results[-1].applied_at, results[-1].id)
     
     return {
         "items": results,
         "total": total,
         "page": page,
         "size": size,
-        "pages": (total + size - 1) // size
+        "pages": (total + size - 1) // size,
+        "next_cursor": next_cursor
     }
 
 # 2. 批准转正 (Promote)
 @router.post("/approve/{user_id}")
-def approve_operator(user_id: UUID, session: Session = Depends(get_session)):
+async def approve_operator(user_id: UUID, session: AsyncSession = Depends(get_async_session)):
     # A. 查找临时表记录
-    applicant = session.get(Tempop, user_id)
+    applicant = await session.get(Tempop, user_id)
     if not applicant:
         raise HTTPException(status_code=404, detail="Application not found")
 
@@ -64,10 +118,84 @@ def approve_operator(user_id: UUID, session: Session = Depends(get_session)):
     try:
         # C. 事务操作：写入 Profile -> 删除 Tempop -> 提交
         session.add(new_profile)
-        session.delete(applicant) 
-        session.commit()
+        await session.delete(applicant) 
+        await bump_counters(session, {USER_COUNT: 1})
+        await session.commit()
+        # 🟢 身份已从 Tempop 变为 Profile，清除旧缓存
+        principal_cache.invalidate(user_id)
+        _invalidate_pending_total()
         return {"message": f"Operator {official_code} approved successfully."}
         
     except Exception as e:
-        session.rollback()
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        await session.rollback()
+        raise HTTPException(status_code=500, detail=str(e))
+
+# 3. 批量审批 (批准 / 驳回)
+@router.post("/applications/bulk")
+async def bulk_review(req: BulkReviewRequest, session: AsyncSession = Depends(get_async_session)):
+    """
+    批量批准或驳回申请，一个事务内用集合 SQL 完成：
+    - approve: INSERT INTO profiles ... SELECT ... FROM tempop + DELETE FROM tempop
+    - reject: UPDATE tempop SET status = 'rejected'
+    results 中逐个返回 approved / rejected / not_found / conflict
+    """
+    user_ids = list(dict.fromkeys(req.user_ids))
+
+    try:
+        if req.action == "approve":
+            # 只处理待审核的申请，已驳回 / 已处理的不会被提升
+            found = set((await session.exec(
+                select(Tempop.id).where(col(Tempop.id).in_(user_ids), Tempop.status == "pending")
+            )).all())
+            # 已存在正式档案的不重复创建
+            conflicts = set((await session.exec(select(Profile.id).where(col(Profile.id).in_(found)))).all()) if found else set()
+            done = found - conflicts
+
+            if done:
+                # 与单个审批一致：APP-xxxx 升级为 OP-xxxx，归入基建工程部
+                await session.exec(insert(Profile).from_select(
+                    ["id", "code", "role", "department", "email", "avatar_url",
+                     "gender", "age", "address", "bio", "created_at"],
+                    select(
+                        Tempop.id, func.replace(Tempop.code, "APP", "OP"),
+                        literal("admin"), literal("基建工程部"),
+                        Tempop.email, Tempop.avatar_url,
+                        Tempop.gender, Tempop.age, Tempop.address, Tempop.bio,
+                        literal(datetime.now())
+                    ).where(col(Tempop.id).in_(done), Tempop.status == "pending")
+                ))
+                await session.exec(delete(Tempop).where(col(Tempop.id).in_(done)))
+                await bump_counters(session, {USER_COUNT: len(done)})
+            done_status = "approved"
+        else:
+            found = set((await session.exec(
+                select(Tempop.id).where(col(Tempop.id).in_(user_ids), Tempop.status == "pending")
+            )).all())
+            conflicts = set()
+            done = found
+            if done:
+                await session.exec(update(Tempop).where(col(Tempop.id).in_(done)).values(status="rejected"))
+            done_status = "rejected"
+
+        await session.commit()
+
+    except Exception as e:
+        await session.rollback()
+        raise HTTPException(status_code=500, detail=str(e))
+
+    # 身份 / 状态已变化，清除缓存
+    for user_id in done:
+        principal_cache.invalidate(user_id)
+    _invalidate_pending_total()
+
+    results = []
+    for user_id in user_ids:
+        if user_id in done:
+            status = done_status
+        elif user_id in conflicts:
+            status = "conflict"
+        else:
+            status = "not_found"
+        results.append({"id": user_id, "status": status})
+
+    return {"message": f"Bulk {req.action} completed", "count": len(done), "results": results}
@@ -0,0 +1,305 @@
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Union
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import ORJSONResponse
+from pydantic import BaseModel, Field
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import select, desc, col, or_, and_, delete
+from sqlmodel.ext.asyncio.session import AsyncSession
+from starlette.concurrency import run_in_threadpool
+from database import get_async_session
+from models import Blueprint, BlueprintRevision, Profile, Tempop
+from dependencies import get_current_user
+from services.blueprints import (
+    RevisionConflict, RevisionNotFound, UnsupportedDocument,
+    cache_document, commit_revision, evict_blueprint, load_document
+)
+from services.etag import make_etag, etag_matches, not_modified, set_etag
+from services.json_patch import JsonPatchError, apply_patch, diff, resolve_pointer
+from services.pagination import encode_cursor, decode_cursor
+
+router = APIRouter(
+    prefix="/blueprints",
+    tags=["Blueprints (构建蓝图)"]
+)
+
+MAX_PAGE_SIZE = 200
+# 列表只返回元数据，不含文档内容
+SUMMARY_COLUMNS = [
+    Blueprint.id, Blueprint.created_by, Blueprint.name, Blueprint.version,
+    Blueprint.is_public, Blueprint.head_revision, Blueprint.created_at, Blueprint.updated_at
+]
+
+
+class BlueprintMeta(BaseModel):
+    name: Optional[str] = Field(None, min_length=1, max_length=200)
+    version: Optional[str] = Field(None, max_length=50)
+    is_public: Optional[bool] = None
+
+class BlueprintCreate(BaseModel):
+    name: str = Field(min_length=1, max_length=200)
+    version: str = Field("v1.0", max_length=50)
+    is_public: bool = False
+    data: Any = Field(default_factory=dict)
+
+# 整份保存：服务端与当前版本做差异，只写入补丁
+class BlueprintSave(BlueprintMeta):
+    base_revision: int = Field(ge=1)
+    data: Any
+
+# 增量保存：客户端直接提交 JSON Patch (RFC 6902)
+class BlueprintPatch(BlueprintMeta):
+    base_revision: int = Field(ge=1)
+    ops: List[Dict[str, Any]] = Field(max_length=100000)
+
+
+def _is_admin(user: Union[Profile, Tempop]) -> bool:
+    return isinstance(user, Profile) and user.role == "admin"
+
+
+def _summary(blueprint) -> Dict[str, Any]:
+    return {column.key: getattr(blueprint, column.key) for column in SUMMARY_COLUMNS}
+
+
+async def _load(session: AsyncSession, blueprint_id: int, revision: int) -> Any:
+    try:
+        return await load_document(session, blueprint_id, revision)
+    except RevisionNotFound:
+        raise HTTPException(status_code=404, detail="Revision not found")
+
+
+async def _get_blueprint(
+    session: AsyncSession, blueprint_id: int, current_user: Union[Profile, Tempop], write: bool = False
+) -> Blueprint:
+    """
+    读取蓝图并检查权限：公开或自己的蓝图可读，修改仅限创建者与管理员
+    """
+    blueprint = await session.get(Blueprint, blueprint_id)
+    is_owner = blueprint is not None and blueprint.created_by == current_user.id
+    if not blueprint or not (blueprint.is_public or is_owner or _is_admin(current_user)):
+        raise HTTPException(status_code=404, detail="Blueprint not found")
+    if write and not (is_owner or _is_admin(current_user)):
+        raise HTTPException(status_code=403, detail="Permission denied")
+    return blueprint
+
+
+@router.get("/")
+async def read_blueprints(
+    session: AsyncSession = Depends(get_async_session),
+    current_user: Union[Profile, Tempop] = Depends(get_current_user),
+    mine: bool = Query(False, description="Only blueprints created by the current user"),
+    limit: int = Query(50, ge=1, le=MAX_PAGE_SIZE, description="Page size"),
+    cursor: Optional[str] = Query(None, description="Opaque cursor from X-Next-Cursor")
+):
+    """
+    蓝图列表 (仅元数据，按更新时间倒序游标分页)
+    """
+    statement = select(*SUMMARY_COLUMNS)
+    if mine:
+        statement = statement.where(Blueprint.created_by == current_user.id)
+    elif not _is_admin(current_user):
+        statement = statement.where(or_(col(Blueprint.is_public).is_(True), Blueprint.created_by == current_user.id))
+    if cursor:
+        cursor_updated_at, cursor_id = decode_cursor(cursor)
+        statement = statement.where(or_(
+            Blueprint.updated_at < cursor_updated_at,
+            and_(Blueprint.updated_at == cursor_updated_at, Blueprint.id < cursor_id)
+        ))
+    statement = statement.order_by(desc(Blueprint.updated_at), desc(Blueprint.id)).limit(limit + 1)
+    rows = [dict(row._mapping) for row in (await session.exec(statement)).all()]
+
+    response = ORJSONResponse(content=rows[:limit])
+    if len(rows) > limit:
+        response.headers["X-Next-Cursor"] = encode_cursor(rows[limit - 1]["updated_at"], rows[limit - 1]["id"])
+    return response
+
+
+@router.post("/", status_code=201)
+async def create_blueprint(
+    req: BlueprintCreate,
+    session: AsyncSession = Depends(get_async_session),
+    current_user: Union[Profile, Tempop] = Depends(get_current_user)
+):
+    """
+    新建蓝图 (写入第 1 版快照)
+    """
+    if not isinstance(current_user, Profile):
+        raise HTTPException(status_code=403, detail="Only operators can create blueprints")
+
+    blueprint = Blueprint(created_by=current_user.id, name=req.name, version=req.version, is_public=req.is_public)
+    session.add(blueprint)
+    await session.flush()
+    try:
+        revision = await commit_revision(session, blueprint, 0, req.data, None, current_user.id)
+    except UnsupportedDocument as e:
+        await session.rollback()
+        raise HTTPException(status_code=422, detail=f"Unsupported value in blueprint: {e}")
+    await session.commit()
+    cache_document(blueprint.id, revision.revision, req.data)
+    return {**_summary(blueprint), "revision": revision.revision, "size": revision.size}
+
+
+@router.get("/{blueprint_id}")
+async def read_blueprint(
+    blueprint_id: int,
+    request: Request,
+    session: AsyncSession = Depends(get_async_session),
+    current_user: Union[Profile, Tempop] = Depends(get_current_user),
+    pointer: str = Query("", description="JSON pointer (RFC 6901) of the subtree to return, e.g. /entities/3"),
+    revision: Optional[int] = Query(None, ge=1, description="Revision to read (defaults to the latest)")
+):
+    """
+    读取蓝图内容 (可只取 pointer 指向的子树，可读取历史版本)
+    """
+    blueprint = await _get_blueprint(session, blueprint_id, current_user)
+    revision = revision or blueprint.head_revision
+    if revision > blueprint.head_revision:
+        raise HTTPException(status_code=404, detail="Revision not found")
+
+    etag = make_etag("blueprint", blueprint_id, revision, pointer, blueprint.updated_at)
+    if etag_matches(request, etag):
+        return not_modified(etag)
+
+    document = await _load(session, blueprint_id, revision)
+    try:
+        data = resolve_pointer(document, pointer)
+    except JsonPatchError as e:
+        raise HTTPException(status_code=404, detail=f"Pointer not found: {e}")
+
+    response = ORJSONResponse(content={
+        "id": blueprint.id,
+        "name": blueprint.name,
+        "version": blueprint.version,
+        "revision": revision,
+        "head_revision": blueprint.head_revision,
+        "pointer": pointer,
+        "data": data
+    })
+    set_etag(response, etag)
+    return response
+
+
+async def _save(
+    session: AsyncSession,
+    blueprint: Blueprint,
+    req: BlueprintMeta,
+    base_revision: int,
+    compute: Callable[[Any], Any],
+    current_user: Profile
+):
+    """
+    保存新版本：compute(当前文档) -> (新文档, 补丁)，只写入补丁 (或按策略改写快照)
+    """
+    if base_revision != blueprint.head_revision:
+        raise HTTPException(status_code=409, detail=f"Blueprint has moved on to revision {blueprint.head_revision}")
+    metadata = req.model_dump(include={"name", "version", "is_public"}, exclude_none=True)
+
+    head = await _load(session, blueprint.id, base_revision)
+    # 差异计算 / 补丁应用是纯 CPU 计算，大蓝图放到线程池避免阻塞事件循环
+    try:
+        document, operations = await run_in_threadpool(compute, head)
+    except JsonPatchError as e:
+        raise HTTPException(status_code=422, detail=f"Invalid patch: {e}")
+
+    if not operations:
+        # 内容没有变化：只更新元数据，不产生新版本
+        if metadata:
+            for key, value in metadata.items():
+                setattr(blueprint, key, value)
+            blueprint.updated_at = datetime.now()
+            await session.commit()
+        return {"id": blueprint.id, "revision": base_revision, "changed": False}
+
+    try:
+        revision = await commit_revision(session, blueprint, base_revision, document, operations, current_user.id, metadata)
+        await session.commit()
+    except (RevisionConflict, IntegrityError):
+        await session.rollback()
+        raise HTTPException(status_code=409, detail="Blueprint was modified concurrently, reload and retry")
+    except UnsupportedDocument as e:
+        await session.rollback()
+        raise HTTPException(status_code=422, detail=f"Unsupported value in blueprint: {e}")
+    cache_document(blueprint.id, revision.revision, document)
+    return {
+        "id": blueprint.id,
+        "revision": revision.revision,
+        "changed": True,
+        "kind": revision.kind,
+        "size": revision.size,
+        "operations": len(operations)
+    }
+
+
+@router.put("/{blueprint_id}")
+async def save_blueprint(
+    blueprint_id: int,
+    req: BlueprintSave,
+    session: AsyncSession = Depends(get_async_session),
+    current_user: Union[Profile, Tempop] = Depends(get_current_user)
+):
+    """
+    整份保存 (服务端计算与 base_revision 的差异，只写入补丁)
+    """
+    blueprint = await _get_blueprint(session, blueprint_id, current_user, write=True)
+    return await _save(
+        session, blueprint, req, req.base_revision,
+        lambda head: (req.data, diff(head, req.data)),
+        current_user
+    )
+
+
+@router.patch("/{blueprint_id}")
+async def patch_blueprint(
+    blueprint_id: int,
+    req: BlueprintPatch,
+    session: AsyncSession = Depends(get_async_session),
+    current_user: Union[Profile, Tempop] = Depends(get_current_user)
+):
+    """
+    增量保存 (提交 JSON Patch，大蓝图只需上传改动部分)
+    """
+    blueprint = await _get_blueprint(session, blueprint_id, current_user, write=True)
+    # 当前文档与缓存共享，应用补丁时必须复制
+    return await _save(
+        session, blueprint, req, req.base_revision,
+        lambda head: (apply_patch(head, req.ops), req.ops),
+        current_user
+    )
+
+
+@router.get("/{blueprint_id}/revisions")
+async def read_blueprint_revisions(
+    blueprint_id: int,
+    session: AsyncSession = Depends(get_async_session),
+    current_user: Union[Profile, Tempop] = Depends(get_current_user)
+):
+    """
+    版本历史 (不含内容)
+    """
+    await _get_blueprint(session, blueprint_id, current_user)
+    rows = (await session.exec(
+        select(
+            BlueprintRevision.revision, BlueprintRevision.kind, BlueprintRevision.size,
+            BlueprintRevision.created_by, BlueprintRevision.created_at
+        )
+        .where(BlueprintRevision.blueprint_id == blueprint_id)
+        .order_by(desc(BlueprintRevision.revision))
+    )).all()
+    return ORJSONResponse(content=[dict(row._mapping) for row in rows])
+
+
+@router.delete("/{blueprint_id}")
+async def delete_blueprint(
+    blueprint_id: int,
+    session: AsyncSession = Depends(get_async_session),
+    current_user: Union[Profile, Tempop] = Depends(get_current_user)
+):
+    """
+    删除蓝图及全部版本
+    """
+    blueprint = await _get_blueprint(session, blueprint_id, current_user, write=True)
+    await session.exec(delete(BlueprintRevision).where(BlueprintRevision.blueprint_id == blueprint_id))
+    await session.delete(blueprint)
+    await session.commit()
+    evict_blueprint(blueprint_id)
+    return {"message": "Blueprint deleted"}
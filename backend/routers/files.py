@@ -1,93 +1,478 @@
-from typing import List, Union, Optional
-from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlmodel import Session, select, desc, col
-from database import get_session
-from models import File, Profile, Tempop
+import logging
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, Union
+from fastapi import APIRouter, Body, Depends, HTTPException, Query, Request, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, ORJSONResponse, StreamingResponse
+import orjson
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import select, desc, col, or_, and_, delete, insert
+from sqlmodel.ext.asyncio.session import AsyncSession
+from starlette.concurrency import run_in_threadpool
+from database import get_async_session, async_engine
+from models import File, Profile, Tempop, media_category_of
 from dependencies import get_current_user
-from services.storage import generate_presigned_url, delete_file_from_r2
+from services.storage import sign_many, presign_cache
+from services.purge import enqueue_deletions, notify_purge_worker
+from services.counters import bump_counters, file_deltas, read_counter, FILES_VERSION
+from services.etag import make_etag, etag_matches, not_modified, set_etag
+from services.activity_feed import publish_uploads, publish_deletions
+from services.pagination import encode_cursor, decode_cursor, encode_offset_cursor, decode_offset_cursor
+from services.search import apply_search
+from services.derivatives import notify_derivative_worker, pick_cover_variant, variant_keys
+from services.inline_store import resolve_inline_urls
+from services.content_store import ContentUnavailable, release_content, retain_content
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter(
     prefix="/files",
     tags=["File Management (文件管理)"]
 )
 
+async def _register(session: AsyncSession, files: List[File], write: Callable[[], Awaitable[Any]]):
+    """
+    在同一事务内登记对象引用并执行 write() 写入记录，提交后返回 write() 的结果
+
+    两个请求并发首次登记同一内容 (同一 sha256 / 对象键) 时，后提交的一方违反 content_objects 的唯一约束：
+    回滚后重试一次，重试时能看到对方已提交的对象 (同一对象键则引用数 + 1，不同对象键则不参与去重)
+    """
+    for attempt in range(2):
+        try:
+            # 🟢 去重对象引用计数 + 1 (同一事务)
+            await retain_content(session, files)
+            result = await write()
+            # 🟢 同一事务内更新系统计数
+            await bump_counters(session, file_deltas(files, 1))
+            await session.commit()
+            return result
+        except ContentUnavailable:
+            await session.rollback()
+            raise HTTPException(status_code=409, detail="Referenced content is being deleted, upload it again")
+        except IntegrityError:
+            await session.rollback()
+            if attempt:
+                raise HTTPException(status_code=409, detail="Conflicting concurrent upload, retry")
+        except Exception:
+            # 不把 SQL / 参数回传给客户端
+            await session.rollback()
+            logger.exception("❌ Failed to register files")
+            raise HTTPException(status_code=500, detail="Database error")
+
+
 @router.post("/", response_model=File)
-def create_file_record(
+async def create_file_record(
     file_record: File, 
-    session: Session = Depends(get_session),
+    session: AsyncSession = Depends(get_async_session),
     current_user: Union[Profile, Tempop] = Depends(get_current_user)
 ):
     """
     前端上传 R2 成功后，写入数据库
     """
     file_record.uploader_id = current_user.id
-    try:
+    file_record.media_category = media_category_of(file_record.mime_type)
+    # 缩略图 / 时长 / 波形只能由派生管线写入
+    file_record.cover_variants = None
+    file_record.duration = None
+    file_record.waveform_r2_key = None
+
+    async def write():
+        # 回滚后实例会被移出会话 (自增 id 也要清掉)，重试时重新加入
+        file_record.id = None
         session.add(file_record)
-        session.commit()
-        session.refresh(file_record)
-        return file_record
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Database Error: {str(e)}")
+        await session.flush()
 
-@router.get("/", response_model=List[File])
-def read_files(
-    session: Session = Depends(get_session),
-    current_user: Union[Profile, Tempop] = Depends(get_current_user),
-    # 🟢 新增：支持按 MIME 类型前缀过滤 (例如传 'audio/' 只查音频)
-    mime_type_prefix: Optional[str] = Query(None, description="Filter files by MIME type prefix")
+    await _register(session, [file_record], write)
+    await session.refresh(file_record)
+    await publish_uploads([file_record])
+    if file_record.cover_r2_key or file_record.media_category == "audio":
+        notify_derivative_worker()
+    return file_record
+
+# 单次批量登记的最大记录数
+MAX_BATCH_REGISTER = 1000
+
+@router.post("/batch")
+async def create_file_records(
+    file_records: List[File] = Body(..., max_length=MAX_BATCH_REGISTER),
+    session: AsyncSession = Depends(get_async_session),
+    current_user: Union[Profile, Tempop] = Depends(get_current_user)
 ):
     """
-    获取文件列表 (支持权限隔离 + 类型筛选 + 自动签名)
+    批量写入文件记录 (一次鉴权 + 一次批量 INSERT + 一次提交)，按提交顺序返回 id
     """
-    # 1. 基础查询
-    statement = select(File)
+    if not file_records:
+        return {"ids": [], "count": 0}
 
-    # 2. 权限过滤
+    for index, record in enumerate(file_records):
+        # table 模型不做必填校验，这里补上，避免整批在数据库层失败
+        if not record.filename or not record.r2_key:
+            raise HTTPException(status_code=400, detail=f"Record {index}: filename and r2_key are required")
+
+    async def write():
+        # 行在 retain_content 之后构造：content_sha256 以登记结果为准
+        rows = []
+        for record in file_records:
+            row = record.model_dump(exclude={"id"})
+            row["uploader_id"] = current_user.id
+            row["media_category"] = media_category_of(record.mime_type)
+            row["cover_variants"] = None
+            row["duration"] = None
+            row["waveform_r2_key"] = None
+            rows.append(row)
+        ids = (await session.exec(
+            insert(File).returning(File.id, sort_by_parameter_order=True),
+            params=rows
+        )).scalars().all()
+        return rows, ids
+
+    rows, ids = await _register(session, file_records, write)
+    await publish_uploads(file_records)
+    if any(row["cover_r2_key"] or row["media_category"] == "audio" for row in rows):
+        notify_derivative_worker()
+    return {"ids": list(ids), "count": len(ids)}
+
+# 🟢 列表投影允许的字段 (id / created_at 为游标必需字段，始终返回)
+FILE_LIST_FIELDS = {
+    "id", "asset_id", "uploader_id", "filename", "r2_key", "url", "size",
+    "mime_type", "created_at", "artist", "cover_r2_key", "lyrics_r2_key", "cover_variants",
+    "duration", "waveform_r2_key", "content_sha256"
+}
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 500
+# 快速序列化路径按表结构直接取列，跳过 ORM 实例化与 response_model 校验
+ALL_FILE_COLUMNS = [column.name for column in File.__table__.columns]
+
+
+def _parse_fields(fields: Optional[str]) -> Optional[List[str]]:
+    """
+    解析 fields=filename,artist 形式的字段投影参数
+    """
+    if not fields:
+        return None
+    requested = [f.strip() for f in fields.split(",") if f.strip()]
+    unknown = set(requested) - FILE_LIST_FIELDS
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(sorted(unknown))}")
+    # id / created_at 用于游标，必须保留
+    return ["id", "created_at"] + [f for f in requested if f not in ("id", "created_at")]
+
+
+# 可能指向内联小对象 (inline/ 键) 的字段
+INLINE_FIELDS = ("r2_key", "cover_r2_key", "lyrics_r2_key")
+
+
+async def _inline_urls(session: AsyncSession, request: Request, rows: List[Dict[str, Any]], embed: bool = False) -> Dict[str, str]:
+    """
+    当前页内联对象的链接 (后端地址；embed 时内嵌为 data: URL)
+    """
+    keys = [row[field] for row in rows for field in INLINE_FIELDS if row.get(field)]
+    return await resolve_inline_urls(session, keys, str(request.base_url), embed)
+
+
+def _sign_rows(
+    rows: List[Dict[str, Any]],
+    cover_size: Optional[int] = None,
+    inline_urls: Optional[Dict[str, str]] = None
+) -> List[Dict[str, Any]]:
+    """
+    批量为记录生成访问链接 (仅签名行中存在的字段)
+
+    指定 cover_size 时封面签名最接近该尺寸的 WebP 缩略图 (尚未生成时仍为原图)；
+    inline_urls 中的内联对象直接使用给定链接，不做预签名
+    """
+    # 1. 收集待签名的 (行, 字段, 签名参数)
+    targets = []
+    for row in rows:
+        # 签名主文件
+        if "url" in row and row.get("r2_key"):
+            targets.append((row, "url", (row["r2_key"], row.get("filename"))))
+        # 签名封面图 (暂时把 URL 塞回 key 字段传给前端)
+        if row.get("cover_r2_key"):
+            cover_key = row["cover_r2_key"]
+            if cover_size:
+                cover_key = pick_cover_variant(cover_key, row.get("cover_variants"), cover_size)
+            targets.append((row, "cover_r2_key", cover_key))
+        # 签名歌词文件
+        if row.get("lyrics_r2_key"):
+            targets.append((row, "lyrics_r2_key", row["lyrics_r2_key"]))
+        # 签名波形峰值 JSON (播放器先取这几 KB 画波形)
+        if row.get("waveform_r2_key"):
+            targets.append((row, "waveform_r2_key", row["waveform_r2_key"]))
+
+    # 2. 内联对象直接替换，其余一次性签名，失败的保留原值
+    inline_urls = inline_urls or {}
+    remote = []
+    for row, field, key in targets:
+        object_name = key if isinstance(key, str) else key[0]
+        if object_name in inline_urls:
+            row[field] = inline_urls[object_name]
+        else:
+            remote.append((row, field, key))
+    signed = sign_many([key for _, _, key in remote])
+    for (row, field, _), url in zip(remote, signed):
+        if url:
+            row[field] = url
+
+    return rows
+
+
+def _load_columns(columns: List[str]) -> list:
+    """
+    投影查询实际需要加载的列 (签名主文件还需要 r2_key 与 filename)
+    """
+    load_columns = list(columns)
+    if "url" in columns:
+        load_columns += [c for c in ("r2_key", "filename") if c not in load_columns]
+    # 按尺寸签名封面需要缩略图列表
+    if "cover_r2_key" in columns and "cover_variants" not in load_columns:
+        load_columns.append("cover_variants")
+    return [getattr(File, c) for c in load_columns]
+
+
+def _apply_list_filters(statement, current_user: Union[Profile, Tempop], mime_type_prefix: Optional[str]):
+    """
+    列表查询的公共过滤条件：权限隔离 + 类型筛选
+    """
+    # 权限过滤
     is_admin = isinstance(current_user, Profile) and current_user.role == "admin"
     if not is_admin:
         # 普通用户只能看自己的
         statement = statement.where(File.uploader_id == current_user.id)
-    
-    # 🟢 3. 类型过滤 (核心新增)
+
+    # 🟢 类型过滤
+    # 'audio/' 这类主类型前缀走 media_category 索引，更细的前缀 (如 'audio/fl') 再追加 LIKE
     if mime_type_prefix:
-        statement = statement.where(File.mime_type.startswith(mime_type_prefix))
+        category, slash, subtype = mime_type_prefix.partition("/")
+        if slash:
+            statement = statement.where(File.media_category == category.lower())
+        if not slash or subtype:
+            statement = statement.where(File.mime_type.startswith(mime_type_prefix))
 
-    # 4. 排序
-    statement = statement.order_by(desc(File.created_at))
-        
-    results = session.exec(statement).all()
+    return statement
+
+
+@router.get("/", response_model=List[File])
+async def read_files(
+    request: Request,
+    response: Response,
+    session: AsyncSession = Depends(get_async_session),
+    current_user: Union[Profile, Tempop] = Depends(get_current_user),
+    # 🟢 新增：支持按 MIME 类型前缀过滤 (例如传 'audio/' 只查音频)
+    mime_type_prefix: Optional[str] = Query(None, description="Filter files by MIME type prefix"),
+    # 🟢 游标分页：不传 limit 时按默认页大小返回，完整导出请使用 /files/export
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE, description="Page size"),
+    cursor: Optional[str] = Query(None, description="Opaque cursor from X-Next-Cursor"),
+    # 🟢 字段投影：例如 fields=filename,url,artist
+    fields: Optional[str] = Query(None, description="Comma separated fields to return"),
+    # 🟢 快速路径：行直接构造成字典并用 orjson 输出，不经过 response_model 二次校验
+    fast: bool = Query(False, description="Serialize rows with orjson and skip response-model validation"),
+    # 🟢 封面尺寸：签名最接近该尺寸的缩略图，而不是原图
+    cover_size: Optional[int] = Query(None, ge=16, le=4096, description="Preferred cover thumbnail size in px"),
+    # 🟢 内联小对象 (歌词等) 直接以 data: URL 嵌入列表，播放器无需再发请求
+    embed_inline: bool = Query(False, description="Embed inline objects (e.g. lyrics) as data: URLs")
+):
+    """
+    获取文件列表 (支持权限隔离 + 类型筛选 + 游标分页 + 字段投影 + 自动签名)
+
+    下一页游标通过 X-Next-Cursor 响应头返回，没有更多数据时不返回该头
+    """
+    columns = _parse_fields(fields)
+    load_all_columns = fast and not columns
+
+    # 0. 条件请求：版本号 + 用户 + 查询参数 + 签名时间窗口均未变化时直接 304，不查询也不签名
+    files_version = await read_counter(session, FILES_VERSION)
+    etag = None
+    if files_version is not None:
+        etag = make_etag(
+            "files", files_version, str(current_user.id), getattr(current_user, "role", None),
+            sorted(request.query_params.multi_items()), presign_cache.current_bucket()
+        )
+        if etag_matches(request, etag):
+            return not_modified(etag)
+
+    # 1. 基础查询 (投影时只取需要的列)
+    if columns:
+        statement = select(*_load_columns(columns))
+    elif load_all_columns:
+        statement = select(*[getattr(File, c) for c in ALL_FILE_COLUMNS])
+    else:
+        statement = select(File)
+
+    # 2. 权限过滤 + 3. 类型过滤
+    statement = _apply_list_filters(statement, current_user, mime_type_prefix)
+
+    # 4. 游标定位 (keyset: created_at DESC, id DESC)
+    if cursor:
+        cursor_created_at, cursor_id = decode_cursor(cursor)
+        statement = statement.where(or_(
+            File.created_at < cursor_created_at,
+            and_(File.created_at == cursor_created_at, File.id < cursor_id)
+        ))
+
+    # 5. 排序 (id 作为同一时间戳下的稳定次序)
+    # 多取一条用于判断是否还有下一页
+    statement = statement.order_by(desc(File.created_at), desc(File.id)).limit(limit + 1)
+
+    if columns or load_all_columns:
+        rows = [dict(row._mapping) for row in (await session.exec(statement)).all()]
+    else:
+        rows = [file.model_dump() for file in (await session.exec(statement)).all()]
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1]["created_at"], rows[-1]["id"])
+
+    # 6. 动态生成 URL (只签名当前页)
+    # 签名是纯 CPU 计算，放到线程池避免大页面阻塞事件循环
+    inline_urls = await _inline_urls(session, request, rows, embed_inline)
+    await run_in_threadpool(_sign_rows, rows, cover_size, inline_urls)
+
+    if columns or fast:
+        # 投影结果不满足 File 模型的必填字段 / 快速路径不走模型校验，直接返回 JSON
+        if columns:
+            rows = [{c: row[c] for c in columns} for row in rows]
+        if fast:
+            direct = ORJSONResponse(content=rows)
+        else:
+            direct = JSONResponse(content=jsonable_encoder(rows))
+        if next_cursor:
+            direct.headers["X-Next-Cursor"] = next_cursor
+        set_etag(direct, etag)
+        return direct
+
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    set_etag(response, etag)
+    return rows
+
+# 检索每页默认 / 最大条数
+SEARCH_PAGE_SIZE = 50
+MAX_SEARCH_PAGE_SIZE = 100
+
+
+@router.get("/search")
+async def search_files(
+    request: Request,
+    session: AsyncSession = Depends(get_async_session),
+    current_user: Union[Profile, Tempop] = Depends(get_current_user),
+    q: str = Query(..., min_length=1, max_length=200, description="Search text (filename / artist)"),
+    mime_type_prefix: Optional[str] = Query(None, description="Filter files by MIME type prefix"),
+    limit: int = Query(SEARCH_PAGE_SIZE, ge=1, le=MAX_SEARCH_PAGE_SIZE, description="Page size"),
+    cursor: Optional[str] = Query(None, description="Opaque cursor from X-Next-Cursor"),
+    cover_size: Optional[int] = Query(None, ge=16, le=4096, description="Preferred cover thumbnail size in px"),
+    embed_inline: bool = Query(False, description="Embed inline objects (e.g. lyrics) as data: URLs")
+):
+    """
+    按文件名 / 艺术家全文检索 (相关度排序 + 分页 + 自动签名)
+
+    每条结果附带 score 字段；下一页游标通过 X-Next-Cursor 响应头返回
+    """
+    offset = decode_offset_cursor(cursor) if cursor else 0
+
+    # 0. 条件请求 (同 read_files)
+    files_version = await read_counter(session, FILES_VERSION)
+    etag = None
+    if files_version is not None:
+        etag = make_etag(
+            "search", files_version, str(current_user.id), getattr(current_user, "role", None),
+            sorted(request.query_params.multi_items()), presign_cache.current_bucket()
+        )
+        if etag_matches(request, etag):
+            return not_modified(etag)
+
+    # 1. 检索条件 (按方言走 tsvector / FTS5 索引)
+    statement = select(*[getattr(File, c) for c in ALL_FILE_COLUMNS])
+    statement, score = apply_search(statement, session.bind.dialect.name, q)
+    if statement is None:
+        raise HTTPException(status_code=400, detail="Search text has no searchable terms")
+
+    # 2. 权限过滤 + 类型过滤
+    statement = _apply_list_filters(statement, current_user, mime_type_prefix)
+
+    # 3. 相关度排序，同分按时间倒序；多取一条判断是否还有下一页
+    statement = (
+        statement.add_columns(score.label("score"))
+        .order_by(desc("score"), desc(File.created_at), desc(File.id))
+        .offset(offset)
+        .limit(limit + 1)
+    )
+    rows = [dict(row._mapping) for row in (await session.exec(statement)).all()]
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_offset_cursor(offset + limit)
+
+    for row in rows:
+        row["score"] = round(float(row["score"] or 0), 4)
+    inline_urls = await _inline_urls(session, request, rows, embed_inline)
+    await run_in_threadpool(_sign_rows, rows, cover_size, inline_urls)
+
+    direct = ORJSONResponse(content=rows)
+    if next_cursor:
+        direct.headers["X-Next-Cursor"] = next_cursor
+    set_etag(direct, etag)
+    return direct
+
+
+# 导出时每批从数据库游标取出并签名的行数
+EXPORT_BATCH_SIZE = 500
+
+
+@router.get("/export")
+async def export_files(
+    request: Request,
+    current_user: Union[Profile, Tempop] = Depends(get_current_user),
+    mime_type_prefix: Optional[str] = Query(None, description="Filter files by MIME type prefix"),
+    fields: Optional[str] = Query(None, description="Comma separated fields to return"),
+    cover_size: Optional[int] = Query(None, ge=16, le=4096, description="Preferred cover thumbnail size in px")
+):
+    """
+    流式导出文件列表 (NDJSON，每行一条记录)
+
+    使用服务端游标分批读取，逐批签名后立即写出，内存占用与数据量无关
+    """
+    columns = _parse_fields(fields) or sorted(FILE_LIST_FIELDS - {"id", "created_at"})
+    if columns[:2] != ["id", "created_at"]:
+        columns = ["id", "created_at"] + columns
+
+    statement = _apply_list_filters(select(*_load_columns(columns)), current_user, mime_type_prefix)
+    statement = statement.order_by(desc(File.created_at), desc(File.id))
+
+    async def generate():
+        # 流式响应在依赖释放后才开始发送，这里单独持有会话
+        async with AsyncSession(async_engine) as session:
+            result = await session.stream(statement.execution_options(yield_per=EXPORT_BATCH_SIZE))
+            async for partition in result.mappings().partitions(EXPORT_BATCH_SIZE):
+                rows = [dict(row) for row in partition]
+                inline_urls = await _inline_urls(session, request, rows)
+                await run_in_threadpool(_sign_rows, rows, cover_size, inline_urls)
+                yield b"".join(orjson.dumps({c: row[c] for c in columns}) + b"\n" for row in rows)
+
+    return StreamingResponse(generate(), media_type="application/x-ndjson")
+
+
+def _object_keys(file, retained: Set[str] = frozenset()) -> List[str]:
+    """
+    文件在 R2 上需要清理的对象 (主文件 + 封面 + 歌词 + 派生缩略图 / 波形)，内联对象由清理任务从数据库删除
+
+    retained 为仍被其他文件引用的去重对象，它们及其派生对象保留
+    """
+    keys = [key for key in (file.r2_key, file.cover_r2_key, file.lyrics_r2_key) if key and key not in retained]
+    return keys + variant_keys(file, retained)
 
-    # 5. 动态生成 URL
-    for file in results:
-        # 签名主文件
-        signed_url = generate_presigned_url(file.r2_key, file.filename)
-        if signed_url:
-            file.url = signed_url
-        
-        # 🟢 新增：签名封面图
-        if file.cover_r2_key:
-            signed_cover = generate_presigned_url(file.cover_r2_key)
-            if signed_cover:
-                file.cover_r2_key = signed_cover # 暂时把 URL 塞回 key 字段传给前端
-        
-        # 🟢 新增：签名歌词文件
-        if file.lyrics_r2_key:
-            signed_lyric = generate_presigned_url(file.lyrics_r2_key)
-            if signed_lyric:
-                file.lyrics_r2_key = signed_lyric
-
-    return results
 
 @router.delete("/{file_id}")
-def delete_file(
+async def delete_file(
     file_id: int,
-    session: Session = Depends(get_session),
+    session: AsyncSession = Depends(get_async_session),
     current_user: Union[Profile, Tempop] = Depends(get_current_user)
 ):
     """
-    单文件删除
+    单文件删除 (R2 对象由后台任务异步清理，包括封面与歌词)
     """
-    file_record = session.get(File, file_id)
+    file_record = await session.get(File, file_id)
     if not file_record:
         raise HTTPException(status_code=404, detail="File not found")
 
@@ -98,43 +483,75 @@ def delete_file(
         raise HTTPException(status_code=403, detail="Permission denied")
 
     try:
-        delete_file_from_r2(file_record.r2_key)
-        session.delete(file_record)
-        session.commit()
-        return {"message": "File deleted"}
+        # 删除记录与登记待删对象在同一事务内完成
+        await session.delete(file_record)
+        retained = await release_content(session, [file_record])
+        enqueue_deletions(session, _object_keys(file_record, retained))
+        await bump_counters(session, file_deltas([file_record], -1))
+        await session.commit()
     except Exception as e:
-        session.rollback()
+        await session.rollback()
         raise HTTPException(status_code=500, detail=str(e))
 
+    notify_purge_worker()
+    await publish_deletions([file_record])
+    return {"message": "File deleted"}
+
 @router.post("/batch-delete")
-def batch_delete_files(
+async def batch_delete_files(
     file_ids: List[int],
-    session: Session = Depends(get_session),
+    session: AsyncSession = Depends(get_async_session),
     current_user: Union[Profile, Tempop] = Depends(get_current_user)
 ):
     """
     批量删除文件
+
+    数据库记录用一条 DELETE ... WHERE id IN (...) 删除，R2 对象写入删除队列由后台任务清理；
+    results 中逐个返回 deleted / not_found / forbidden
     """
-    statement = select(File).where(col(File.id).in_(file_ids))
-    files = session.exec(statement).all()
+    # 1. 只取删除需要的列
+    statement = select(
+        File.id, File.uploader_id, File.filename, File.mime_type,
+        File.r2_key, File.cover_r2_key, File.lyrics_r2_key,
+        File.cover_variants, File.waveform_r2_key
+    ).where(col(File.id).in_(file_ids))
+    files = (await session.exec(statement)).all()
     
     if not files:
-        return {"message": "No files found", "deleted_count": 0}
+        return {"message": "No files found", "deleted_count": 0, "results": [
+            {"id": file_id, "status": "not_found"} for file_id in file_ids
+        ]}
 
     is_admin = isinstance(current_user, Profile) and current_user.role == "admin"
+
+    # 2. 权限过滤
+    found = {file.id: file for file in files}
+    allowed = [file for file in files if is_admin or file.uploader_id == current_user.id]
+    allowed_ids = {file.id for file in allowed}
     
-    deleted_count = 0
-    
+    # 3. 删除记录 + 登记待删对象 (主文件 + 伴随文件)，同一事务提交
     try:
-        for file in files:
-            if is_admin or file.uploader_id == current_user.id:
-                delete_file_from_r2(file.r2_key)
-                session.delete(file)
-                deleted_count += 1
-        
-        session.commit()
-        return {"message": "Batch delete completed", "deleted_count": deleted_count}
-        
+        if allowed:
+            await session.exec(delete(File).where(col(File.id).in_(allowed_ids)))
+            retained = await release_content(session, allowed)
+            enqueue_deletions(session, [key for file in allowed for key in _object_keys(file, retained)])
+            await bump_counters(session, file_deltas(allowed, -1))
+            await session.commit()
     except Exception as e:
-        session.rollback()
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        await session.rollback()
+        raise HTTPException(status_code=500, detail=str(e))
+
+    notify_purge_worker()
+    await publish_deletions(allowed)
+
+    # 4. 逐个汇报结果
+    results = []
+    for file_id in file_ids:
+        if file_id not in found:
+            results.append({"id": file_id, "status": "not_found"})
+        elif file_id in allowed_ids:
+            results.append({"id": file_id, "status": "deleted"})
+        else:
+            results.append({"id": file_id, "status": "forbidden"})
+
+    return {"message": "Batch delete completed", "deleted_count": len(allowed_ids), "results": results}
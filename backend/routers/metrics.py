@@ -0,0 +1,62 @@
+import hmac
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import PlainTextResponse
+from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
+from config import settings
+from services.metrics import render_metrics, register_gauge
+from services.storage import get_presign_cache_stats
+from services.principal_cache import get_principal_cache_stats
+from services.activity_feed import activity_feed
+from services.startup import startup_report
+
+bearer = HTTPBearer(auto_error=False)
+
+
+def require_metrics_token(credentials: Optional[HTTPAuthorizationCredentials] = Depends(bearer)):
+    """
+    指标包含路由、缓存与连接池等内部信息，只对持有 METRICS_TOKEN 的抓取端开放
+    """
+    if not settings.METRICS_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if credentials is None or not hmac.compare_digest(credentials.credentials.encode(), settings.METRICS_TOKEN.encode()):
+        raise HTTPException(status_code=401, detail="Invalid metrics token", headers={"WWW-Authenticate": "Bearer"})
+
+
+router = APIRouter(
+    tags=["Metrics"],
+    dependencies=[Depends(require_metrics_token)]
+)
+
+# Prometheus 文本格式的 Content-Type
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _cache_samples(name: str, stats: dict, field: str):
+    return [({"cache": name}, stats[field])]
+
+
+# --- 进程内缓存状态 (渲染时读取) ---
+for _field in ("size", "hits", "misses"):
+    register_gauge(
+        f"endfield_cache_{_field}",
+        f"In-process cache {_field}.",
+        lambda field=_field: _cache_samples("presign", get_presign_cache_stats(), field)
+            + _cache_samples("principal", get_principal_cache_stats(), field)
+    )
+register_gauge(
+    "endfield_startup_phase_seconds",
+    "Cold-start time per phase (import, create_tables, migrations, ...).",
+    lambda: [({"phase": name}, seconds) for name, seconds in startup_report.phases.items()]
+)
+register_gauge(
+    "endfield_activity_feed_subscribers",
+    "Open SSE activity stream connections.",
+    lambda: [({}, activity_feed.subscriber_count)]
+)
+
+
+@router.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+def read_metrics():
+    """Prometheus 抓取端点：请求延迟、DB / R2 开销、连接池与缓存状态"""
+    return PlainTextResponse(render_metrics(), media_type=CONTENT_TYPE)
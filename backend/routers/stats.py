@@ -1,7 +1,10 @@
-from fastapi import APIRouter, Depends
-from sqlmodel import Session, select, func
-from database import get_session
-from models import File, Profile
+from fastapi import APIRouter, Depends, Request, Response
+from sqlmodel.ext.asyncio.session import AsyncSession
+from database import get_async_session
+from services.counters import read_counters, reconcile_counters, ALL_COUNTERS, FILE_COUNT, TRACK_COUNT, USER_COUNT
+from services.storage import get_presign_cache_stats
+from services.principal_cache import get_principal_cache_stats
+from services.etag import make_etag, etag_matches, not_modified, set_etag
 
 router = APIRouter(
     prefix="/stats",
@@ -9,24 +12,40 @@ router = APIRouter(
 )
 
 @router.get("/")
-def get_system_stats(session: Session = Depends(get_session)):
-    """获取系统统计数据"""
+async def get_system_stats(
+    request: Request,
+    response: Response,
+    session: AsyncSession = Depends(get_async_session)
+):
+    """获取系统统计数据 (读取增量维护的计数器)"""
     
-    # 统计文件总数
-    file_count = session.exec(select(func.count(File.id))).one()
+    counters = await read_counters(session)
+
+    # 计数器尚未初始化 (例如首次启动时对账任务还没跑完)，立即对账一次
+    if any(name not in counters for name in ALL_COUNTERS):
+        counters = await reconcile_counters(session)
     
-    # 统计音频文件数
-    track_count = session.exec(
-        select(func.count(File.id))
-        .where(File.mime_type.like('audio/%'))
-    ).one()
+    # 计数器本身就是版本：任何写操作都会改变它们
+    etag = make_etag("stats", sorted(counters.items()))
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    set_etag(response, etag)
     
-    # 统计用户数
-    user_count = session.exec(select(func.count(Profile.id))).one()
+    file_count = counters[FILE_COUNT]
+    track_count = counters[TRACK_COUNT]
+    user_count = counters[USER_COUNT]
     
     return {
         "fileCount": file_count,
         "trackCount": track_count,
         "userCount": user_count,
         "systemStatus": "ACTIVE"
-    }
\ No newline at end of file
+    }
+
+@router.get("/cache")
+def get_cache_stats():
+    """获取进程内缓存命中统计"""
+    return {
+        "presign": get_presign_cache_stats(),
+        "principal": get_principal_cache_stats()
+    }
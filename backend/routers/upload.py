@@ -1,25 +1,258 @@
-from fastapi import APIRouter, HTTPException
-from pydantic import BaseModel
-from services.storage import generate_presigned_post
+import uuid
+from urllib.parse import quote
+from typing import List, Optional, Union
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from pydantic import BaseModel, Field
+from sqlalchemy.exc import IntegrityError
+from sqlmodel.ext.asyncio.session import AsyncSession
+from starlette.concurrency import run_in_threadpool
+from config import settings
+from database import get_async_session
+from models import InlineObject, Profile, Tempop
+from dependencies import get_current_user
+from services.content_store import find_reusable
+from services.inline_store import (
+    INLINE_PREFIX, inline_media_type, inline_upload_url, inline_url, is_inline_candidate, new_inline_key
+)
+from services.upload_tokens import INLINE_UPLOAD, MULTIPART_UPLOAD, issue_token, verify_token
+from services.storage import (
+    generate_presigned_post,
+    create_multipart_upload,
+    presign_upload_parts,
+    complete_multipart_upload,
+    abort_multipart_upload,
+    public_url,
+    UPLOAD_PREFIX
+)
 
 router = APIRouter(
     prefix="/upload",
     tags=["File Upload (文件上传)"]
 )
 
+# S3 分片编号范围为 1 ~ 10000
+MAX_PART_NUMBER = 10000
+# 单次最多签发的分片链接数
+MAX_PARTS_PER_REQUEST = 1000
+
 # 定义请求模型：前端只需要传这俩参数
 class UploadRequest(BaseModel):
     filename: str      # 例如: "reactor_blueprint.glb"
     content_type: str  # 例如: "model/gltf-binary"
+    # 🟢 可选：文件大小 (字节)，小文本 / JSON 会改为内联存储，upload_url 指向后端而非 R2
+    size: Optional[int] = Field(None, ge=0)
+    # 🟢 可选：内容 SHA-256 (十六进制)，与 size 一起提供时已存在的相同内容直接复用，跳过上传
+    sha256: Optional[str] = Field(None, pattern=r"^[0-9a-fA-F]{64}$")
+
+# 分片上传请求模型
+class MultipartTarget(BaseModel):
+    file_key: str      # initiate 返回的对象键
+    upload_id: str     # initiate 返回的 upload_id
+    upload_token: str  # initiate 返回的 upload_token (绑定对象键、upload_id 与发起用户)
+
+class PartsRequest(MultipartTarget):
+    part_numbers: List[int] = Field(min_length=1, max_length=MAX_PARTS_PER_REQUEST)
+
+class CompletedPart(BaseModel):
+    part_number: int = Field(ge=1, le=MAX_PART_NUMBER)
+    etag: str          # 分片 PUT 响应头中的 ETag
+
+class CompleteRequest(MultipartTarget):
+    parts: List[CompletedPart] = Field(min_length=1)
+
+
+def _check_upload_key(req: MultipartTarget, current_user: Union[Profile, Tempop]):
+    # 只允许操作直传目录下的对象，防止借分片接口覆盖其他对象
+    if not req.file_key.startswith(UPLOAD_PREFIX):
+        raise HTTPException(status_code=400, detail="Invalid file key")
+    # 只有发起上传的用户才能继续 / 完成 / 放弃该上传
+    if not verify_token(req.upload_token, MULTIPART_UPLOAD, req.file_key, req.upload_id, user_id=current_user.id):
+        raise HTTPException(status_code=403, detail="Invalid or expired upload token")
 
 @router.post("/presigned")
-def get_upload_url(req: UploadRequest):
+async def get_upload_url(
+    req: UploadRequest,
+    request: Request,
+    session: AsyncSession = Depends(get_async_session),
+    current_user: Union[Profile, Tempop] = Depends(get_current_user)
+):
     """
     获取预签名上传链接 (不经过后端服务器直传 R2)
+
+    - 声明了 size 且满足内联条件时返回后端的上传地址 (inline: true)，PUT 方式不变
+    - 提供 sha256 + size 且本人已上传过相同内容时返回现有对象 (exists: true, upload_url 为空)，
+      客户端跳过上传，登记文件时带上 content_sha256 即可；其他用户的对象不会复用
     """
-    result = generate_presigned_post(req.filename, req.content_type)
+    if is_inline_candidate(req.content_type, req.size):
+        object_name = new_inline_key(req.filename)
+        base_url = str(request.base_url)
+        return {
+            "upload_url": inline_upload_url(base_url, object_name, current_user.id),
+            "file_key": object_name,
+            "public_url": inline_url(base_url, object_name),
+            "inline": True
+        }
+
+    if req.sha256:
+        existing = await find_reusable(session, req.sha256, req.size, current_user.id)
+        if existing:
+            return {
+                "upload_url": None,
+                "file_key": existing.r2_key,
+                "public_url": public_url(existing.r2_key),
+                "exists": True
+            }
+
+    result = await run_in_threadpool(generate_presigned_post, req.filename, req.content_type)
     
     if not result:
         raise HTTPException(status_code=500, detail="Failed to generate upload URL")
     
-    return result
\ No newline at end of file
+    return result
+
+@router.post("/multipart/initiate")
+def initiate_multipart_upload(
+    req: UploadRequest,
+    current_user: Union[Profile, Tempop] = Depends(get_current_user)
+):
+    """
+    发起分片上传 (大文件并行 / 断点续传)
+
+    返回的 upload_token 需在后续 parts / complete / abort 请求中原样带上
+    """
+    result = create_multipart_upload(req.filename, req.content_type)
+
+    if not result:
+        raise HTTPException(status_code=500, detail="Failed to initiate multipart upload")
+
+    result["upload_token"] = issue_token(
+        MULTIPART_UPLOAD, current_user.id, result["file_key"], result["upload_id"],
+        ttl=settings.MULTIPART_UPLOAD_TTL
+    )
+    return result
+
+@router.post("/multipart/parts")
+def get_part_urls(
+    req: PartsRequest,
+    current_user: Union[Profile, Tempop] = Depends(get_current_user)
+):
+    """
+    批量获取分片上传链接，客户端可并行 PUT 各分片，失败的分片单独重新获取
+    """
+    _check_upload_key(req, current_user)
+    if any(n < 1 or n > MAX_PART_NUMBER for n in req.part_numbers):
+        raise HTTPException(status_code=400, detail=f"Part numbers must be between 1 and {MAX_PART_NUMBER}")
+
+    parts = presign_upload_parts(req.file_key, req.upload_id, sorted(set(req.part_numbers)))
+
+    if parts is None:
+        raise HTTPException(status_code=500, detail="Failed to generate part URLs")
+
+    return {"file_key": req.file_key, "upload_id": req.upload_id, "parts": parts}
+
+@router.post("/multipart/complete")
+def finish_multipart_upload(
+    req: CompleteRequest,
+    current_user: Union[Profile, Tempop] = Depends(get_current_user)
+):
+    """
+    所有分片上传完成后合并为完整对象
+    """
+    _check_upload_key(req, current_user)
+    part_numbers = [p.part_number for p in req.parts]
+    if len(set(part_numbers)) != len(part_numbers):
+        raise HTTPException(status_code=400, detail="Duplicate part numbers")
+
+    result = complete_multipart_upload(
+        req.file_key,
+        req.upload_id,
+        [(p.part_number, p.etag) for p in req.parts]
+    )
+
+    if not result:
+        raise HTTPException(status_code=500, detail="Failed to complete multipart upload")
+
+    return result
+
+@router.post("/multipart/abort")
+def cancel_multipart_upload(
+    req: MultipartTarget,
+    current_user: Union[Profile, Tempop] = Depends(get_current_user)
+):
+    """
+    放弃分片上传，清理已上传的分片
+    """
+    _check_upload_key(req, current_user)
+
+    if not abort_multipart_upload(req.file_key, req.upload_id):
+        raise HTTPException(status_code=500, detail="Failed to abort multipart upload")
+
+    return {"message": "Multipart upload aborted"}
+
+
+# 内联对象在客户端 / CDN 侧可永久缓存 (键唯一且只能写入一次)
+INLINE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+
+def _inline_key(name: str) -> str:
+    # 只做格式检查 ("<uuid>-<文件名>")；写入权限由 PUT 时校验的上传凭证保证
+    try:
+        uuid.UUID(name[:36])
+    except ValueError:
+        raise HTTPException(status_code=404, detail="Object not found")
+    if name[36:37] != "-":
+        raise HTTPException(status_code=404, detail="Object not found")
+    return INLINE_PREFIX + name
+
+
+@router.put("/inline/{name:path}", status_code=201)
+async def put_inline_object(
+    name: str,
+    request: Request,
+    token: Optional[str] = Query(None, description="Upload token issued by /upload/presigned"),
+    session: AsyncSession = Depends(get_async_session)
+):
+    """
+    写入内联小对象 (/presigned 返回 inline: true 时的 upload_url，每个键只能写入一次)
+
+    upload_url 中的 token 与对象键、签发用户绑定并会过期，未经 /presigned 签发的键无法写入
+    """
+    key = _inline_key(name)
+    if not verify_token(token, INLINE_UPLOAD, key):
+        raise HTTPException(status_code=403, detail="Invalid or expired upload token")
+    content_type = request.headers.get("content-type")
+
+    # 边读边检查大小，超限立即拒绝，不把大请求体读进内存
+    data = bytearray()
+    async for chunk in request.stream():
+        data += chunk
+        if len(data) > settings.INLINE_MAX_BYTES:
+            raise HTTPException(status_code=413, detail=f"Inline objects are limited to {settings.INLINE_MAX_BYTES} bytes")
+    if not is_inline_candidate(content_type, len(data)):
+        raise HTTPException(status_code=415, detail="Content type is not eligible for inline storage")
+
+    session.add(InlineObject(key=key, content_type=inline_media_type(content_type), size=len(data), data=bytes(data)))
+    try:
+        await session.commit()
+    except IntegrityError:
+        await session.rollback()
+        raise HTTPException(status_code=409, detail="Object already exists")
+    return {"file_key": key, "size": len(data)}
+
+
+@router.get("/inline/{name:path}")
+async def get_inline_object(name: str, session: AsyncSession = Depends(get_async_session)):
+    """
+    读取内联小对象 (与预签名链接一样凭不可猜测的键访问，无需登录)
+
+    与 API 同源返回，因此只按白名单类型输出，并与预签名链接一样强制下载、禁止嗅探
+    """
+    obj = await session.get(InlineObject, _inline_key(name))
+    if not obj:
+        raise HTTPException(status_code=404, detail="Object not found")
+    media_type = inline_media_type(obj.content_type) or "text/plain"
+    return Response(content=obj.data, media_type=f"{media_type}; charset=utf-8", headers={
+        "Cache-Control": INLINE_CACHE_CONTROL,
+        "Content-Disposition": f"attachment; filename*=UTF-8''{quote(name[37:])}",
+        "X-Content-Type-Options": "nosniff"
+    })
@@ -11,14 +11,16 @@
 """
 
 from typing import Union, Optional, Dict, Any
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlmodel import Session
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
+from sqlmodel.ext.asyncio.session import AsyncSession
 from pydantic import BaseModel
 
-from database import get_session
+from database import get_async_session
 from models import Profile, Tempop
 from dependencies import get_current_user
-from services.storage import generate_presigned_url
+from services.storage import generate_presigned_url, presign_cache
+from services.etag import make_etag, etag_matches, not_modified, set_etag
+from services.principal_cache import principal_cache
 
 
 # ==================== 路由器配置 ====================
@@ -138,10 +140,24 @@ def _update_user_fields(
 
 
 @router.get("/me")
-def read_users_me(current_user: Union[Profile, Tempop] = Depends(get_current_user)):
+def read_users_me(
+    request: Request,
+    response: Response,
+    current_user: Union[Profile, Tempop] = Depends(get_current_user)
+):
     """
     获取当前登录用户的详细档案信息
     """
+    # 版本 = 用户档案快照 + 签名时间窗口 (头像链接按窗口轮换)
+    # PATCH /users/me 与审批会失效用户缓存，快照随之变化
+    etag = make_etag(
+        "users/me", type(current_user).__name__, current_user.model_dump(),
+        presign_cache.current_bucket()
+    )
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    set_etag(response, etag)
+
     # 处理头像链接 (保持原逻辑)
     real_avatar_url = None
     if current_user.avatar_url:
@@ -182,9 +198,9 @@ def read_users_me(current_user: Union[Profile, Tempop] = Depends(get_current_use
 
 
 @router.patch("/me")
-def update_user_me(
+async def update_user_me(
     user_update: UserUpdate,
-    session: Session = Depends(get_session),
+    session: AsyncSession = Depends(get_async_session),
     current_user: Union[Profile, Tempop] = Depends(get_current_user)
 ):
     # 更新通用字段
@@ -210,9 +226,11 @@ def update_user_me(
     
     try:
         session.add(current_user)
-        session.commit()
-        session.refresh(current_user)
+        await session.commit()
+        # 🟢 写后失效，下次请求重新从数据库加载
+        principal_cache.invalidate(current_user.id)
+        await session.refresh(current_user)
         return {"message": "Profile updated", "user": current_user.model_dump()}
     except Exception as e:
-        session.rollback()
+        await session.rollback()
         raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
@@ -0,0 +1,144 @@
+import asyncio
+import json
+from collections import deque
+from datetime import datetime
+from typing import AsyncIterator, List, Optional
+
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from config import settings
+from models import File, media_category_of
+
+
+class ActivityFeed:
+    """
+    进程内最近活动环形缓冲区
+
+    文件新增 / 删除时写入，轮询接口与 SSE 推送都直接读取这里，不再查询数据库。
+    事件 id 单调递增 (进程内)，SSE 客户端通过 Last-Event-ID 断线续传。
+    """
+
+    def __init__(self, maxlen: int):
+        self.maxlen = maxlen
+        self._events = deque(maxlen=maxlen)
+        self._next_id = 1
+        self._changed: Optional[asyncio.Condition] = None
+        # 当前打开的 SSE 连接数 (/metrics)
+        self.subscriber_count = 0
+
+    def _condition(self) -> asyncio.Condition:
+        # 延迟创建，确保绑定到运行中的事件循环
+        if self._changed is None:
+            self._changed = asyncio.Condition()
+        return self._changed
+
+    def _append(self, event_type: str, message: str, at: datetime) -> dict:
+        event = {
+            "id": self._next_id,
+            "time": at.strftime("%H:%M"),
+            "type": event_type,
+            "message": message
+        }
+        self._next_id += 1
+        self._events.append(event)
+        return event
+
+    async def publish(self, event_type: str, message: str, at: Optional[datetime] = None) -> dict:
+        event = self._append(event_type, message, at or datetime.now())
+        async with self._condition():
+            self._condition().notify_all()
+        return event
+
+    def preload(self, items: List[tuple]):
+        """
+        批量写入历史事件 (event_type, message, at)，不通知订阅者
+        """
+        for event_type, message, at in items:
+            self._append(event_type, message, at)
+
+    @property
+    def last_id(self) -> int:
+        return self._next_id - 1
+
+    def recent(self, limit: int) -> List[dict]:
+        """
+        最新的 limit 条事件，按时间倒序
+        """
+        return list(reversed(self._events))[:limit]
+
+    def since(self, last_id: int) -> List[dict]:
+        """
+        id 大于 last_id 的事件，按时间正序
+        """
+        return [event for event in self._events if event["id"] > last_id]
+
+    async def stream(self, last_id: int, keepalive: float) -> AsyncIterator[str]:
+        """
+        生成 SSE 文本帧：先补发 last_id 之后的事件，再等待新事件
+        """
+        # 重启后旧 id 失效，从缓冲区起点续传
+        if self._events and last_id >= self._next_id:
+            last_id = 0
+        self.subscriber_count += 1
+        try:
+            while True:
+                for event in self.since(last_id):
+                    last_id = event["id"]
+                    yield f"id: {event['id']}\nevent: activity\ndata: {json.dumps(event, ensure_ascii=False)}\n\n"
+                try:
+                    async with self._condition():
+                        # 持锁再检查一次，避免补发与等待之间发布的事件被漏掉
+                        if self._next_id - 1 > last_id:
+                            continue
+                        await asyncio.wait_for(self._condition().wait(), timeout=keepalive)
+                except asyncio.TimeoutError:
+                    # 注释帧保活，防止代理断开空闲连接
+                    yield ": keepalive\n\n"
+        finally:
+            self.subscriber_count -= 1
+
+
+activity_feed = ActivityFeed(settings.ACTIVITY_BUFFER_SIZE)
+
+
+def _upload_message(filename: str, mime_type: Optional[str]) -> str:
+    # 判断文件类型
+    if media_category_of(mime_type) == 'audio':
+        return f'Audio track "{filename}" uploaded'
+    return f'File "{filename}" uploaded'
+
+
+async def publish_uploads(files: List[File]):
+    """
+    记录上传事件；批量上传合并为一条，避免冲掉缓冲区
+    """
+    if len(files) == 1:
+        await activity_feed.publish("upload", _upload_message(files[0].filename, files[0].mime_type), files[0].created_at)
+    elif files:
+        await activity_feed.publish("upload", f"{len(files)} files uploaded")
+
+
+async def publish_deletions(files: List[File]):
+    """
+    记录删除事件；批量删除合并为一条
+    """
+    if len(files) == 1:
+        await activity_feed.publish("delete", f'File "{files[0].filename}" deleted')
+    elif files:
+        await activity_feed.publish("delete", f"{len(files)} files deleted")
+
+
+async def warm_activity_feed(session: AsyncSession):
+    """
+    启动时用最近的上传记录填充缓冲区，重启后首页不会显示为空
+    """
+    recent_files = (await session.exec(
+        select(File.filename, File.mime_type, File.created_at)
+        .order_by(File.created_at.desc(), File.id.desc())
+        .limit(activity_feed.maxlen)
+    )).all()
+    activity_feed.preload([
+        ("upload", _upload_message(file.filename, file.mime_type), file.created_at)
+        for file in reversed(recent_files)
+    ])
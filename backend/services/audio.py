@@ -0,0 +1,98 @@
+"""
+音频时长 / 波形峰值分析
+
+在派生进程池 (spawn) 中执行：对象从 R2 按块流式读取并边读边解码 (miniaudio)，
+解码时直接降为单声道 8 kHz，只保留每个窗口的峰值，内存占用与文件大小无关。
+"""
+from typing import Dict, Iterable, Iterator, List, Optional
+
+# 分析用采样率：波形只需要包络，8 kHz 足够且解码 / 统计量最小
+ANALYSIS_SAMPLE_RATE = 8000
+# 细粒度窗口：每 256 个采样 (32ms) 记一个峰值，解码结束后再合并到目标点数
+WINDOW = 256
+FRAMES_PER_READ = 4096
+FULL_SCALE = 32767
+
+# 流式解码不能回退重新探测格式，必须预先指定解码器 (MIME -> miniaudio.FileFormat 名称)
+DECODER_FORMATS = {
+    "audio/mpeg": "MP3",
+    "audio/mp3": "MP3",
+    "audio/flac": "FLAC",
+    "audio/x-flac": "FLAC",
+    "audio/wav": "WAV",
+    "audio/wave": "WAV",
+    "audio/x-wav": "WAV",
+    "audio/vnd.wave": "WAV",
+    "audio/ogg": "VORBIS",
+    "audio/vorbis": "VORBIS",
+}
+
+
+def decoder_format(mime_type: Optional[str]) -> Optional[str]:
+    return DECODER_FORMATS.get((mime_type or "").lower())
+
+
+def _downsample(peaks: List[int], count: int) -> List[int]:
+    if len(peaks) <= count:
+        return peaks
+    step = len(peaks) / count
+    return [max(peaks[int(i * step):int((i + 1) * step)] or [0]) for i in range(count)]
+
+
+def analyze_chunks(chunks: Iterable[bytes], file_format: str, peaks_count: int) -> Dict:
+    """
+    解码字节块流，返回 {"duration": 秒, "peaks": [0-255, ...]} (峰值相对满幅度量化为 8 位)
+    """
+    import miniaudio
+
+    class ChunkSource(miniaudio.StreamableSource):
+        def __init__(self, iterator: Iterator[bytes]):
+            self._iterator = iterator
+            self._buffer = b""
+
+        def read(self, num_bytes: int) -> bytes:
+            while len(self._buffer) < num_bytes:
+                chunk = next(self._iterator, None)
+                if chunk is None:
+                    break
+                self._buffer += chunk
+            data, self._buffer = self._buffer[:num_bytes], self._buffer[num_bytes:]
+            return data
+
+    stream = miniaudio.stream_any(
+        ChunkSource(iter(chunks)),
+        source_format=getattr(miniaudio.FileFormat, file_format),
+        output_format=miniaudio.SampleFormat.SIGNED16,
+        nchannels=1,
+        sample_rate=ANALYSIS_SAMPLE_RATE,
+        frames_to_read=FRAMES_PER_READ,
+    )
+
+    frames = 0
+    peaks = []
+    pending = None  # 上一块末尾不足一个窗口的采样
+    for samples in stream:
+        frames += len(samples)
+        if pending:
+            samples = pending + samples
+        usable = len(samples) - len(samples) % WINDOW
+        for start in range(0, usable, WINDOW):
+            window = samples[start:start + WINDOW]
+            peaks.append(max(max(window), -min(window)))
+        pending = samples[usable:]
+    if pending:
+        peaks.append(max(max(pending), -min(pending)))
+
+    peaks = _downsample(peaks, peaks_count)
+    return {
+        "duration": round(frames / ANALYSIS_SAMPLE_RATE, 3),
+        "peaks": [min(255, round(peak * 255 / FULL_SCALE)) for peak in peaks],
+    }
+
+
+def analyze_object(object_name: str, file_format: str, peaks_count: int) -> Dict:
+    """
+    进程池入口：流式读取 R2 对象并分析
+    """
+    from services.storage import stream_object
+    return analyze_chunks(stream_object(object_name), file_format, peaks_count)
@@ -0,0 +1,180 @@
+"""
+蓝图版本存储 (压缩快照 + JSON Patch 增量)
+
+- 保存只写入相对上一版本的补丁；距上次快照的增量达到 BLUEPRINT_SNAPSHOT_INTERVAL 个，
+  或增量累计大小超过快照本身时改写一份完整快照，读取时需要回放的补丁数因此有上限
+- 快照与补丁都以 zlib 压缩后的 JSON 存储
+- blueprints.head_revision 做乐观并发控制：保存时基于的版本不是最新版本则拒绝 (409)
+- 各版本内容不可变，还原后的文档按 (蓝图, 版本) 缓存在进程内，连续的局部读取不必重复回放
+"""
+import threading
+import zlib
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+from uuid import UUID
+
+import orjson
+from sqlalchemy import update
+from sqlmodel import select, desc
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from config import settings
+from models import Blueprint, BlueprintRevision
+from services.json_patch import apply_patch
+
+SNAPSHOT = "snapshot"
+DELTA = "delta"
+
+_documents: "OrderedDict[Tuple[int, int], Any]" = OrderedDict()
+_documents_lock = threading.Lock()
+
+
+def cache_document(blueprint_id: int, revision: int, document: Any):
+    if settings.BLUEPRINT_CACHE_SIZE <= 0:
+        return
+    with _documents_lock:
+        _documents[(blueprint_id, revision)] = document
+        _documents.move_to_end((blueprint_id, revision))
+        while len(_documents) > settings.BLUEPRINT_CACHE_SIZE:
+            _documents.popitem(last=False)
+
+
+def evict_blueprint(blueprint_id: int):
+    with _documents_lock:
+        for key in [key for key in _documents if key[0] == blueprint_id]:
+            del _documents[key]
+
+
+class RevisionConflict(Exception):
+    """
+    保存时基于的版本已不是最新版本
+    """
+
+
+class RevisionNotFound(LookupError):
+    """
+    找不到可用于还原该版本的快照 (历史数据缺失第 1 版快照等)
+    """
+
+
+class UnsupportedDocument(ValueError):
+    """
+    文档包含无法按 JSON 存储的值 (如超出 64 位的整数：orjson 无法编码，读回时也会变成浮点数)
+    """
+
+
+def encode(value: Any) -> bytes:
+    try:
+        return zlib.compress(orjson.dumps(value), 6)
+    except TypeError as e:
+        raise UnsupportedDocument(str(e))
+
+
+def decode(payload: bytes) -> Any:
+    return orjson.loads(zlib.decompress(payload))
+
+
+async def load_document(session: AsyncSession, blueprint_id: int, revision: int) -> Any:
+    """
+    还原指定版本的文档：最近的快照 + 之后的增量
+
+    返回值与缓存共享，调用方不能修改
+    """
+    with _documents_lock:
+        cached = _documents.get((blueprint_id, revision))
+        if cached is not None:
+            _documents.move_to_end((blueprint_id, revision))
+            return cached
+
+    snapshot = (await session.exec(
+        select(BlueprintRevision.revision, BlueprintRevision.payload)
+        .where(
+            BlueprintRevision.blueprint_id == blueprint_id,
+            BlueprintRevision.kind == SNAPSHOT,
+            BlueprintRevision.revision <= revision
+        )
+        .order_by(desc(BlueprintRevision.revision))
+        .limit(1)
+    )).first()
+    if snapshot is None:
+        raise RevisionNotFound(f"Blueprint {blueprint_id} has no snapshot at or before revision {revision}")
+
+    document = decode(snapshot.payload)
+    deltas = (await session.exec(
+        select(BlueprintRevision.payload)
+        .where(
+            BlueprintRevision.blueprint_id == blueprint_id,
+            BlueprintRevision.revision > snapshot.revision,
+            BlueprintRevision.revision <= revision
+        )
+        .order_by(BlueprintRevision.revision)
+    )).all()
+    for payload in deltas:
+        document = apply_patch(document, decode(payload), in_place=True)
+    cache_document(blueprint_id, revision, document)
+    return document
+
+
+async def _chain_since_snapshot(session: AsyncSession, blueprint_id: int, head: int) -> Tuple[int, int, int]:
+    """
+    返回 (最近快照大小, 之后的增量个数, 增量累计大小)
+    """
+    rows = (await session.exec(
+        select(BlueprintRevision.kind, BlueprintRevision.size)
+        .where(BlueprintRevision.blueprint_id == blueprint_id, BlueprintRevision.revision <= head)
+        .order_by(desc(BlueprintRevision.revision))
+        .limit(settings.BLUEPRINT_SNAPSHOT_INTERVAL + 1)
+    )).all()
+    deltas = 0
+    delta_bytes = 0
+    for kind, size in rows:
+        if kind == SNAPSHOT:
+            return size, deltas, delta_bytes
+        deltas += 1
+        delta_bytes += size
+    # 超出查询窗口仍未遇到快照：视为需要重新快照
+    return 0, deltas, delta_bytes
+
+
+async def commit_revision(
+    session: AsyncSession,
+    blueprint: Blueprint,
+    base_revision: int,
+    document: Any,
+    operations: Optional[List[Dict[str, Any]]],
+    user_id: Optional[UUID] = None,
+    metadata: Optional[Dict[str, Any]] = None
+) -> BlueprintRevision:
+    """
+    在调用方事务内写入新版本 (不提交)；operations 为 None 表示新建蓝图，写入初始快照
+
+    document 为保存后的完整文档 (决定改写快照时使用)，基于的版本已过期时抛出 RevisionConflict
+    """
+    if operations is None:
+        kind, payload = SNAPSHOT, encode(document)
+    else:
+        payload = encode(operations)
+        snapshot_size, deltas, delta_bytes = await _chain_since_snapshot(session, blueprint.id, base_revision)
+        if deltas + 1 >= settings.BLUEPRINT_SNAPSHOT_INTERVAL or delta_bytes + len(payload) > snapshot_size:
+            kind, payload = SNAPSHOT, encode(document)
+        else:
+            kind = DELTA
+
+    revision = base_revision + 1
+    values = {"head_revision": revision, "updated_at": datetime.now(), **(metadata or {})}
+    # 条件更新：并发保存时只有一个能从 base_revision 前进
+    result = await session.exec(
+        update(Blueprint)
+        .where(Blueprint.id == blueprint.id, Blueprint.head_revision == base_revision)
+        .values(**values)
+    )
+    if not result.rowcount:
+        raise RevisionConflict(blueprint.id)
+
+    row = BlueprintRevision(
+        blueprint_id=blueprint.id, revision=revision, kind=kind,
+        payload=payload, size=len(payload), created_by=user_id
+    )
+    session.add(row)
+    return row
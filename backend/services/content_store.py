@@ -0,0 +1,205 @@
+"""
+内容寻址上传去重 (SHA-256 + 引用计数)
+
+1. 客户端上传前先把 sha256 + size 发给 /upload/presigned，本人已上传过相同内容 (且已校验) 时直接返回现有对象键，跳过上传
+   (只复用本人文件引用的对象：仅凭哈希不能证明持有内容，否则知道哈希就能拿到别人的私有文件，也能借此探测文件是否存在)
+2. 登记文件时 (create_file_record / batch) 对记录引用的每个对象键 ref_count + 1；
+   携带 content_sha256 的新对象登记为未校验的 ContentObject
+3. 删除文件时 ref_count - 1，只有降到 0 的对象 (以及从未登记的对象) 才进入清理队列
+4. 后台任务流式读取未校验对象重新计算哈希，与客户端声明一致才标记 verified，不一致则取消登记
+   (客户端声明的哈希不可信，否则伪造哈希就能让别人的文件指向错误内容)
+"""
+import asyncio
+import hashlib
+import logging
+import re
+from collections import Counter
+from typing import Dict, Iterable, Optional, Set
+from uuid import UUID
+
+from sqlalchemy import bindparam, update
+from sqlmodel import select, col, delete, or_
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from config import settings
+from models import ContentObject, File, StorageDeletion
+from services.inline_store import is_inline_key
+from services.storage import stream_object
+
+logger = logging.getLogger(__name__)
+
+# 计入引用计数的文件字段
+REFERENCE_FIELDS = ("r2_key", "cover_r2_key", "lyrics_r2_key")
+# 同一对象在本进程内最多校验次数 (重启后清零)
+MAX_VERIFY_ATTEMPTS = 3
+
+_verify_attempts: Dict[str, int] = {}
+
+_content = ContentObject.__table__
+
+SHA256_PATTERN = re.compile(r"[0-9a-f]{64}")
+
+
+class ContentUnavailable(Exception):
+    """
+    引用的对象已进入清理队列 (最后一个引用刚被删除)，客户端需要重新上传
+    """
+
+
+def _references(files) -> Counter:
+    return Counter(
+        key for file in files for field in REFERENCE_FIELDS
+        if (key := getattr(file, field, None)) and not is_inline_key(key)
+    )
+
+
+async def find_reusable(
+    session: AsyncSession, sha256: str, size: Optional[int], owner_id: UUID
+) -> Optional[ContentObject]:
+    """
+    查找可复用的已校验对象 (大小也必须一致，且必须被 owner_id 本人上传的文件引用)
+    """
+    if size is None:
+        return None
+    owned = select(File.id).where(
+        File.uploader_id == owner_id,
+        or_(*(getattr(File, field) == ContentObject.r2_key for field in REFERENCE_FIELDS))
+    )
+    return (await session.exec(
+        select(ContentObject).where(
+            ContentObject.sha256 == sha256.lower(),
+            col(ContentObject.verified).is_(True),
+            ContentObject.size == size,
+            owned.exists()
+        )
+    )).first()
+
+
+async def retain_content(session: AsyncSession, files: Iterable[File]):
+    """
+    在调用方事务内登记文件对对象的引用 (不提交)，并修正 files 的 content_sha256
+
+    引用的对象正在等待清理时抛出 ContentUnavailable
+    """
+    files = list(files)
+    references = _references(files)
+    if not references:
+        return
+
+    # 1. 先锁住已登记对象的行：与并发的 release_content 串行化。
+    #    对方先拿到锁时，等它提交后行已被删除、对象键已进入清理队列，下面的检查会发现
+    registered = dict((await session.exec(
+        select(ContentObject.r2_key, ContentObject.sha256)
+        .where(col(ContentObject.r2_key).in_(list(references)))
+        .with_for_update()
+    )).all())
+
+    # 必须在加锁之后检查：否则刚被释放的对象会在下面被当作新对象重新登记，文件指向即将删除的对象
+    pending = (await session.exec(
+        select(StorageDeletion.r2_key).where(col(StorageDeletion.r2_key).in_(list(references))).limit(1)
+    )).first()
+    if pending:
+        raise ContentUnavailable(pending)
+
+    # 已锁定的行引用数 + n
+    if registered:
+        await session.exec(
+            _content.update()
+            .where(_content.c.r2_key == bindparam("key"))
+            .values(ref_count=_content.c.ref_count + bindparam("n")),
+            params=[{"key": key, "n": references[key]} for key in registered]
+        )
+
+    # 2. 新对象按客户端声明的哈希登记，等待后台校验
+    for file in files:
+        sha256 = (file.content_sha256 or "").lower()
+        file.content_sha256 = sha256 if SHA256_PATTERN.fullmatch(sha256) else None
+    claimed = {file.content_sha256 for file in files if file.content_sha256 and file.r2_key not in registered}
+    taken = set((await session.exec(
+        select(ContentObject.sha256).where(col(ContentObject.sha256).in_(list(claimed)))
+    )).all()) if claimed else set()
+    for file in files:
+        if file.r2_key in registered:
+            file.content_sha256 = registered[file.r2_key]
+            continue
+        sha256 = file.content_sha256
+        # 同一内容已由其他对象键登记 (并发上传同一文件) / 内联对象：不参与去重
+        if not sha256 or sha256 in taken or is_inline_key(file.r2_key):
+            file.content_sha256 = None
+            continue
+        session.add(ContentObject(
+            sha256=sha256, r2_key=file.r2_key, size=file.size, ref_count=references[file.r2_key]
+        ))
+        registered[file.r2_key] = sha256
+        taken.add(sha256)
+        file.content_sha256 = sha256
+
+
+async def release_content(session: AsyncSession, files: Iterable) -> Set[str]:
+    """
+    在调用方事务内释放文件对对象的引用 (不提交)，返回仍被其他文件引用、不能删除的对象键
+    """
+    references = _references(files)
+    if not references:
+        return set()
+
+    await session.exec(
+        _content.update()
+        .where(_content.c.r2_key == bindparam("key"))
+        .values(ref_count=_content.c.ref_count - bindparam("n")),
+        params=[{"key": key, "n": n} for key, n in references.items()]
+    )
+    counts = dict((await session.exec(
+        select(ContentObject.r2_key, ContentObject.ref_count)
+        .where(col(ContentObject.r2_key).in_(list(references)))
+    )).all())
+    released = [key for key, count in counts.items() if count <= 0]
+    if released:
+        await session.exec(delete(ContentObject).where(col(ContentObject.r2_key).in_(released)))
+    return {key for key, count in counts.items() if count > 0}
+
+
+def _sha256_of(r2_key: str) -> str:
+    # hashlib 处理大块数据时释放 GIL，可以直接在线程中执行
+    digest = hashlib.sha256()
+    for chunk in stream_object(r2_key):
+        digest.update(chunk)
+    return digest.hexdigest()
+
+
+async def verify_pending_content(session: AsyncSession) -> int:
+    """
+    校验一批未校验的对象，返回本批取出的行数
+    """
+    exhausted = [sha for sha, attempts in _verify_attempts.items() if attempts >= MAX_VERIFY_ATTEMPTS]
+    statement = select(ContentObject.sha256, ContentObject.r2_key).where(col(ContentObject.verified).is_(False))
+    if exhausted:
+        statement = statement.where(col(ContentObject.sha256).not_in(exhausted))
+    rows = (await session.exec(statement.limit(settings.DERIVATIVE_BATCH_SIZE))).all()
+    if not rows:
+        return 0
+
+    limit = asyncio.Semaphore(settings.DERIVATIVE_WORKERS * 2)
+
+    async def verify(sha256: str, r2_key: str):
+        async with limit:
+            try:
+                return sha256, r2_key, await asyncio.to_thread(_sha256_of, r2_key)
+            except Exception as e:
+                _verify_attempts[sha256] = _verify_attempts.get(sha256, 0) + 1
+                logger.error("❌ Content verification failed for %s: %s", r2_key, e)
+                return sha256, r2_key, None
+
+    for sha256, r2_key, actual in await asyncio.gather(*(verify(*row) for row in rows)):
+        if actual is None:
+            continue
+        _verify_attempts.pop(sha256, None)
+        if actual == sha256:
+            await session.exec(update(ContentObject).where(ContentObject.sha256 == sha256).values(verified=True))
+            continue
+        # 哈希不符：取消登记，文件保留各自的对象，删除时按未登记对象直接清理
+        logger.warning("⚠️ Content hash mismatch for %s (claimed %s, actual %s)", r2_key, sha256, actual)
+        await session.exec(delete(ContentObject).where(ContentObject.sha256 == sha256))
+        await session.exec(update(File).where(File.r2_key == r2_key).values(content_sha256=None))
+    await session.commit()
+    return len(rows)
@@ -0,0 +1,121 @@
+import asyncio
+import logging
+from datetime import datetime
+from typing import Dict, Iterable
+
+from sqlalchemy import update
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import select, func
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from database import async_engine
+from models import File, Profile, SystemCounter, media_category_of
+
+logger = logging.getLogger(__name__)
+
+
+# --- 计数器名称 ---
+FILE_COUNT = "file_count"
+TRACK_COUNT = "track_count"
+USER_COUNT = "user_count"
+# 文件列表版本号：任何文件写操作都 +1，用于生成 /files 的 ETag (不参与对账)
+FILES_VERSION = "files_version"
+
+ALL_COUNTERS = (FILE_COUNT, TRACK_COUNT, USER_COUNT, FILES_VERSION)
+
+
+def _count_statements():
+    """
+    各计数器对应的真实统计语句 (对账使用)
+    """
+    return {
+        FILE_COUNT: select(func.count(File.id)),
+        TRACK_COUNT: select(func.count(File.id)).where(File.media_category == 'audio'),
+        USER_COUNT: select(func.count(Profile.id)),
+    }
+
+
+def file_deltas(files: Iterable[File], sign: int = 1) -> Dict[str, int]:
+    """
+    计算新增 (sign=1) 或删除 (sign=-1) 一批文件带来的计数变化
+    """
+    deltas = {FILE_COUNT: 0, TRACK_COUNT: 0, FILES_VERSION: 0}
+    for file in files:
+        deltas[FILE_COUNT] += sign
+        if media_category_of(file.mime_type) == 'audio':
+            deltas[TRACK_COUNT] += sign
+    # 版本号只增不减，删除后也不会与旧版本撞 ETag
+    if deltas[FILE_COUNT]:
+        deltas[FILES_VERSION] = 1
+    return deltas
+
+
+async def bump_counters(session: AsyncSession, deltas: Dict[str, int]):
+    """
+    在调用方事务内原子地累加计数 (不提交)
+    """
+    for name, delta in deltas.items():
+        if not delta:
+            continue
+        await session.exec(
+            update(SystemCounter)
+            .where(SystemCounter.name == name)
+            .values(value=SystemCounter.value + delta, updated_at=datetime.now())
+        )
+
+
+async def read_counters(session: AsyncSession) -> Dict[str, int]:
+    """
+    读取全部计数器 (单次主键表扫描，与数据量无关)
+    """
+    rows = (await session.exec(select(SystemCounter))).all()
+    return {row.name: row.value for row in rows}
+
+
+async def reconcile_counters(session: AsyncSession) -> Dict[str, int]:
+    """
+    用真实 COUNT 覆盖计数器，修正漂移并补齐缺失的计数行
+    """
+    existing = set((await session.exec(select(SystemCounter.name))).all())
+    missing = [name for name in ALL_COUNTERS if name not in existing]
+    if missing:
+        session.add_all([SystemCounter(name=name, value=0) for name in missing])
+        try:
+            await session.flush()
+        except IntegrityError:
+            # 并发的对账 (启动时的后台任务 / 首次访问 /stats) 已经补齐了计数行
+            await session.rollback()
+
+    # 每个计数器一条 UPDATE ... = (SELECT COUNT ...)，不在应用层先读后写。
+    # 这并不能完全消除竞态：READ COMMITTED 下子查询的快照在语句开始时确定，
+    # 若 bump_counters 的事务恰好在子查询与写入之间提交，这次增量会被覆盖，直到下一轮对账才修正。
+    # 计数器只保证最终一致 (偏差最多持续一个 COUNTER_RECONCILE_SECONDS 周期)，不为此加表锁阻塞写入
+    for name, statement in _count_statements().items():
+        await session.exec(
+            update(SystemCounter)
+            .where(SystemCounter.name == name)
+            .values(value=statement.scalar_subquery(), updated_at=datetime.now())
+        )
+    await session.commit()
+    return await read_counters(session)
+
+
+async def run_counter_reconciler(interval: int):
+    """
+    后台对账任务：启动时立即执行一次，之后每 interval 秒执行一次
+    """
+    while True:
+        try:
+            async with AsyncSession(async_engine, expire_on_commit=False) as session:
+                await reconcile_counters(session)
+        except Exception as e:
+            logger.error("❌ Counter reconcile failed: %s", e)
+        await asyncio.sleep(interval)
+
+
+async def read_counter(session: AsyncSession, name: str):
+    """
+    读取单个计数器 (主键查询)，不存在时返回 None
+    """
+    counter = await session.get(SystemCounter, name)
+    return counter.value if counter else None
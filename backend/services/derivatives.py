@@ -0,0 +1,258 @@
+"""
+派生文件管线
+
+- 封面缩略图：files.cover_variants 为 NULL 且有封面的行就是待处理队列 (ix_files_cover_pending 部分索引)。
+  下载原图 -> 进程池里缩放并编码为 WebP -> 上传到 derived/covers/ -> 回写 cover_variants。
+- 音频波形：waveform_r2_key 为 NULL 的音频行 (ix_files_audio_pending)。进程池里流式读取并解码 ->
+  时长 + 峰值数组 -> 上传到 derived/waveforms/ (几 KB 的 JSON) -> 回写 duration / waveform_r2_key。
+  播放器只需先取这个小对象即可画出波形、显示时长，不必等待音频本体。
+- 去重对象校验：同一循环中顺带重新计算未校验 ContentObject 的哈希 (见 services/content_store.py)。
+
+队列本身就在 files 表里，进程重启后未完成的行会被自动重新处理；多实例同时处理同一行只会重复写入相同的对象。
+"""
+import asyncio
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Set, Tuple
+
+import orjson
+from sqlalchemy import update
+from sqlmodel import select, col
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from config import settings
+from database import async_engine
+from models import File
+from services.audio import DECODER_FORMATS, analyze_object, decoder_format
+from services.content_store import verify_pending_content
+from services.counters import bump_counters, FILES_VERSION
+from services.imaging import render_webp_variants
+from services.inline_store import INLINE_PREFIX
+from services.purge import enqueue_deletions, notify_purge_worker
+from services.storage import download_object, upload_object
+
+logger = logging.getLogger(__name__)
+
+COVER_VARIANT_PREFIX = "derived/covers/"
+WAVEFORM_PREFIX = "derived/waveforms/"
+# 波形 JSON 格式版本 (峰值量化方式变化时递增)
+WAVEFORM_VERSION = 1
+# 派生对象内容由原图唯一决定，可长期缓存
+DERIVED_CACHE_CONTROL = "public, max-age=31536000, immutable"
+# 同一文件在本进程内最多重试次数 (重启后清零)
+MAX_ATTEMPTS = 3
+
+_pool: Optional[ProcessPoolExecutor] = None
+_wakeup: Optional[asyncio.Event] = None
+_attempts: Dict[Tuple[str, int], int] = {}
+
+
+def cover_variant_key(cover_r2_key: str, size: int) -> str:
+    return f"{COVER_VARIANT_PREFIX}{size}/{cover_r2_key}.webp"
+
+
+def waveform_key(r2_key: str) -> str:
+    return f"{WAVEFORM_PREFIX}{r2_key}.json"
+
+
+def variant_keys(file, retained: Set[str] = frozenset()) -> List[str]:
+    """
+    文件的派生对象键 (删除文件时一并清理)；源对象仍被其他文件引用 (在 retained 中) 时其派生对象保留
+    """
+    keys = []
+    if file.cover_r2_key not in retained:
+        keys += (file.cover_variants or {}).values()
+    if file.waveform_r2_key and file.r2_key not in retained:
+        keys.append(file.waveform_r2_key)
+    return keys
+
+
+def pick_cover_variant(cover_r2_key: str, variants: Optional[Dict[str, str]], size: int) -> str:
+    """
+    选择不小于 size 的最小缩略图；都比 size 小时用最大的一张；尚未派生时返回原图
+    """
+    if not variants:
+        return cover_r2_key
+    sizes = sorted(int(s) for s in variants)
+    chosen = next((s for s in sizes if s >= size), sizes[-1])
+    return variants[str(chosen)]
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        # spawn：不从带事件循环与连接池的 API 进程 fork，子进程只导入 services.imaging / services.audio
+        _pool = ProcessPoolExecutor(
+            max_workers=settings.DERIVATIVE_WORKERS,
+            mp_context=multiprocessing.get_context("spawn")
+        )
+    return _pool
+
+
+def shutdown_derivative_pool():
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+def notify_derivative_worker():
+    """
+    有新封面 / 音频入库时唤醒后台任务
+    """
+    if _wakeup is not None:
+        _wakeup.set()
+
+
+async def derive_cover(cover_r2_key: str) -> Dict[str, str]:
+    """
+    生成并上传一张封面的全部缩略图，返回 {尺寸: 对象键}
+    """
+    data = await asyncio.to_thread(download_object, cover_r2_key, settings.COVER_MAX_BYTES)
+    loop = asyncio.get_running_loop()
+    images = await loop.run_in_executor(
+        _get_pool(), render_webp_variants, data, settings.COVER_VARIANT_SIZES, settings.COVER_WEBP_QUALITY
+    )
+    variants = {str(size): cover_variant_key(cover_r2_key, size) for size in images}
+    await asyncio.gather(*(
+        asyncio.to_thread(upload_object, variants[str(size)], body, "image/webp", DERIVED_CACHE_CONTROL)
+        for size, body in images.items()
+    ))
+    return variants
+
+
+async def analyze_audio(r2_key: str, mime_type: str) -> Dict:
+    """
+    流式分析一个音频文件 (进程池内直接从 R2 读取)，上传波形对象，返回需回写的列
+    """
+    loop = asyncio.get_running_loop()
+    result = await loop.run_in_executor(
+        _get_pool(), analyze_object, r2_key, decoder_format(mime_type), settings.WAVEFORM_PEAKS
+    )
+    waveform_r2_key = waveform_key(r2_key)
+    body = orjson.dumps({"version": WAVEFORM_VERSION, **result})
+    await asyncio.to_thread(upload_object, waveform_r2_key, body, "application/json", DERIVED_CACHE_CONTROL)
+    return {"duration": result["duration"], "waveform_r2_key": waveform_r2_key}
+
+
+async def _run_batch(session: AsyncSession, job: str, statement, guard, derive, produced) -> int:
+    """
+    通用批处理：并发执行 derive(row) 得到回写的列；回写以 File.id + guard 列为条件，
+    派生期间文件被删除 / 源对象被替换时不回写，produced(values) 列出的对象 (没有其他文件引用时) 交给清理队列。
+    返回本批取出的行数
+    """
+    exhausted = [file_id for (name, file_id), attempts in _attempts.items()
+                 if name == job and attempts >= MAX_ATTEMPTS]
+    if exhausted:
+        statement = statement.where(col(File.id).not_in(exhausted))
+    rows = (await session.exec(statement.order_by(File.id).limit(settings.DERIVATIVE_BATCH_SIZE))).all()
+    if not rows:
+        return 0
+
+    # 下载 / 上传是 IO，渲染 / 解码在进程池；并发度略高于进程数，让 IO 与计算重叠
+    limit = asyncio.Semaphore(settings.DERIVATIVE_WORKERS * 2)
+
+    async def process(row):
+        async with limit:
+            try:
+                return row, await derive(row)
+            except Exception as e:
+                _attempts[(job, row.id)] = _attempts.get((job, row.id), 0) + 1
+                logger.error("❌ %s derivative failed for file %s: %s", job, row.id, e)
+                return row, None
+
+    results = await asyncio.gather(*(process(row) for row in rows))
+
+    updated = 0
+    orphaned = []
+    for row, values in results:
+        if values is None:
+            continue
+        result = await session.exec(
+            update(File).where(File.id == row.id, guard == getattr(row, guard.key)).values(**values)
+        )
+        if result.rowcount:
+            updated += 1
+            _attempts.pop((job, row.id), None)
+            continue
+        # 去重后多个文件共享同一源对象，派生对象 (键由源对象决定) 仍有其他文件在用时不清理
+        source = getattr(row, guard.key)
+        if not (await session.exec(select(File.id).where(guard == source).limit(1))).first():
+            orphaned.extend(produced(values))
+    if orphaned:
+        enqueue_deletions(session, orphaned)
+    if updated:
+        # 列表中的封面链接 / 时长会随之变化，刷新 /files 的 ETag
+        await bump_counters(session, {FILES_VERSION: 1})
+    await session.commit()
+    if orphaned:
+        notify_purge_worker()
+    return len(rows)
+
+
+async def _cover_columns(row) -> Dict:
+    return {"cover_variants": await derive_cover(row.cover_r2_key)}
+
+
+async def derive_pending_covers(session: AsyncSession) -> int:
+    """
+    处理一批待派生的封面
+    """
+    statement = (
+        select(File.id, File.cover_r2_key)
+        .where(col(File.cover_r2_key).is_not(None), col(File.cover_variants).is_(None))
+        # 内联对象不在 R2 上 (只有放开图片类型的内联存储时才会出现)
+        .where(col(File.cover_r2_key).not_like(f"{INLINE_PREFIX}%"))
+    )
+    return await _run_batch(
+        session, "cover", statement, File.cover_r2_key,
+        _cover_columns,
+        lambda values: list(values["cover_variants"].values()),
+    )
+
+
+async def analyze_pending_audio(session: AsyncSession) -> int:
+    """
+    处理一批待分析的音频 (只取能流式解码的格式)
+    """
+    statement = (
+        select(File.id, File.r2_key, File.mime_type)
+        .where(
+            File.media_category == "audio",
+            col(File.waveform_r2_key).is_(None),
+            col(File.mime_type).in_(list(DECODER_FORMATS)),
+        )
+    )
+    return await _run_batch(
+        session, "audio", statement, File.r2_key,
+        lambda row: analyze_audio(row.r2_key, row.mime_type),
+        lambda values: [values["waveform_r2_key"]],
+    )
+
+
+async def run_derivative_worker():
+    """
+    后台派生任务：有积压时连续处理，空闲时每 DERIVATIVE_INTERVAL_SECONDS 秒或被唤醒时检查一次
+    """
+    global _wakeup
+    _wakeup = asyncio.Event()
+    try:
+        while True:
+            # 先清除再处理：处理期间到达的唤醒会保留到下面的 wait，不会丢失
+            _wakeup.clear()
+            try:
+                async with AsyncSession(async_engine, expire_on_commit=False) as session:
+                    covers = await derive_pending_covers(session)
+                    audio = await analyze_pending_audio(session)
+                    verified = await verify_pending_content(session)
+                if max(covers, audio, verified) >= settings.DERIVATIVE_BATCH_SIZE:
+                    continue
+            except Exception as e:
+                logger.error("❌ Derivative worker failed: %s", e)
+            try:
+                await asyncio.wait_for(_wakeup.wait(), timeout=settings.DERIVATIVE_INTERVAL_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+    finally:
+        shutdown_derivative_pool()
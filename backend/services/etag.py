@@ -0,0 +1,44 @@
+import hashlib
+import json
+import uuid
+from typing import Optional
+
+from fastapi import Request, Response
+
+# 进程启动标识：仅存在于内存中的版本 (如活动流事件 id) 需要带上它，重启后旧 ETag 自动失效
+BOOT_ID = uuid.uuid4().hex
+
+# 条件请求的缓存策略：允许浏览器缓存，但每次都要带 If-None-Match 回源验证
+REVALIDATE = "private, no-cache"
+
+
+def make_etag(*parts) -> str:
+    """
+    由资源版本号等组成部分生成强 ETag
+    """
+    raw = json.dumps(parts, default=str, separators=(",", ":")).encode("utf-8")
+    return '"' + hashlib.sha1(raw).hexdigest()[:32] + '"'
+
+
+def etag_matches(request: Request, etag: Optional[str]) -> bool:
+    """
+    If-None-Match 是否命中 (支持逗号分隔的多个值、弱校验前缀 W/ 与 *)
+    """
+    header = request.headers.get("if-none-match")
+    if not header or not etag:
+        return False
+    candidates = [value.strip() for value in header.split(",")]
+    return "*" in candidates or any(
+        (value[2:] if value.startswith("W/") else value) == etag
+        for value in candidates
+    )
+
+
+def not_modified(etag: str) -> Response:
+    return Response(status_code=304, headers={"ETag": etag, "Cache-Control": REVALIDATE})
+
+
+def set_etag(response: Response, etag: Optional[str]):
+    if etag:
+        response.headers["ETag"] = etag
+        response.headers["Cache-Control"] = REVALIDATE
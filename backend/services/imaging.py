@@ -0,0 +1,32 @@
+"""
+封面图缩略图渲染
+
+纯函数，在派生进程池 (spawn) 中执行：本模块不依赖应用配置，子进程只需导入它和 Pillow。
+"""
+from io import BytesIO
+from typing import Dict, Iterable
+
+
+def render_webp_variants(data: bytes, sizes: Iterable[int], quality: int = 80) -> Dict[int, bytes]:
+    """
+    把原图缩放为多个尺寸 (最长边 = size，不放大) 并编码为 WebP，返回 {size: 图片字节}
+    """
+    # Pillow 只在工作进程里用到，延迟导入不拖慢 API 进程的冷启动
+    from PIL import Image, ImageOps
+
+    sizes = sorted(set(sizes), reverse=True)
+    with Image.open(BytesIO(data)) as image:
+        # JPEG 可直接按目标尺寸的倍数解码，大图省掉大部分解码开销
+        image.draft("RGB", (sizes[0], sizes[0]))
+        image = ImageOps.exif_transpose(image)
+        has_alpha = image.mode in ("RGBA", "LA") or (image.mode == "P" and "transparency" in image.info)
+        image = image.convert("RGBA" if has_alpha else "RGB")
+
+        variants = {}
+        # 从大到小逐级缩放，每一级都基于上一级结果，比每次从原图缩放更快
+        for size in sizes:
+            image.thumbnail((size, size), Image.Resampling.LANCZOS)
+            buffer = BytesIO()
+            image.save(buffer, "WEBP", quality=quality, method=4)
+            variants[size] = buffer.getvalue()
+    return variants
@@ -0,0 +1,97 @@
+"""
+小对象内联存储
+
+歌词、小 JSON、小文本等不超过 INLINE_MAX_BYTES 的对象直接存进 inline_objects 表，
+对象键使用 inline/ 前缀，与 R2 上的 uploads/ 键共用 File 的各个 *_r2_key 字段。
+读取时不需要预签名，也不需要客户端再单独请求一次 R2：
+列表中的链接指向后端 /upload/inline/...，或按需直接内嵌为 data: URL。
+"""
+import base64
+import uuid
+from typing import Dict, Iterable, List, Optional
+from urllib.parse import quote, urlencode
+
+from sqlmodel import select, col, delete
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from config import settings
+from models import InlineObject
+from services.upload_tokens import INLINE_UPLOAD, issue_token
+
+INLINE_PREFIX = "inline/"
+# 对外提供内联对象的路由 (routers/upload.py)
+INLINE_ROUTE = "upload/inline/"
+
+
+def is_inline_key(key: Optional[str]) -> bool:
+    return bool(key) and key.startswith(INLINE_PREFIX)
+
+
+def inline_media_type(content_type: Optional[str]) -> Optional[str]:
+    """
+    去掉参数后的 MIME 类型，不在白名单内时返回 None
+    """
+    media_type = (content_type or "").split(";", 1)[0].strip().lower()
+    return media_type if media_type in settings.INLINE_CONTENT_TYPES else None
+
+
+def is_inline_candidate(content_type: Optional[str], size: Optional[int]) -> bool:
+    """
+    客户端声明的大小与类型是否适合内联存储
+    """
+    if size is None or size > settings.INLINE_MAX_BYTES:
+        return False
+    return inline_media_type(content_type) is not None
+
+
+def new_inline_key(file_name: str) -> str:
+    return f"{INLINE_PREFIX}{uuid.uuid4()}-{file_name}"
+
+
+def inline_url(base_url: str, key: str) -> str:
+    """
+    内联对象的后端访问地址 (base_url 以 / 结尾)
+    """
+    return f"{settings.PUBLIC_BASE_URL or base_url}{INLINE_ROUTE}{quote(key[len(INLINE_PREFIX):])}"
+
+
+def inline_upload_url(base_url: str, key: str, user_id) -> str:
+    """
+    内联对象的上传地址：访问地址 + 与签发用户绑定、会过期的写入凭证
+    """
+    token = issue_token(INLINE_UPLOAD, user_id, key, ttl=settings.INLINE_UPLOAD_TTL)
+    return f"{inline_url(base_url, key)}?{urlencode({'token': token})}"
+
+
+def data_url(obj: InlineObject) -> str:
+    return f"data:{inline_media_type(obj.content_type) or 'text/plain'};charset=utf-8;base64,{base64.b64encode(obj.data).decode('ascii')}"
+
+
+async def get_inline_objects(session: AsyncSession, keys: Iterable[str]) -> Dict[str, InlineObject]:
+    keys = list(dict.fromkeys(keys))
+    if not keys:
+        return {}
+    objects = (await session.exec(select(InlineObject).where(col(InlineObject.key).in_(keys)))).all()
+    return {obj.key: obj for obj in objects}
+
+
+async def resolve_inline_urls(
+    session: AsyncSession, keys: Iterable[str], base_url: str, embed: bool = False
+) -> Dict[str, str]:
+    """
+    为列表中的内联键生成链接 {key: url}；embed 为真时一次查询取出内容并内嵌为 data: URL
+    """
+    keys = [key for key in dict.fromkeys(keys) if is_inline_key(key)]
+    urls = {key: inline_url(base_url, key) for key in keys}
+    if embed and keys:
+        for key, obj in (await get_inline_objects(session, keys)).items():
+            urls[key] = data_url(obj)
+    return urls
+
+
+async def delete_inline_objects(session: AsyncSession, keys: List[str]):
+    """
+    在调用方事务内删除内联对象 (不提交)
+    """
+    if keys:
+        await session.exec(delete(InlineObject).where(col(InlineObject.key).in_(keys)))
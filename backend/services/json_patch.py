@@ -0,0 +1,210 @@
+"""
+JSON Pointer (RFC 6901) / JSON Patch (RFC 6902)
+
+- resolve_pointer: 按指针取子树 (蓝图局部读取)
+- apply_patch: 应用补丁 (add / remove / replace / move / copy / test)
+- diff: 生成把 a 变成 b 的补丁；数组先去掉相同的前后缀，中间段做序列比对，插入 / 删除只产生少量操作
+"""
+import copy
+import json
+from difflib import SequenceMatcher
+from typing import Any, Dict, List
+
+import orjson
+
+
+class JsonPatchError(ValueError):
+    """
+    指针无效、路径不存在或 test 操作失败
+    """
+
+
+def parse_pointer(pointer: str) -> List[str]:
+    if pointer == "":
+        return []
+    if not pointer.startswith("/"):
+        raise JsonPatchError(f"Invalid JSON pointer: {pointer!r}")
+    return [token.replace("~1", "/").replace("~0", "~") for token in pointer[1:].split("/")]
+
+
+def escape_token(token: str) -> str:
+    return token.replace("~", "~0").replace("/", "~1")
+
+
+def _index(token: str, length: int, allow_end: bool = False) -> int:
+    if token == "-" and allow_end:
+        return length
+    # RFC 6901：数组下标为不带前导零的非负整数
+    if not token.isdigit() or (len(token) > 1 and token[0] == "0"):
+        raise JsonPatchError(f"Invalid array index: {token!r}")
+    index = int(token)
+    if index > length or (index == length and not allow_end):
+        raise JsonPatchError(f"Array index out of range: {index}")
+    return index
+
+
+def _child(container: Any, token: str) -> Any:
+    if isinstance(container, dict):
+        if token not in container:
+            raise JsonPatchError(f"Member not found: {token!r}")
+        return container[token]
+    if isinstance(container, list):
+        return container[_index(token, len(container))]
+    raise JsonPatchError(f"Cannot descend into {type(container).__name__} with {token!r}")
+
+
+def resolve_pointer(document: Any, pointer: str) -> Any:
+    value = document
+    for token in parse_pointer(pointer):
+        value = _child(value, token)
+    return value
+
+
+def _parent(document: Any, pointer: str):
+    tokens = parse_pointer(pointer)
+    if not tokens:
+        return None, None
+    parent = document
+    for token in tokens[:-1]:
+        parent = _child(parent, token)
+    return parent, tokens[-1]
+
+
+def _add(document: Any, pointer: str, value: Any) -> Any:
+    parent, token = _parent(document, pointer)
+    if parent is None:
+        return value
+    if isinstance(parent, dict):
+        parent[token] = value
+    elif isinstance(parent, list):
+        parent.insert(_index(token, len(parent), allow_end=True), value)
+    else:
+        raise JsonPatchError(f"Cannot add to {type(parent).__name__} at {pointer!r}")
+    return document
+
+
+def _remove(document: Any, pointer: str):
+    parent, token = _parent(document, pointer)
+    if parent is None:
+        raise JsonPatchError("Cannot remove the document root")
+    if isinstance(parent, dict):
+        if token not in parent:
+            raise JsonPatchError(f"Member not found: {token!r}")
+        return parent.pop(token)
+    if isinstance(parent, list):
+        return parent.pop(_index(token, len(parent)))
+    raise JsonPatchError(f"Cannot remove from {type(parent).__name__} at {pointer!r}")
+
+
+def _replace(document: Any, pointer: str, value: Any) -> Any:
+    parent, token = _parent(document, pointer)
+    if parent is None:
+        return value
+    if isinstance(parent, dict):
+        if token not in parent:
+            raise JsonPatchError(f"Member not found: {token!r}")
+        parent[token] = value
+    elif isinstance(parent, list):
+        parent[_index(token, len(parent))] = value
+    else:
+        raise JsonPatchError(f"Cannot replace in {type(parent).__name__} at {pointer!r}")
+    return document
+
+
+def apply_patch(document: Any, operations: List[Dict[str, Any]], in_place: bool = False) -> Any:
+    """
+    应用补丁并返回新文档；in_place 为真时直接修改 document (调用方持有私有副本时省去深拷贝)
+    """
+    if not in_place:
+        document = copy.deepcopy(document)
+    for operation in operations:
+        try:
+            op, path = operation["op"], operation["path"]
+            if op == "add":
+                document = _add(document, path, copy.deepcopy(operation["value"]))
+            elif op == "remove":
+                _remove(document, path)
+            elif op == "replace":
+                document = _replace(document, path, copy.deepcopy(operation["value"]))
+            elif op == "move":
+                source = operation["from"]
+                if path != source and path.startswith(source + "/"):
+                    raise JsonPatchError(f"Cannot move {source!r} into its own child {path!r}")
+                document = _add(document, path, _remove(document, source))
+            elif op == "copy":
+                document = _add(document, path, copy.deepcopy(resolve_pointer(document, operation["from"])))
+            elif op == "test":
+                if resolve_pointer(document, path) != operation["value"]:
+                    raise JsonPatchError(f"Test failed at {path!r}")
+            else:
+                raise JsonPatchError(f"Unsupported operation: {op!r}")
+        except (KeyError, TypeError) as e:
+            raise JsonPatchError(f"Malformed operation {operation!r}: {e}")
+    return document
+
+
+def _canonical(value: Any) -> bytes:
+    try:
+        return orjson.dumps(value, option=orjson.OPT_SORT_KEYS)
+    except TypeError:
+        # 超出 64 位的整数等 orjson 不支持的值
+        return json.dumps(value, sort_keys=True).encode()
+
+
+def _same(a: Any, b: Any) -> bool:
+    # Python 中 1 == True == 1.0，JSON 里它们是不同的值；== 成立时再按序列化结果严格比较
+    return a == b and (type(a) is type(b) if not isinstance(a, (dict, list)) else _canonical(a) == _canonical(b))
+
+
+def diff(a: Any, b: Any, path: str = "") -> List[Dict[str, Any]]:
+    """
+    生成把 a 变成 b 的补丁 (a、b 均不会被修改)
+    """
+    if _same(a, b):
+        return []
+    if isinstance(a, dict) and isinstance(b, dict):
+        operations = []
+        for key in a:
+            if key not in b:
+                operations.append({"op": "remove", "path": f"{path}/{escape_token(key)}"})
+        for key, value in b.items():
+            if key not in a:
+                operations.append({"op": "add", "path": f"{path}/{escape_token(key)}", "value": value})
+            else:
+                operations.extend(diff(a[key], value, f"{path}/{escape_token(key)}"))
+        return operations
+    if isinstance(a, list) and isinstance(b, list):
+        return _diff_lists(a, b, path)
+    return [{"op": "replace", "path": path, "value": b}]
+
+
+def _diff_lists(a: list, b: list, path: str) -> List[Dict[str, Any]]:
+    # 去掉相同的前缀 / 后缀，只比较中间变化的一段
+    prefix = 0
+    limit = min(len(a), len(b))
+    while prefix < limit and _same(a[prefix], b[prefix]):
+        prefix += 1
+    suffix = 0
+    limit -= prefix
+    while suffix < limit and _same(a[-1 - suffix], b[-1 - suffix]):
+        suffix += 1
+    a_mid = a[prefix:len(a) - suffix]
+    b_mid = b[prefix:len(b) - suffix]
+
+    # 中间段按元素的规范序列化做序列比对 (多处插入 / 删除时元素不会整体错位)
+    matcher = SequenceMatcher(None, [_canonical(x) for x in a_mid], [_canonical(x) for x in b_mid], autojunk=False)
+    operations = []
+    shift = prefix  # a 中下标 i 的元素在已应用前面操作的数组中的位置为 i + shift
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == "equal":
+            continue
+        paired = min(i2 - i1, j2 - j1)
+        for k in range(paired):
+            operations.extend(diff(a_mid[i1 + k], b_mid[j1 + k], f"{path}/{i1 + k + shift}"))
+        for _ in range(i2 - i1 - paired):
+            operations.append({"op": "remove", "path": f"{path}/{i1 + paired + shift}"})
+        shift -= i2 - i1 - paired
+        for k in range(j2 - j1 - paired):
+            operations.append({"op": "add", "path": f"{path}/{i1 + paired + shift + k}", "value": b_mid[j1 + paired + k]})
+        shift += j2 - j1 - paired
+    return operations
@@ -0,0 +1,318 @@
+import contextvars
+import logging
+import threading
+import time
+from bisect import bisect_left
+from sqlalchemy import event
+from config import settings
+
+logger = logging.getLogger("endfield.perf")
+
+# 延迟直方图的默认分桶 (秒)
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# 单个请求内查询次数的分桶
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: tuple, values: tuple, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value) -> str:
+    if isinstance(value, float) and value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """
+    单调递增计数器
+    """
+    def __init__(self, name: str, documentation: str, labelnames: tuple = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labelvalues, amount: float = 1):
+        with self._lock:
+            self._values[labelvalues] = self._values.get(labelvalues, 0) + amount
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            items = sorted(self._values.items())
+        for labelvalues, value in items:
+            lines.append(f"{self.name}{_format_labels(self.labelnames, labelvalues)} {_format_value(value)}")
+        return lines
+
+
+class Histogram:
+    """
+    累计分桶直方图 (与 Prometheus histogram 语义一致)
+    """
+    def __init__(self, name: str, documentation: str, labelnames: tuple = (), buckets: tuple = LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.buckets = tuple(buckets)
+        # labelvalues -> [各桶计数..., 总和, 总数]
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labelvalues):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(labelvalues)
+            if state is None:
+                state = self._values[labelvalues] = [0] * (len(self.buckets) + 2)
+            if index < len(self.buckets):
+                state[index] += 1
+            state[-2] += value
+            state[-1] += 1
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = sorted((labelvalues, list(state)) for labelvalues, state in self._values.items())
+        for labelvalues, state in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets, state):
+                cumulative += count
+                labels = _format_labels(self.labelnames, labelvalues, f'le="{_format_value(float(bound))}"')
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labelnames, labelvalues, 'le="+Inf"')
+            lines.append(f"{self.name}_bucket{labels} {state[-1]}")
+            labels = _format_labels(self.labelnames, labelvalues)
+            lines.append(f"{self.name}_sum{labels} {_format_value(float(state[-2]))}")
+            lines.append(f"{self.name}_count{labels} {state[-1]}")
+        return lines
+
+
+# --- 指标定义 ---
+http_requests = Counter(
+    "endfield_http_requests_total", "HTTP requests by route and status.", ("method", "route", "status")
+)
+http_latency = Histogram(
+    "endfield_http_request_duration_seconds", "HTTP request latency by route.", ("method", "route")
+)
+http_db_queries = Histogram(
+    "endfield_http_request_db_queries", "Database queries issued per HTTP request.", ("method", "route"),
+    buckets=QUERY_COUNT_BUCKETS
+)
+http_db_time = Histogram(
+    "endfield_http_request_db_seconds", "Database time spent per HTTP request.", ("method", "route")
+)
+db_query_latency = Histogram(
+    "endfield_db_query_duration_seconds", "Database query latency by engine.", ("engine",)
+)
+db_pool_wait = Histogram(
+    "endfield_db_pool_checkout_wait_seconds", "Time spent waiting for a pooled connection.", ("engine",)
+)
+r2_latency = Histogram(
+    "endfield_r2_request_duration_seconds", "R2 (S3 API) call latency by operation.", ("operation",)
+)
+r2_errors = Counter(
+    "endfield_r2_request_errors_total", "R2 (S3 API) calls that failed.", ("operation",)
+)
+
+METRICS = [http_requests, http_latency, http_db_queries, http_db_time, db_query_latency, db_pool_wait, r2_latency, r2_errors]
+
+# 采集时才计算的瞬时值: name -> (说明, [回调])，回调返回 [(labels dict, value)]
+_gauges = {}
+
+
+def register_gauge(name: str, documentation: str, collect):
+    """
+    注册一个在 /metrics 渲染时才读取的 gauge (同名多次注册会合并输出)
+    """
+    _gauges.setdefault(name, (documentation, []))[1].append(collect)
+
+
+def render_metrics() -> str:
+    """
+    输出 Prometheus 文本格式 (text/plain; version=0.0.4)
+    """
+    lines = []
+    for metric in METRICS:
+        lines.extend(metric.render())
+    for name, (documentation, collectors) in _gauges.items():
+        lines.append(f"# HELP {name} {documentation}")
+        lines.append(f"# TYPE {name} gauge")
+        samples = []
+        for collect in collectors:
+            try:
+                samples.extend(collect())
+            except Exception as e:
+                logger.warning("Gauge %s collection failed: %s", name, e)
+        for labels, value in samples:
+            names = tuple(labels)
+            lines.append(f"{name}{_format_labels(names, tuple(labels[n] for n in names))} {_format_value(value)}")
+    return "\n".join(lines) + "\n"
+
+
+# --- 请求级统计 ---
+class RequestStats:
+    """
+    单个请求内累计的 DB / R2 开销，由中间件放入 contextvar
+    """
+    __slots__ = ("db_queries", "db_seconds", "pool_wait_seconds", "r2_calls", "r2_seconds")
+
+    def __init__(self):
+        self.db_queries = 0
+        self.db_seconds = 0.0
+        self.pool_wait_seconds = 0.0
+        self.r2_calls = 0
+        self.r2_seconds = 0.0
+
+
+_current = contextvars.ContextVar("endfield_request_stats", default=None)
+
+
+def current_request_stats():
+    return _current.get()
+
+
+def instrument_engine(engine, label: str):
+    """
+    为同步引擎 (异步引擎传 async_engine.sync_engine) 挂载查询计时与连接池等待计时
+    """
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("_query_start", []).append(time.perf_counter())
+
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        starts = conn.info.get("_query_start")
+        if not starts:
+            return
+        _record_query(label, time.perf_counter() - starts.pop())
+
+    def handle_error(exception_context):
+        conn = exception_context.connection
+        starts = conn.info.get("_query_start") if conn is not None else None
+        if starts:
+            _record_query(label, time.perf_counter() - starts.pop())
+
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", after_cursor_execute)
+    event.listen(engine, "handle_error", handle_error)
+
+    # 连接池没有 "开始等待" 事件 (checkout / connect 都在拿到连接之后触发)，包装 _do_get 计时
+    def time_checkouts(pool):
+        do_get = pool._do_get
+
+        def timed_do_get():
+            started = time.perf_counter()
+            try:
+                return do_get()
+            finally:
+                waited = time.perf_counter() - started
+                db_pool_wait.observe(waited, label)
+                stats = _current.get()
+                if stats is not None:
+                    stats.pool_wait_seconds += waited
+
+        pool._do_get = timed_do_get
+
+    time_checkouts(engine.pool)
+    # engine.dispose() 会换上 recreate() 出的新连接池，在公开的 engine_disposed 事件里重新挂载
+    event.listen(engine, "engine_disposed", lambda disposed: time_checkouts(disposed.pool))
+
+    def collect_pool():
+        current = engine.pool
+        checkedout = current.checkedout() if hasattr(current, "checkedout") else 0
+        return [({"engine": label}, checkedout)]
+
+    register_gauge("endfield_db_pool_checked_out", "Connections currently checked out of the pool.", collect_pool)
+
+
+def _record_query(label: str, elapsed: float):
+    db_query_latency.observe(elapsed, label)
+    stats = _current.get()
+    if stats is not None:
+        stats.db_queries += 1
+        stats.db_seconds += elapsed
+
+
+def instrument_boto_client(client):
+    """
+    通过 botocore 事件钩子统计每次 S3 API 调用的耗时 (预签名不发请求，不计入)
+    """
+    def before_call(model, context, **kwargs):
+        context["_call_start"] = (model.name, time.perf_counter())
+
+    # after-call-error (网络异常) 不带 model 参数，操作名从 before-call 存入的上下文里取
+    def after_call(context, http_response=None, exception=None, **kwargs):
+        started = context.pop("_call_start", None)
+        if started is None:
+            return
+        operation, started = started
+        elapsed = time.perf_counter() - started
+        r2_latency.observe(elapsed, operation)
+        if exception is not None or (http_response is not None and http_response.status_code >= 300):
+            r2_errors.inc(operation)
+        stats = _current.get()
+        if stats is not None:
+            stats.r2_calls += 1
+            stats.r2_seconds += elapsed
+
+    client.meta.events.register("before-call.s3", before_call)
+    client.meta.events.register("after-call.s3", after_call)
+    client.meta.events.register("after-call-error.s3", after_call)
+
+
+def _route_label(scope) -> str:
+    # 路由匹配后 Starlette 会把命中的路由写回 scope，用模板路径避免路径参数撑爆标签基数
+    route = scope.get("route")
+    return getattr(route, "path", None) or "<unmatched>"
+
+
+class MetricsMiddleware:
+    """
+    纯 ASGI 中间件：记录每个请求的延迟、状态码以及期间的 DB / R2 开销
+    """
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats()
+        token = _current.set(stats)
+        status = 500
+        started = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _current.reset(token)
+            elapsed = time.perf_counter() - started
+            method = scope["method"]
+            route = _route_label(scope)
+            http_requests.inc(method, route, str(status))
+            http_latency.observe(elapsed, method, route)
+            http_db_queries.observe(stats.db_queries, method, route)
+            http_db_time.observe(stats.db_seconds, method, route)
+            # 慢请求日志 (SLOW_REQUEST_MS=0 关闭)
+            if settings.SLOW_REQUEST_MS and elapsed * 1000 >= settings.SLOW_REQUEST_MS:
+                logger.warning(
+                    "🐢 Slow request %s %s -> %s %.1fms | db %d queries %.1fms | pool wait %.1fms | r2 %d calls %.1fms",
+                    method, scope.get("path"), status, elapsed * 1000,
+                    stats.db_queries, stats.db_seconds * 1000, stats.pool_wait_seconds * 1000,
+                    stats.r2_calls, stats.r2_seconds * 1000
+                )
@@ -0,0 +1,48 @@
+import base64
+import json
+from datetime import datetime
+from typing import Any, Callable, Tuple
+
+from fastapi import HTTPException
+
+
+def encode_cursor(sort_value: datetime, key: Any) -> str:
+    """
+    将 (排序时间, 主键) 编码为不透明游标
+    """
+    raw = json.dumps([sort_value.isoformat(), str(key) if not isinstance(key, int) else key]).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str, key_type: Callable[[Any], Any] = int) -> Tuple[datetime, Any]:
+    """
+    解析游标，格式非法时返回 400
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        sort_value, key = json.loads(base64.urlsafe_b64decode(padded))
+        return datetime.fromisoformat(sort_value), key_type(key)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def encode_offset_cursor(offset: int) -> str:
+    """
+    将偏移量编码为不透明游标 (用于按相关度排序、无法做 keyset 的检索结果)
+    """
+    raw = json.dumps({"offset": offset}).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_offset_cursor(cursor: str) -> int:
+    """
+    解析偏移量游标，格式非法时返回 400
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        offset = int(json.loads(base64.urlsafe_b64decode(padded))["offset"])
+    except (ValueError, TypeError, KeyError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if offset < 0:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return offset
@@ -0,0 +1,92 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional, Union
+from uuid import UUID
+
+from sqlalchemy.orm import make_transient_to_detached
+
+from config import settings
+from models import Profile, Tempop
+
+
+class PrincipalCache:
+    """
+    已解析用户 (Profile / Tempop) 的有界 TTL 缓存
+
+    缓存的是字段快照而不是 ORM 实例，每次命中都会重建一个独立的 detached 对象，
+    避免多个请求共享同一个实例；写操作 (PATCH /users/me、审批) 负责主动失效。
+    多进程部署下其他进程的条目最迟在 TTL 到期后刷新。
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, user_id: UUID) -> Optional[Union[Profile, Tempop]]:
+        key = str(user_id)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] <= time.monotonic():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            _, model_cls, data = entry
+
+        # 重建对象并标记为已持久化，后续 session.add 会走 UPDATE 而不是 INSERT
+        user = model_cls(**data)
+        make_transient_to_detached(user)
+        return user
+
+    def put(self, user: Union[Profile, Tempop]):
+        if self.maxsize <= 0 or self.ttl <= 0:
+            return
+        entry = (time.monotonic() + self.ttl, type(user), user.model_dump())
+        with self._lock:
+            self._entries[str(user.id)] = entry
+            self._entries.move_to_end(str(user.id))
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, user_id: UUID):
+        with self._lock:
+            if self._entries.pop(str(user_id), None) is not None:
+                self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+            self.invalidations = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "invalidations": self.invalidations,
+                "hit_rate": (self.hits / total) if total else 0.0
+            }
+
+
+principal_cache = PrincipalCache(settings.PRINCIPAL_CACHE_SIZE, settings.PRINCIPAL_CACHE_TTL)
+
+
+def get_principal_cache_stats() -> dict:
+    """
+    返回用户缓存的命中统计
+    """
+    return principal_cache.stats()
@@ -0,0 +1,117 @@
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from typing import Iterable, Optional
+
+from sqlalchemy import update
+from sqlmodel import select, col, delete
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from config import settings
+from database import async_engine
+from models import StorageDeletion
+from services.inline_store import delete_inline_objects, is_inline_key
+from services.storage import delete_files_from_r2
+
+logger = logging.getLogger(__name__)
+
+
+# 有新任务入队时唤醒后台任务，不必等到下一个轮询周期
+_wakeup: Optional[asyncio.Event] = None
+
+
+def enqueue_deletions(session: AsyncSession, keys: Iterable[str]):
+    """
+    在调用方事务内登记待删除的对象 (不提交)
+    """
+    session.add_all([StorageDeletion(r2_key=key) for key in dict.fromkeys(k for k in keys if k)])
+
+
+def notify_purge_worker():
+    """
+    事务提交后调用，让后台任务尽快处理新入队的对象
+    """
+    if _wakeup is not None:
+        _wakeup.set()
+
+
+def _backoff(attempts: int) -> timedelta:
+    # 指数退避：30s, 60s, 120s ... 封顶 PURGE_MAX_BACKOFF_SECONDS
+    seconds = settings.PURGE_INTERVAL_SECONDS * (2 ** max(0, attempts - 1))
+    return timedelta(seconds=min(seconds, settings.PURGE_MAX_BACKOFF_SECONDS))
+
+
+async def purge_once(session: AsyncSession) -> int:
+    """
+    处理一批到期的删除任务，返回成功删除的对象数
+    """
+    now = datetime.now()
+
+    # 1. 领取任务：延后 next_attempt_at 作为租约，进程崩溃后租约到期会被重新领取
+    # SKIP LOCKED 让多个实例并行时互不抢同一批任务 (SQLite 下忽略)
+    jobs = (await session.exec(
+        select(StorageDeletion)
+        .where(StorageDeletion.next_attempt_at <= now)
+        .order_by(StorageDeletion.id)
+        .limit(settings.PURGE_BATCH_SIZE)
+        .with_for_update(skip_locked=True)
+    )).all()
+    if not jobs:
+        await session.commit()
+        return 0
+
+    job_ids = [job.id for job in jobs]
+    await session.exec(
+        update(StorageDeletion)
+        .where(col(StorageDeletion.id).in_(job_ids))
+        .values(next_attempt_at=now + timedelta(seconds=settings.PURGE_LEASE_SECONDS))
+    )
+    await session.commit()
+
+    # 2. 批量删除对象 (不持有数据库事务)；内联对象就在数据库里，随出队一起删除
+    inline_keys = [job.r2_key for job in jobs if is_inline_key(job.r2_key)]
+    errors = await asyncio.to_thread(
+        delete_files_from_r2, [job.r2_key for job in jobs if not is_inline_key(job.r2_key)]
+    )
+    await delete_inline_objects(session, inline_keys)
+
+    # 3. 成功的出队，失败的按退避时间重试
+    done_ids = [job.id for job in jobs if job.r2_key not in errors]
+    if done_ids:
+        await session.exec(delete(StorageDeletion).where(col(StorageDeletion.id).in_(done_ids)))
+    for job in jobs:
+        if job.r2_key in errors:
+            attempts = job.attempts + 1
+            await session.exec(
+                update(StorageDeletion)
+                .where(StorageDeletion.id == job.id)
+                .values(
+                    attempts=attempts,
+                    last_error=errors[job.r2_key][:500],
+                    next_attempt_at=datetime.now() + _backoff(attempts)
+                )
+            )
+    await session.commit()
+    return len(done_ids)
+
+
+async def run_purge_worker():
+    """
+    后台清理任务：队列有积压时连续处理，空闲时每 PURGE_INTERVAL_SECONDS 秒或被唤醒时检查一次
+    """
+    global _wakeup
+    _wakeup = asyncio.Event()
+    while True:
+        # 先清除再处理：处理期间到达的唤醒会保留到下面的 wait，不会丢失
+        _wakeup.clear()
+        try:
+            async with AsyncSession(async_engine, expire_on_commit=False) as session:
+                purged = await purge_once(session)
+            if purged >= settings.PURGE_BATCH_SIZE:
+                continue
+        except Exception as e:
+            logger.error("❌ Storage purge failed: %s", e)
+        try:
+            await asyncio.wait_for(_wakeup.wait(), timeout=settings.PURGE_INTERVAL_SECONDS)
+        except asyncio.TimeoutError:
+            pass
@@ -0,0 +1,137 @@
+"""
+文件全文检索 (filename + artist)
+
+- PostgreSQL: files.search_vector (tsvector 生成列 + GIN) 负责分词匹配与排序，
+  pg_trgm 三元组索引负责子串 / 拼写容错 (中文文件名没有空格分词，主要靠它)
+- SQLite (本地开发): FTS5 外部内容表 files_fts，按 bm25 排序
+- 其他数据库: 退化为 LIKE 扫描
+
+索引都由数据库自身维护 (生成列 / 触发器，见 migrations.py)，单条创建、批量 INSERT、
+批量 DELETE 等任何写入路径都不会漏同步。
+"""
+import re
+from typing import List
+
+from sqlalchemy import column, func, literal, literal_column, or_, case, table, text
+from sqlmodel import col
+
+from models import File
+
+# 查询词最多取前几个分词，避免超长输入拼出巨大的查询
+MAX_SEARCH_TERMS = 8
+
+# 三元组索引所用的表达式，迁移建索引与查询必须逐字一致才能命中索引
+SEARCH_TEXT_SQL = "lower(filename || ' ' || coalesce(artist, ''))"
+
+# tsvector 生成列定义：文件名权重 A，艺术家权重 B；'simple' 配置不做词干化，中英文都按原词匹配
+SEARCH_VECTOR_SQL = (
+    "setweight(to_tsvector('simple', coalesce(filename, '')), 'A') || "
+    "setweight(to_tsvector('simple', coalesce(artist, '')), 'B')"
+)
+
+# FTS5 bm25 列权重 (filename, artist)
+FTS_WEIGHTS = (10.0, 5.0)
+
+_files_fts = table("files_fts", column("rowid"))
+
+
+def search_terms(query: str) -> List[str]:
+    """
+    把用户输入拆成检索词 (按 Unicode 单词字符切分并转小写)
+    """
+    return re.findall(r"\w+", query.lower())[:MAX_SEARCH_TERMS]
+
+
+def _postgres(statement, query: str, terms: List[str]):
+    # 每个词做前缀匹配并要求全部命中: 'foo:* & bar:*'
+    tsquery = func.to_tsquery("simple", literal(" & ".join(f"{term}:*" for term in terms)))
+    search_text = literal_column(SEARCH_TEXT_SQL)
+    normalized = query.strip().lower()
+    pattern = "%" + normalized.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+
+    vector = literal_column("files.search_vector")
+    score = (
+        func.ts_rank_cd(vector, tsquery) * 2
+        + func.similarity(search_text, normalized)
+    )
+    statement = statement.where(or_(
+        vector.op("@@")(tsquery),
+        search_text.like(pattern, escape="\\"),
+        search_text.op("%")(normalized),
+    ))
+    return statement, score
+
+
+def _sqlite(statement, query: str, terms: List[str]):
+    # 每个词加引号转义后做前缀匹配，空格连接即全部命中: "foo"* "bar"*
+    match = " ".join('"' + term.replace('"', '""') + '"*' for term in terms)
+    # bm25 越小越相关，取负数使分数越大越靠前
+    score = -func.bm25(literal_column("files_fts"), *FTS_WEIGHTS)
+    statement = (
+        statement
+        .join(_files_fts, _files_fts.c.rowid == File.id)
+        .where(literal_column("files_fts").op("MATCH")(match))
+    )
+    return statement, score
+
+
+def _fallback(statement, query: str, terms: List[str]):
+    conditions = []
+    for term in terms:
+        conditions.append(or_(col(File.filename).ilike(f"%{term}%"), col(File.artist).ilike(f"%{term}%")))
+    statement = statement.where(*conditions)
+    score = case((col(File.filename).ilike(f"%{query.strip()}%"), 2.0), else_=1.0)
+    return statement, score
+
+
+def apply_search(statement, dialect_name: str, query: str):
+    """
+    为查询追加全文检索条件，返回 (statement, score 表达式)；没有可检索的词时返回 (None, None)
+    """
+    terms = search_terms(query)
+    if not terms:
+        return None, None
+    if dialect_name == "postgresql":
+        return _postgres(statement, query, terms)
+    if dialect_name == "sqlite":
+        return _sqlite(statement, query, terms)
+    return _fallback(statement, query, terms)
+
+
+# --- 索引 DDL (由 migrations.py 调用) ---
+
+POSTGRES_DDL = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    f"ALTER TABLE files ADD COLUMN IF NOT EXISTS search_vector tsvector GENERATED ALWAYS AS ({SEARCH_VECTOR_SQL}) STORED",
+    "CREATE INDEX IF NOT EXISTS ix_files_search_vector ON files USING gin (search_vector)",
+    f"CREATE INDEX IF NOT EXISTS ix_files_search_trgm ON files USING gin (({SEARCH_TEXT_SQL}) gin_trgm_ops)",
+]
+
+SQLITE_DDL = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS files_fts USING fts5("
+    "filename, artist, content='files', content_rowid='id', "
+    "tokenize='unicode61 remove_diacritics 2', prefix='2 3')",
+    "CREATE TRIGGER IF NOT EXISTS files_fts_ai AFTER INSERT ON files BEGIN "
+    "INSERT INTO files_fts(rowid, filename, artist) VALUES (new.id, new.filename, new.artist); END",
+    "CREATE TRIGGER IF NOT EXISTS files_fts_ad AFTER DELETE ON files BEGIN "
+    "INSERT INTO files_fts(files_fts, rowid, filename, artist) VALUES ('delete', old.id, old.filename, old.artist); END",
+    "CREATE TRIGGER IF NOT EXISTS files_fts_au AFTER UPDATE OF filename, artist ON files BEGIN "
+    "INSERT INTO files_fts(files_fts, rowid, filename, artist) VALUES ('delete', old.id, old.filename, old.artist); "
+    "INSERT INTO files_fts(rowid, filename, artist) VALUES (new.id, new.filename, new.artist); END",
+    # 为已有数据建立索引
+    "INSERT INTO files_fts(files_fts) VALUES ('rebuild')",
+]
+
+
+def create_search_index(conn):
+    """
+    创建与方言匹配的检索索引 (幂等)
+    """
+    if conn.dialect.name == "postgresql":
+        statements = POSTGRES_DDL
+    elif conn.dialect.name == "sqlite":
+        statements = SQLITE_DDL
+    else:
+        return
+    for statement in statements:
+        conn.execute(text(statement))
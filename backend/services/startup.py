@@ -0,0 +1,37 @@
+import time
+from contextlib import contextmanager
+from typing import Dict
+
+
+class StartupReport:
+    """
+    记录冷启动各阶段耗时 (模块导入、建表、迁移、预热...)，启动完成时打印一行摘要
+    """
+
+    def __init__(self):
+        self.phases: Dict[str, float] = {}
+
+    def record(self, name: str, seconds: float):
+        self.phases[name] = seconds
+
+    @contextmanager
+    def phase(self, name: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - started)
+
+    @property
+    def total(self) -> float:
+        return sum(self.phases.values())
+
+    def as_dict(self) -> Dict[str, float]:
+        return {name: round(seconds * 1000, 1) for name, seconds in self.phases.items()}
+
+    def summary(self) -> str:
+        parts = [f"{name} {seconds * 1000:.0f}ms" for name, seconds in self.phases.items()]
+        return " | ".join(parts) + f" | total {self.total * 1000:.0f}ms"
+
+
+startup_report = StartupReport()
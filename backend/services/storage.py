@@ -1,45 +1,92 @@
-import boto3
-from botocore.config import Config
 import uuid
 import mimetypes               # 🟢 新增：用于猜测文件类型
 from urllib.parse import quote # 🟢 新增：用于文件名 URL 编码
 from config import settings
-import sys
-
-# --- 🕵️‍♂️ 探针 1: 检查配置是否加载 ---
-print("--- [DEBUG] Storage Service Initializing ---")
-print(f"1. R2_ENDPOINT: {settings.R2_ENDPOINT_URL}")
-print(f"2. R2_BUCKET:   {settings.R2_BUCKET_NAME}")
-# 只打印前几位，防止泄露
-key_sample = settings.R2_ACCESS_KEY_ID[:4] + "***" if settings.R2_ACCESS_KEY_ID else "None"
-print(f"3. ACCESS_KEY:  {key_sample}")
-print("------------------------------------------")
-
-try:
-    # 初始化 S3 客户端
-    s3_client = boto3.client(
-        's3',
-        endpoint_url=settings.R2_ENDPOINT_URL,
-        aws_access_key_id=settings.R2_ACCESS_KEY_ID,
-        aws_secret_access_key=settings.R2_SECRET_ACCESS_KEY,
-        config=Config(signature_version='s3v4'),
-        region_name='auto'
-    )
-    print("✅ [DEBUG] Boto3 Client Created Successfully")
-except Exception as e:
-    print(f"❌ [DEBUG] Boto3 Init Failed: {e}")
+from services.metrics import instrument_boto_client
+import logging
+import threading
+import time
+import hashlib
+import hmac
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from urllib.parse import urlsplit
+
+# R2 固定使用 auto 区域
+R2_REGION = 'auto'
+
+logger = logging.getLogger(__name__)
+
+# --- S3 客户端 (懒加载) ---
+# 导入 boto3 并构建客户端需要数百毫秒，推迟到第一次真正访问 R2 时再做，
+# 只签 GET 链接的请求 (sign_many 快速路径) 完全不需要它。
+_s3_client = None
+_s3_client_lock = threading.Lock()
+
+
+def get_s3_client():
+    """
+    返回共享的 S3 客户端，首次调用时创建 (线程安全，boto3 客户端本身可跨线程复用)
+    """
+    global _s3_client
+    if _s3_client is not None:
+        return _s3_client
+    with _s3_client_lock:
+        if _s3_client is None:
+            started = time.perf_counter()
+            import boto3
+            from botocore.config import Config
+
+            client = boto3.client(
+                's3',
+                endpoint_url=settings.R2_ENDPOINT_URL,
+                aws_access_key_id=settings.R2_ACCESS_KEY_ID,
+                aws_secret_access_key=settings.R2_SECRET_ACCESS_KEY,
+                config=Config(signature_version='s3v4'),
+                region_name=R2_REGION
+            )
+            # 🟢 R2 调用次数 / 耗时统计 (见 /metrics)
+            instrument_boto_client(client)
+            _s3_client = client
+            logger.info(
+                "✅ S3 client created in %.1fms (endpoint=%s bucket=%s)",
+                (time.perf_counter() - started) * 1000, settings.R2_ENDPOINT_URL, settings.R2_BUCKET_NAME
+            )
+    return _s3_client
+
+
+def warm_storage_client() -> float:
+    """
+    预先创建 S3 客户端 (lifespan 中可选调用)，返回耗时秒数
+    """
+    started = time.perf_counter()
+    get_s3_client()
+    return time.perf_counter() - started
+
+# 直传对象统一放在 uploads/ 前缀下
+UPLOAD_PREFIX = "uploads/"
+
+
+def _new_upload_key(file_name: str) -> str:
+    unique_name = f"{uuid.uuid4()}-{file_name}"
+    return f"{UPLOAD_PREFIX}{unique_name}"
+
+
+def public_url(object_name: str) -> str:
+    return f"{settings.R2_ENDPOINT_URL}/{settings.R2_BUCKET_NAME}/{object_name}"
+
 
 def generate_presigned_post(file_name: str, file_type: str):
     """
     生成上传凭证 (POST)
     """
-    print(f"⚡ [DEBUG] Generating presigned url for: {file_name}")
+    logger.debug("⚡ Generating presigned url for: %s", file_name)
     try:
-        unique_name = f"{uuid.uuid4()}-{file_name}"
-        object_name = f"uploads/{unique_name}"
+        object_name = _new_upload_key(file_name)
 
         # 3. 向 R2 申请预签名 URL
-        presigned_url = s3_client.generate_presigned_url(
+        presigned_url = get_s3_client().generate_presigned_url(
             'put_object',
             Params={
                 'Bucket': settings.R2_BUCKET_NAME,
@@ -48,71 +95,470 @@ def generate_presigned_post(file_name: str, file_type: str):
             },
             ExpiresIn=3600
         )
-        
-        print(f"✨ [DEBUG] URL Generated: {presigned_url[:50]}...")
-
-        public_url = f"{settings.R2_ENDPOINT_URL}/{settings.R2_BUCKET_NAME}/{object_name}"
 
         return {
             "upload_url": presigned_url,
             "file_key": object_name,
-            "public_url": public_url
+            "public_url": public_url(object_name)
+        }
+
+    except Exception as e:
+        logger.error("❌ R2 Logic Error: %s", e)
+        return None
+
+# --- 分片上传 (Multipart Upload) ---
+# 大文件拆成多个分片并行直传 R2，单个分片失败只需重传该分片
+
+def create_multipart_upload(file_name: str, file_type: str):
+    """
+    发起分片上传，返回 upload_id 与对象键
+    """
+    try:
+        object_name = _new_upload_key(file_name)
+        response = get_s3_client().create_multipart_upload(
+            Bucket=settings.R2_BUCKET_NAME,
+            Key=object_name,
+            ContentType=file_type
+        )
+        return {
+            "upload_id": response["UploadId"],
+            "file_key": object_name,
+            "public_url": public_url(object_name)
         }
+    except Exception as e:
+        logger.error("❌ Create Multipart Upload Failed: %s", e)
+        return None
+
+
+def presign_upload_parts(object_name: str, upload_id: str, part_numbers, expiration=3600):
+    """
+    一次性为多个分片生成上传链接 (PUT)
+    """
+    try:
+        return [
+            {
+                "part_number": part_number,
+                "upload_url": get_s3_client().generate_presigned_url(
+                    'upload_part',
+                    Params={
+                        'Bucket': settings.R2_BUCKET_NAME,
+                        'Key': object_name,
+                        'UploadId': upload_id,
+                        'PartNumber': part_number
+                    },
+                    ExpiresIn=expiration
+                )
+            }
+            for part_number in part_numbers
+        ]
+    except Exception as e:
+        logger.error("❌ Presign Upload Parts Failed: %s", e)
+        return None
 
+
+def complete_multipart_upload(object_name: str, upload_id: str, parts):
+    """
+    合并分片，parts 为 [(part_number, etag), ...]
+    """
+    try:
+        get_s3_client().complete_multipart_upload(
+            Bucket=settings.R2_BUCKET_NAME,
+            Key=object_name,
+            UploadId=upload_id,
+            MultipartUpload={
+                'Parts': [
+                    {'PartNumber': part_number, 'ETag': etag}
+                    for part_number, etag in sorted(parts)
+                ]
+            }
+        )
+        return {
+            "file_key": object_name,
+            "public_url": public_url(object_name)
+        }
     except Exception as e:
-        print(f"❌ [DEBUG] R2 Logic Error: {e}")
+        logger.error("❌ Complete Multipart Upload Failed: %s", e)
         return None
 
-def generate_presigned_url(object_name: str, original_filename: str = None, expiration=3600):
+
+def abort_multipart_upload(object_name: str, upload_id: str) -> bool:
+    """
+    放弃分片上传，释放已上传的分片
+    """
+    try:
+        get_s3_client().abort_multipart_upload(
+            Bucket=settings.R2_BUCKET_NAME,
+            Key=object_name,
+            UploadId=upload_id
+        )
+        return True
+    except Exception as e:
+        logger.error("❌ Abort Multipart Upload Failed: %s", e)
+        return False
+
+
+# SigV4 预签名链接的最长有效期 (7 天)
+MAX_PRESIGN_EXPIRES = 604800
+
+
+class PresignCache:
+    """
+    预签名链接 LRU 缓存
+
+    时间被划分为固定长度的窗口 (bucket)，同一窗口内同一对象返回同一个 URL；
+    条目在所属窗口结束时失效，签名有效期额外覆盖一个窗口，
+    因此任何时刻发出的链接都至少还有 expiration 秒可用。
+    """
+
+    def __init__(self, maxsize: int, bucket_seconds: int):
+        self.maxsize = maxsize
+        self.bucket_seconds = max(1, bucket_seconds)
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[tuple, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def current_bucket(self, now: float = None) -> int:
+        return int((time.time() if now is None else now) // self.bucket_seconds)
+
+    def get(self, cache_key: tuple, bucket: int):
+        with self._lock:
+            entry = self._entries.get(cache_key)
+            if entry is not None and entry[1] == bucket:
+                self._entries.move_to_end(cache_key)
+                self.hits += 1
+                return entry[0]
+            # 过期条目提前淘汰，不再发给客户端
+            if entry is not None:
+                del self._entries[cache_key]
+            self.misses += 1
+            return None
+
+    def put(self, cache_key: tuple, bucket: int, url: str):
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._entries[cache_key] = (url, bucket)
+            self._entries.move_to_end(cache_key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits / total) if total else 0.0,
+                "bucket_seconds": self.bucket_seconds
+            }
+
+
+presign_cache = PresignCache(settings.PRESIGN_CACHE_SIZE, settings.PRESIGN_BUCKET_SECONDS)
+
+
+def get_presign_cache_stats() -> dict:
+    """
+    返回预签名缓存的命中统计
+    """
+    return presign_cache.stats()
+
+
+def _build_get_params(object_name: str, original_filename: str = None, disposition: str = "attachment") -> dict:
+    """
+    构建 get_object 的签名参数
+    """
+    # 1. 猜测文件 MIME 类型
+    content_type, _ = mimetypes.guess_type(object_name)
+
+    # 2. 构建参数字典
+    params = {
+        'Bucket': settings.R2_BUCKET_NAME,
+        'Key': object_name
+    }
+
+    # 3. 修复中文显示乱码
+    if content_type and ('text' in content_type or 'json' in content_type):
+        params['ResponseContentType'] = f"{content_type}; charset=utf-8"
+
+    # 4. 强制下载并指定文件名 (解决浏览器直接打开的问题)
+    if original_filename:
+        # 对文件名进行 URL 编码
+        encoded_name = quote(original_filename)
+        # 使用 filename* 语法兼容现代浏览器处理 UTF-8 文件名
+        params['ResponseContentDisposition'] = f"{disposition}; filename*=UTF-8''{encoded_name}"
+    else:
+        params['ResponseContentDisposition'] = disposition
+
+    return params
+
+
+# get_object 参数名 -> 查询字符串参数名
+_RESPONSE_QUERY_NAMES = {
+    'ResponseCacheControl': 'response-cache-control',
+    'ResponseContentDisposition': 'response-content-disposition',
+    'ResponseContentEncoding': 'response-content-encoding',
+    'ResponseContentLanguage': 'response-content-language',
+    'ResponseContentType': 'response-content-type',
+    'ResponseExpires': 'response-expires',
+}
+
+
+def _uri_encode(value: str, safe: str = '-_.~') -> str:
+    return quote(value, safe=safe)
+
+
+class SigV4QuerySigner:
+    """
+    轻量 SigV4 查询串签名器 (仅用于 path-style 的 get_object)
+
+    输出与 s3_client.generate_presigned_url 逐字节一致，
+    但派生签名密钥每天每区域只计算一次，省去 botocore 每次调用的请求构建开销。
+    """
+
+    def __init__(self, access_key: str, secret_key: str, endpoint_url: str, region: str = R2_REGION, service: str = 's3'):
+        self.access_key = access_key
+        self.secret_key = secret_key
+        self.region = region
+        self.service = service
+        endpoint = urlsplit(endpoint_url)
+        self.scheme = endpoint.scheme
+        self.host = endpoint.netloc
+        self.base_path = endpoint.path.rstrip('/')
+        self._signing_keys = {}
+        self._lock = threading.Lock()
+
+    def signing_key(self, datestamp: str) -> bytes:
+        """
+        派生并缓存当天的签名密钥
+        """
+        key = self._signing_keys.get(datestamp)
+        if key is not None:
+            return key
+        k_date = hmac.new(f"AWS4{self.secret_key}".encode('utf-8'), datestamp.encode('utf-8'), hashlib.sha256).digest()
+        k_region = hmac.new(k_date, self.region.encode('utf-8'), hashlib.sha256).digest()
+        k_service = hmac.new(k_region, self.service.encode('utf-8'), hashlib.sha256).digest()
+        key = hmac.new(k_service, b'aws4_request', hashlib.sha256).digest()
+        with self._lock:
+            # 只保留最近的密钥，跨天后旧密钥自然淘汰
+            self._signing_keys = {datestamp: key}
+        return key
+
+    def presign_get(self, params: dict, expires: int, signed_at: datetime) -> str:
+        """
+        对 _build_get_params 产生的参数签名，返回 GET 链接
+        """
+        amz_date = signed_at.strftime('%Y%m%dT%H%M%SZ')
+        datestamp = amz_date[:8]
+        scope = f"{datestamp}/{self.region}/{self.service}/aws4_request"
+
+        path = f"{self.base_path}/{params['Bucket']}/{_uri_encode(params['Key'], safe='/~')}"
+
+        # 1. 查询参数：先业务参数，后认证参数 (与 botocore 顺序一致)
+        query = [
+            (_RESPONSE_QUERY_NAMES[name], value)
+            for name, value in params.items()
+            if name in _RESPONSE_QUERY_NAMES
+        ]
+        query += [
+            ('X-Amz-Algorithm', 'AWS4-HMAC-SHA256'),
+            ('X-Amz-Credential', f"{self.access_key}/{scope}"),
+            ('X-Amz-Date', amz_date),
+            ('X-Amz-Expires', str(expires)),
+            ('X-Amz-SignedHeaders', 'host'),
+        ]
+        encoded = [(_uri_encode(k), _uri_encode(v)) for k, v in query]
+
+        # 2. 规范请求
+        canonical_request = '\n'.join([
+            'GET',
+            path,
+            '&'.join(f"{k}={v}" for k, v in sorted(encoded)),
+            f"host:{self.host}\n",
+            'host',
+            'UNSIGNED-PAYLOAD'
+        ])
+
+        # 3. 待签字符串与签名
+        string_to_sign = '\n'.join([
+            'AWS4-HMAC-SHA256',
+            amz_date,
+            scope,
+            hashlib.sha256(canonical_request.encode('utf-8')).hexdigest()
+        ])
+        signature = hmac.new(self.signing_key(datestamp), string_to_sign.encode('utf-8'), hashlib.sha256).hexdigest()
+
+        query_string = '&'.join(f"{k}={v}" for k, v in encoded)
+        return f"{self.scheme}://{self.host}{path}?{query_string}&X-Amz-Signature={signature}"
+
+
+fast_signer = SigV4QuerySigner(
+    settings.R2_ACCESS_KEY_ID,
+    settings.R2_SECRET_ACCESS_KEY,
+    settings.R2_ENDPOINT_URL
+)
+
+
+def sign_many(keys, expiration=3600, disposition: str = "attachment") -> list:
+    """
+    批量生成下载链接 (GET)
+
+    keys 中每一项可以是对象键，或 (对象键, 原始文件名) 元组；返回与输入顺序一致的 URL 列表。
+    签名时间对齐到缓存窗口起点，同一窗口内不同进程也会得到相同的 URL。
+    """
+    bucket = presign_cache.current_bucket()
+    signed_at = datetime.fromtimestamp(bucket * presign_cache.bucket_seconds, tz=timezone.utc)
+    expires = min(expiration + presign_cache.bucket_seconds, MAX_PRESIGN_EXPIRES)
+
+    urls = []
+    for item in keys:
+        object_name, original_filename = item if isinstance(item, tuple) else (item, None)
+        cache_key = (object_name, original_filename, disposition, expiration)
+        url = presign_cache.get(cache_key, bucket)
+        if url is None:
+            try:
+                params = _build_get_params(object_name, original_filename, disposition)
+                url = fast_signer.presign_get(params, expires, signed_at)
+                presign_cache.put(cache_key, bucket, url)
+            except Exception as e:
+                logger.error("❌ Fast sign failed, fallback to boto3: %s", e)
+                url = generate_presigned_url(object_name, original_filename, expiration, disposition)
+        urls.append(url)
+    return urls
+
+
+def generate_presigned_url(object_name: str, original_filename: str = None, expiration=3600, disposition: str = "attachment"):
     """
     生成下载/访问链接 (GET)
     🟢 修复中文乱码：如果是文本文件，强制指定 charset=utf-8
     🟢 修复下载体验：强制浏览器弹出下载框，并使用正确的文件名
+    🟢 同一时间窗口内命中缓存，返回稳定不变的 URL
     """
+    cache_key = (object_name, original_filename, disposition, expiration)
+    bucket = presign_cache.current_bucket()
+    cached = presign_cache.get(cache_key, bucket)
+    if cached:
+        return cached
+
     try:
-        # 1. 猜测文件 MIME 类型
-        content_type, _ = mimetypes.guess_type(object_name)
-        
-        # 2. 构建参数字典
-        params = {
-            'Bucket': settings.R2_BUCKET_NAME,
-            'Key': object_name
-        }
+        params = _build_get_params(object_name, original_filename, disposition)
 
-        # 3. 修复中文显示乱码
-        if content_type and ('text' in content_type or 'json' in content_type):
-            params['ResponseContentType'] = f"{content_type}; charset=utf-8"
-        
-        # 4. 强制下载并指定文件名 (解决浏览器直接打开的问题)
-        if original_filename:
-            # 对文件名进行 URL 编码
-            encoded_name = quote(original_filename)
-            # 使用 filename* 语法兼容现代浏览器处理 UTF-8 文件名
-            params['ResponseContentDisposition'] = f"attachment; filename*=UTF-8''{encoded_name}"
-        else:
-            params['ResponseContentDisposition'] = 'attachment'
-        
-        # 5. 生成带参数的签名链接
-        url = s3_client.generate_presigned_url(
+        # 5. 生成带参数的签名链接 (有效期多覆盖一个窗口，保证缓存期内发出的链接不会提前过期)
+        url = get_s3_client().generate_presigned_url(
             'get_object',
             Params=params,
-            ExpiresIn=expiration
+            ExpiresIn=min(expiration + presign_cache.bucket_seconds, MAX_PRESIGN_EXPIRES)
         )
+        presign_cache.put(cache_key, bucket, url)
         return url
     except Exception as e:
-        print(f"❌ Generate GET URL Failed: {e}")
+        logger.error("❌ Generate GET URL Failed: %s", e)
         return None
 
+# --- 服务端读写 (派生文件管线使用) ---
+
+def download_object(object_name: str, max_bytes: int = None) -> bytes:
+    """
+    读取整个对象 (失败时抛出异常)，超过 max_bytes 时拒绝下载
+    """
+    response = get_s3_client().get_object(Bucket=settings.R2_BUCKET_NAME, Key=object_name)
+    body = response['Body']
+    try:
+        if max_bytes is not None and response.get('ContentLength', 0) > max_bytes:
+            raise ValueError(f"Object {object_name} is larger than {max_bytes} bytes")
+        return body.read()
+    finally:
+        body.close()
+
+
+def stream_object(object_name: str, chunk_size: int = 256 * 1024):
+    """
+    按块读取对象 (生成器)，内存占用与对象大小无关
+    """
+    response = get_s3_client().get_object(Bucket=settings.R2_BUCKET_NAME, Key=object_name)
+    body = response['Body']
+    try:
+        yield from body.iter_chunks(chunk_size)
+    finally:
+        body.close()
+
+
+def upload_object(object_name: str, data: bytes, content_type: str, cache_control: str = None):
+    """
+    写入对象 (失败时抛出异常)
+    """
+    extra = {'CacheControl': cache_control} if cache_control else {}
+    get_s3_client().put_object(
+        Bucket=settings.R2_BUCKET_NAME,
+        Key=object_name,
+        Body=data,
+        ContentType=content_type,
+        **extra
+    )
+
+
 def delete_file_from_r2(file_key: str):
     """
     从 R2 物理删除文件
     """
     try:
-        s3_client.delete_object(
+        get_s3_client().delete_object(
             Bucket=settings.R2_BUCKET_NAME,
             Key=file_key
         )
         return True
     except Exception as e:
-        print(f"❌ Delete Object Failed: {e}")
-        return False
\ No newline at end of file
+        logger.error("❌ Delete Object Failed: %s", e)
+        return False
+
+# S3 DeleteObjects 单次请求的最大对象数
+DELETE_BATCH_SIZE = 1000
+
+
+def _delete_batch(keys: list) -> dict:
+    """
+    删除一批对象 (≤1000)，返回 {key: 错误信息}，成功的键不在结果中
+    """
+    try:
+        response = get_s3_client().delete_objects(
+            Bucket=settings.R2_BUCKET_NAME,
+            Delete={'Objects': [{'Key': key} for key in keys], 'Quiet': True}
+        )
+    except Exception as e:
+        logger.error("❌ Delete Objects Failed: %s", e)
+        return {key: str(e) for key in keys}
+    return {
+        error['Key']: error.get('Message') or error.get('Code') or 'Unknown error'
+        for error in response.get('Errors', [])
+    }
+
+
+def delete_files_from_r2(file_keys) -> dict:
+    """
+    批量从 R2 物理删除文件
+
+    按 1000 个键分批调用 DeleteObjects，多个批次并发执行。
+    返回 {key: 错误信息}，空字典表示全部删除成功。
+    """
+    keys = list(dict.fromkeys(k for k in file_keys if k))
+    if not keys:
+        return {}
+
+    batches = [keys[i:i + DELETE_BATCH_SIZE] for i in range(0, len(keys), DELETE_BATCH_SIZE)]
+    if len(batches) == 1:
+        return _delete_batch(batches[0])
+
+    errors = {}
+    workers = max(1, min(settings.R2_DELETE_CONCURRENCY, len(batches)))
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for batch_errors in executor.map(_delete_batch, batches):
+            errors.update(batch_errors)
+    return errors
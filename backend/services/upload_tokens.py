@@ -0,0 +1,55 @@
+"""
+上传凭证 (HMAC-SHA256)
+
+把对象键 (以及分片上传的 upload_id) 与签发时的用户、过期时间一起签名：
+- 内联对象：/upload/presigned 签发的 upload_url 带 ?token=...，PUT /upload/inline/... 凭它写入，
+  与 R2 预签名链接一样无需再带登录态，但只有签发过的键才能写
+- 分片上传：/upload/multipart/initiate 返回 upload_token，后续 parts / complete / abort 必须带上，
+  且调用者必须是发起上传的同一用户
+
+凭证格式: "<user_id>.<expires>.<signature>"
+"""
+import hashlib
+import hmac
+import time
+from typing import Optional
+
+from config import settings
+
+INLINE_UPLOAD = "inline"
+MULTIPART_UPLOAD = "multipart"
+
+
+def _secret() -> bytes:
+    if settings.UPLOAD_SIGNING_SECRET:
+        return settings.UPLOAD_SIGNING_SECRET.encode()
+    # 未单独配置时由 R2 密钥派生 (不直接使用原密钥)
+    return hmac.new(settings.R2_SECRET_ACCESS_KEY.encode(), b"endfield-upload-token", hashlib.sha256).digest()
+
+
+def _signature(purpose: str, user_id: str, expires: int, values) -> str:
+    message = "\n".join([purpose, user_id, str(expires), *values]).encode()
+    return hmac.new(_secret(), message, hashlib.sha256).hexdigest()
+
+
+def issue_token(purpose: str, user_id, *values: str, ttl: int) -> str:
+    expires = int(time.time()) + ttl
+    return f"{user_id}.{expires}.{_signature(purpose, str(user_id), expires, values)}"
+
+
+def verify_token(token: Optional[str], purpose: str, *values: str, user_id=None) -> Optional[str]:
+    """
+    校验凭证，返回签发时的用户 id；无效 / 过期 / 用户不符时返回 None
+    """
+    try:
+        token_user, expires, signature = (token or "").split(".")
+        expires = int(expires)
+    except ValueError:
+        return None
+    if expires < time.time():
+        return None
+    if user_id is not None and token_user != str(user_id):
+        return None
+    if not hmac.compare_digest(signature, _signature(purpose, token_user, expires, values)):
+        return None
+    return token_user
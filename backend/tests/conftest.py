@@ -0,0 +1,50 @@
+"""
+测试环境：环境变量必须在导入 config / main 之前设置 (临时 SQLite 库，R2 / Supabase 使用占位值，不访问外网)
+"""
+import os
+import tempfile
+import uuid
+
+os.environ["DATABASE_URL"] = "sqlite:///" + os.path.join(tempfile.mkdtemp(prefix="endfield-tests-"), "test.db")
+os.environ.setdefault("R2_ACCESS_KEY_ID", "test-access-key")
+os.environ.setdefault("R2_SECRET_ACCESS_KEY", "test-secret-key")
+os.environ.setdefault("R2_ENDPOINT_URL", "https://test.r2.cloudflarestorage.com")
+os.environ.setdefault("SUPABASE_URL", "http://localhost")
+os.environ.setdefault("SUPABASE_KEY", "test")
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+# 后台任务只在被唤醒时运行，测试中不会与断言交错
+os.environ.setdefault("DERIVATIVE_WORKERS", "0")
+os.environ.setdefault("PURGE_INTERVAL_SECONDS", "86400")
+os.environ.setdefault("STORAGE_WARMUP_ON_STARTUP", "false")
+
+import pytest
+from fastapi.testclient import TestClient
+from jose import jwt
+from sqlmodel import Session
+
+
+@pytest.fixture(scope="session")
+def client():
+    import main
+    with TestClient(main.app) as client:
+        yield client
+
+
+@pytest.fixture
+def db(client):
+    from database import engine
+    with Session(engine) as session:
+        yield session
+
+
+@pytest.fixture
+def operator(db):
+    """
+    新建一个正式干员，返回其 Authorization 请求头
+    """
+    from models import Profile
+    user_id = uuid.uuid4()
+    db.add(Profile(id=user_id, code=f"OP-{user_id.hex[:8]}"))
+    db.commit()
+    # get_current_user 不校验签名 (Supabase 签发)，只读取 sub
+    return {"Authorization": "Bearer " + jwt.encode({"sub": str(user_id)}, "test")}
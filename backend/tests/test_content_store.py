@@ -0,0 +1,102 @@
+"""
+去重对象引用计数：登记 → 复用 → 释放到 0 → 进入清理队列，以及并发首次登记同一内容
+"""
+import hashlib
+import uuid
+
+import pytest
+from sqlmodel import Session, select
+
+import routers.files
+from database import engine
+from models import ContentObject, File, StorageDeletion
+
+
+@pytest.fixture(autouse=True)
+def no_purge(monkeypatch):
+    # 清理队列由断言检查，不唤醒后台清理任务
+    monkeypatch.setattr(routers.files, "notify_purge_worker", lambda: None)
+
+
+def _content():
+    data = uuid.uuid4().bytes
+    return hashlib.sha256(data).hexdigest(), len(data), f"uploads/{uuid.uuid4()}-a.bin"
+
+
+def _register(client, headers, key, sha256, size):
+    response = client.post("/files/", headers=headers, json={
+        "filename": "a.bin", "r2_key": key, "size": size,
+        "mime_type": "application/octet-stream", "content_sha256": sha256
+    })
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def _object(db, sha256):
+    db.expire_all()
+    return db.get(ContentObject, sha256)
+
+
+def _queued(db, key):
+    return db.exec(select(StorageDeletion).where(StorageDeletion.r2_key == key)).first() is not None
+
+
+def test_ref_count_lifecycle(client, db, operator):
+    sha256, size, key = _content()
+    first = _register(client, operator, key, sha256, size)
+    assert _object(db, sha256).ref_count == 1
+
+    # 校验通过后，本人再次上传相同内容直接复用现有对象
+    obj = _object(db, sha256)
+    obj.verified = True
+    db.add(obj)
+    db.commit()
+    reused = client.post("/upload/presigned", headers=operator, json={
+        "filename": "b.bin", "content_type": "application/octet-stream", "size": size, "sha256": sha256
+    }).json()
+    assert reused["exists"] is True and reused["file_key"] == key
+
+    second = _register(client, operator, key, sha256, size)
+    assert second["content_sha256"] == sha256
+    assert _object(db, sha256).ref_count == 2
+
+    assert client.delete(f"/files/{first['id']}", headers=operator).status_code == 200
+    assert _object(db, sha256).ref_count == 1
+    assert not _queued(db, key)
+
+    # 最后一个引用释放：对象取消登记并进入清理队列
+    assert client.delete(f"/files/{second['id']}", headers=operator).status_code == 200
+    assert _object(db, sha256) is None
+    assert _queued(db, key)
+
+
+@pytest.mark.parametrize("same_key", [True, False])
+def test_concurrent_first_registration(client, db, operator, monkeypatch, same_key):
+    sha256, size, key = _content()
+    competing_key = key if same_key else f"uploads/{uuid.uuid4()}-a.bin"
+    retain = routers.files.retain_content
+    calls = []
+
+    async def racing_retain(session, files):
+        await retain(session, files)
+        if not calls:
+            # 本请求检查完之后、提交之前，另一个请求抢先登记了同一内容
+            with Session(engine) as other:
+                other.add(ContentObject(sha256=sha256, r2_key=competing_key, size=size, ref_count=1))
+                other.commit()
+        calls.append(len(calls))
+
+    monkeypatch.setattr(routers.files, "retain_content", racing_retain)
+    record = _register(client, operator, key, sha256, size)
+
+    # 冲突后回滚重试一次，而不是 500
+    assert len(calls) == 2
+    obj = _object(db, sha256)
+    if same_key:
+        assert obj.ref_count == 2
+        assert record["content_sha256"] == sha256
+    else:
+        # 相同内容已由其他对象键登记：本文件不参与去重，保留自己的对象
+        assert obj.r2_key == competing_key and obj.ref_count == 1
+        assert record["content_sha256"] is None
+    assert db.get(File, record["id"]).r2_key == key
@@ -0,0 +1,94 @@
+"""
+JSON Patch：apply(a, diff(a, b)) == b，以及基于过期版本保存蓝图时返回 409
+"""
+import random
+
+import orjson
+import pytest
+
+from services.json_patch import apply_patch, diff, escape_token, resolve_pointer
+
+CASES = {
+    "array_insert": ([1, 2, 3, 4], [0, 1, 2, 2.5, 3, 4, 5]),
+    "array_remove": ([1, 2, 3, 4, 5], [2, 4]),
+    "array_reorder": (["a", "b", "c", "d"], ["d", "c", "b", "a"]),
+    "array_to_empty": ([{"id": 1}, {"id": 2}], []),
+    "array_of_objects": (
+        [{"id": 1, "pos": [0, 0]}, {"id": 2, "pos": [1, 1]}],
+        [{"id": 2, "pos": [1, 2]}, {"id": 3, "pos": [5, 5]}, {"id": 1, "pos": [0, 0]}]
+    ),
+    "nested_objects": (
+        {"grid": {"size": [10, 10], "cells": {"a": {"type": "belt", "dir": 0}}}, "meta": {"v": 1}},
+        {"grid": {"size": [12, 10], "cells": {"a": {"type": "belt", "dir": 2}, "b": {"type": "pipe"}}}}
+    ),
+    "key_escaping": (
+        {"a/b": 1, "m~n": {"~1": [1]}, "~0/~1": "x", "": 0},
+        {"a/b": 2, "m~n": {"~1": [1, 2], "/": None}, "": {"nested": True}}
+    ),
+    "type_changes": (
+        {"n": 1, "f": 1, "b": 1, "s": "1", "l": [1], "o": {"k": 1}, "z": None},
+        {"n": 1.0, "f": True, "b": "1", "s": ["1"], "l": {"0": 1}, "o": [1], "z": 0}
+    ),
+    "root_replace": ({"a": 1}, [1, 2]),
+    "unicode": ({"名称": "工厂"}, {"名称": "工厂 2", "备注": "🟢"}),
+}
+
+
+def _assert_same(actual, expected):
+    # 1 == 1.0 == True 在 Python 中成立，按 JSON 序列化结果严格比较
+    assert orjson.dumps(actual, option=orjson.OPT_SORT_KEYS) == orjson.dumps(expected, option=orjson.OPT_SORT_KEYS)
+
+
+@pytest.mark.parametrize("a, b", CASES.values(), ids=CASES.keys())
+def test_diff_round_trip(a, b):
+    before = orjson.dumps(a)
+    _assert_same(apply_patch(a, diff(a, b)), b)
+    _assert_same(apply_patch(b, diff(b, a)), a)
+    # diff / apply_patch 都不修改输入
+    assert orjson.dumps(a) == before
+
+
+def _random_value(rng, depth=0):
+    kind = rng.randrange(7 if depth < 3 else 4)
+    if kind == 0:
+        return rng.choice([None, True, False])
+    if kind == 1:
+        return rng.choice([0, 1, -7, 2 ** 40, 1.5])
+    if kind == 2:
+        return rng.choice(["", "a", "~", "/", "~1", "a/b~c"])
+    if kind == 3:
+        return rng.randrange(4)
+    if kind in (4, 5):
+        return [_random_value(rng, depth + 1) for _ in range(rng.randrange(6))]
+    return {rng.choice(["a", "b", "~", "/", "a/b", "~0"]): _random_value(rng, depth + 1) for _ in range(rng.randrange(5))}
+
+
+def test_diff_round_trip_random():
+    rng = random.Random(20261018)
+    for _ in range(500):
+        a, b = _random_value(rng), _random_value(rng)
+        _assert_same(apply_patch(a, diff(a, b)), b)
+
+
+def test_pointer_escaping():
+    document = {"a/b": {"m~n": [10, 20]}}
+    pointer = "/" + escape_token("a/b") + "/" + escape_token("m~n") + "/1"
+    assert pointer == "/a~1b/m~0n/1"
+    assert resolve_pointer(document, pointer) == 20
+
+
+def test_stale_base_revision_conflicts(client, operator):
+    created = client.post("/blueprints/", headers=operator, json={"name": "line", "data": {"belts": [1, 2]}}).json()
+    path = f"/blueprints/{created['id']}"
+
+    saved = client.put(path, headers=operator, json={"base_revision": 1, "data": {"belts": [1, 2, 3]}})
+    assert saved.status_code == 200 and saved.json()["revision"] == 2
+
+    # 基于已过期的第 1 版保存 (整份 / 补丁)：拒绝，不覆盖第 2 版
+    stale = client.put(path, headers=operator, json={"base_revision": 1, "data": {"belts": []}})
+    assert stale.status_code == 409
+    stale = client.patch(path, headers=operator, json={
+        "base_revision": 1, "ops": [{"op": "remove", "path": "/belts/0"}]
+    })
+    assert stale.status_code == 409
+    assert client.get(path, headers=operator).json()["data"] == {"belts": [1, 2, 3]}
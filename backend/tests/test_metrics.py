@@ -0,0 +1,35 @@
+"""
+/metrics 访问控制，以及 engine.dispose() 之后连接池等待计时仍然生效
+"""
+from sqlalchemy import create_engine, text
+
+from config import settings
+from services.metrics import db_pool_wait, instrument_engine
+
+
+def test_metrics_requires_token(client, monkeypatch):
+    monkeypatch.setattr(settings, "METRICS_TOKEN", None)
+    assert client.get("/metrics").status_code == 404
+
+    monkeypatch.setattr(settings, "METRICS_TOKEN", "scrape-token")
+    assert client.get("/metrics").status_code == 401
+    assert client.get("/metrics", headers={"Authorization": "Bearer wrong"}).status_code == 401
+    response = client.get("/metrics", headers={"Authorization": "Bearer scrape-token"})
+    assert response.status_code == 200
+    assert "endfield_http_requests_total" in response.text
+
+
+def _checkouts(label):
+    state = db_pool_wait._values.get((label,))
+    return state[-1] if state else 0
+
+
+def test_pool_wait_survives_dispose(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'pool.db'}")
+    instrument_engine(engine, "dispose-test")
+    for expected in (1, 2):
+        with engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+        assert _checkouts("dispose-test") == expected
+        # dispose() 换上新的连接池，计时必须重新挂载
+        engine.dispose()
@@ -0,0 +1,64 @@
+"""
+快速签名路径 (SigV4QuerySigner / sign_many) 必须与 botocore 的 generate_presigned_url 逐字节一致
+"""
+import datetime
+from unittest import mock
+
+import pytest
+
+from services import storage
+
+# 冻结的当前时间，以及 sign_many 对齐到的缓存窗口起点
+FROZEN = datetime.datetime(2026, 10, 18, 12, 34, 56, tzinfo=datetime.timezone.utc)
+BUCKET_SECONDS = 900
+WINDOW_START = datetime.datetime(2026, 10, 18, 12, 30, tzinfo=datetime.timezone.utc)
+
+KEYS = [
+    "uploads/plain.bin",
+    "uploads/with space/and+plus.mp3",
+    "uploads/歌曲 (live)+remix.flac",
+    ("uploads/a/b/c~d*e'f.txt", "笔记 a+b/c.txt"),
+    ("uploads/data.json", 'report; "final", 100%.json'),
+]
+
+
+class _FrozenDatetime(datetime.datetime):
+    # botocore 用 datetime.utcnow() / now(timezone.utc) 取签名时间
+    @classmethod
+    def utcnow(cls):
+        return WINDOW_START.replace(tzinfo=None)
+
+    @classmethod
+    def now(cls, tz=None):
+        return WINDOW_START if tz else WINDOW_START.replace(tzinfo=None)
+
+
+@pytest.fixture
+def presign_cache(monkeypatch):
+    cache = storage.PresignCache(64, BUCKET_SECONDS)
+    monkeypatch.setattr(cache, "current_bucket", lambda now=None: int(FROZEN.timestamp()) // BUCKET_SECONDS)
+    monkeypatch.setattr(storage, "presign_cache", cache)
+    return cache
+
+
+def _boto_url(item, expires):
+    object_name, original_filename = item if isinstance(item, tuple) else (item, None)
+    params = storage._build_get_params(object_name, original_filename)
+    with mock.patch("botocore.auth.datetime.datetime", _FrozenDatetime):
+        return storage.get_s3_client().generate_presigned_url("get_object", Params=params, ExpiresIn=expires)
+
+
+def test_sign_many_matches_botocore(presign_cache):
+    urls = storage.sign_many(KEYS, expiration=3600)
+    # 签名时间对齐到窗口起点，有效期多覆盖一个窗口
+    assert urls == [_boto_url(item, 3600 + BUCKET_SECONDS) for item in KEYS]
+    # 同一窗口内再次签名命中缓存，返回同一个 URL
+    assert storage.sign_many(KEYS, expiration=3600) == urls
+    assert presign_cache.hits == len(KEYS)
+
+
+@pytest.mark.parametrize("item", KEYS)
+def test_signer_matches_botocore(item):
+    object_name, original_filename = item if isinstance(item, tuple) else (item, None)
+    params = storage._build_get_params(object_name, original_filename)
+    assert storage.fast_signer.presign_get(params, 600, WINDOW_START) == _boto_url(item, 600)
@@ -0,0 +1,47 @@
+"""
+S3 客户端懒加载：导入 main 不加载 boto3，首次访问时只创建一次客户端
+(冷启动耗时预算见 benchmarks/cold_start.py，不放进测试：墙钟时间随机器负载波动)
+"""
+import json
+import os
+import subprocess
+import sys
+import threading
+
+import boto3
+
+from services import storage
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_import_main_does_not_load_boto3():
+    # 全新子进程：本进程里 boto3 早已被其他测试导入
+    script = "import json, sys, main; print(json.dumps(sorted(m for m in ('boto3', 'botocore') if m in sys.modules)))"
+    result = subprocess.run(
+        [sys.executable, "-c", script], cwd=BACKEND_DIR, capture_output=True, text=True, timeout=120, check=True
+    )
+    assert json.loads(result.stdout.strip().splitlines()[-1]) == []
+
+
+def test_s3_client_is_built_once(monkeypatch):
+    created = []
+    build = boto3.client
+
+    def counting_client(*args, **kwargs):
+        created.append(args)
+        return build(*args, **kwargs)
+
+    monkeypatch.setattr(storage, "_s3_client", None)
+    monkeypatch.setattr(boto3, "client", counting_client)
+
+    clients = []
+    threads = [threading.Thread(target=lambda: clients.append(storage.get_s3_client())) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(created) == 1
+    assert all(client is clients[0] for client in clients)
+    assert storage.get_s3_client() is clients[0]
@@ -0,0 +1,105 @@
+// frontend/utils/sha256.ts
+
+// 分块读取的大小：任意大小的文件内存占用都只有一个分块
+const CHUNK_SIZE = 4 * 1024 * 1024
+// 超过该大小不做去重 (纯 JS 哈希大文件耗时较长，直接上传更快)
+export const MAX_DEDUP_BYTES = 1024 * 1024 * 1024
+
+const K = new Uint32Array([
+    0x428a2f98, 0x71374491, 0xb5c0fbcf, 0xe9b5dba5, 0x3956c25b, 0x59f111f1, 0x923f82a4, 0xab1c5ed5,
+    0xd807aa98, 0x12835b01, 0x243185be, 0x550c7dc3, 0x72be5d74, 0x80deb1fe, 0x9bdc06a7, 0xc19bf174,
+    0xe49b69c1, 0xefbe4786, 0x0fc19dc6, 0x240ca1cc, 0x2de92c6f, 0x4a7484aa, 0x5cb0a9dc, 0x76f988da,
+    0x983e5152, 0xa831c66d, 0xb00327c8, 0xbf597fc7, 0xc6e00bf3, 0xd5a79147, 0x06ca6351, 0x14292967,
+    0x27b70a85, 0x2e1b2138, 0x4d2c6dfc, 0x53380d13, 0x650a7354, 0x766a0abb, 0x81c2c92e, 0x92722c85,
+    0xa2bfe8a1, 0xa81a664b, 0xc24b8b70, 0xc76c51a3, 0xd192e819, 0xd6990624, 0xf40e3585, 0x106aa070,
+    0x19a4c116, 0x1e376c08, 0x2748774c, 0x34b0bcb5, 0x391c0cb3, 0x4ed8aa4a, 0x5b9cca4f, 0x682e6ff3,
+    0x748f82ee, 0x78a5636f, 0x84c87814, 0x8cc70208, 0x90befffa, 0xa4506ceb, 0xbef9a3f7, 0xc67178f2
+])
+
+// 增量 SHA-256 (WebCrypto 只支持一次性摘要，无法分块输入)
+class Sha256 {
+    private h = new Uint32Array([
+        0x6a09e667, 0xbb67ae85, 0x3c6ef372, 0xa54ff53a, 0x510e527f, 0x9b05688c, 0x1f83d9ab, 0x5be0cd19
+    ])
+    private w = new Uint32Array(64)
+    private buffer = new Uint8Array(64)
+    private buffered = 0
+    private length = 0
+
+    update(data: Uint8Array) {
+        this.length += data.length
+        let offset = 0
+        // 先补齐上次剩下的不完整分组
+        if (this.buffered > 0) {
+            const take = Math.min(64 - this.buffered, data.length)
+            this.buffer.set(data.subarray(0, take), this.buffered)
+            this.buffered += take
+            offset = take
+            if (this.buffered < 64) return
+            this.compress(this.buffer, 0)
+            this.buffered = 0
+        }
+        for (; offset + 64 <= data.length; offset += 64) this.compress(data, offset)
+        this.buffer.set(data.subarray(offset), 0)
+        this.buffered = data.length - offset
+    }
+
+    digest(): Uint8Array {
+        const bits = this.length * 8
+        const padding = new Uint8Array((this.buffered < 56 ? 56 : 120) - this.buffered + 8)
+        padding[0] = 0x80
+        const view = new DataView(padding.buffer)
+        view.setUint32(padding.length - 8, Math.floor(bits / 0x100000000))
+        view.setUint32(padding.length - 4, bits >>> 0)
+        this.update(padding)
+
+        const out = new Uint8Array(32)
+        const outView = new DataView(out.buffer)
+        this.h.forEach((v, i) => outView.setUint32(i * 4, v))
+        return out
+    }
+
+    private compress(data: Uint8Array, offset: number) {
+        const w = this.w
+        for (let i = 0; i < 16; i++) {
+            const j = offset + i * 4
+            w[i] = (data[j] << 24) | (data[j + 1] << 16) | (data[j + 2] << 8) | data[j + 3]
+        }
+        for (let i = 16; i < 64; i++) {
+            const a = w[i - 15], b = w[i - 2]
+            const s0 = ((a >>> 7) | (a << 25)) ^ ((a >>> 18) | (a << 14)) ^ (a >>> 3)
+            const s1 = ((b >>> 17) | (b << 15)) ^ ((b >>> 19) | (b << 13)) ^ (b >>> 10)
+            w[i] = (w[i - 16] + s0 + w[i - 7] + s1) | 0
+        }
+
+        const h = this.h
+        let a = h[0], b = h[1], c = h[2], d = h[3], e = h[4], f = h[5], g = h[6], hh = h[7]
+        for (let i = 0; i < 64; i++) {
+            const S1 = ((e >>> 6) | (e << 26)) ^ ((e >>> 11) | (e << 21)) ^ ((e >>> 25) | (e << 7))
+            const t1 = (hh + S1 + ((e & f) ^ (~e & g)) + K[i] + w[i]) | 0
+            const S0 = ((a >>> 2) | (a << 30)) ^ ((a >>> 13) | (a << 19)) ^ ((a >>> 22) | (a << 10))
+            const t2 = (S0 + ((a & b) ^ (a & c) ^ (b & c))) | 0
+            hh = g; g = f; f = e; e = (d + t1) | 0
+            d = c; c = b; b = a; a = (t1 + t2) | 0
+        }
+        h[0] += a; h[1] += b; h[2] += c; h[3] += d
+        h[4] += e; h[5] += f; h[6] += g; h[7] += hh
+    }
+}
+
+const toHex = (bytes: Uint8Array) => Array.from(bytes, b => b.toString(16).padStart(2, '0')).join('')
+
+// 计算文件内容的 SHA-256 (十六进制)，用于上传去重
+// 按分块读取，不会把整个文件读进内存；超过 MAX_DEDUP_BYTES 时返回 null (跳过去重)
+export async function sha256Hex(file: Blob): Promise<string | null> {
+    if (file.size > MAX_DEDUP_BYTES) return null
+    // 单个分块以内直接用原生实现
+    if (file.size <= CHUNK_SIZE) {
+        return toHex(new Uint8Array(await crypto.subtle.digest('SHA-256', await file.arrayBuffer())))
+    }
+    const hasher = new Sha256()
+    for (let offset = 0; offset < file.size; offset += CHUNK_SIZE) {
+        hasher.update(new Uint8Array(await file.slice(offset, offset + CHUNK_SIZE).arrayBuffer()))
+    }
+    return toHex(hasher.digest())
+}